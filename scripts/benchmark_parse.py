@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+"""Compare fastparse and PTN throughput over the test corpus."""
+import os
+from pathlib import Path
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.realpath(Path(__file__).parent.parent)))
+
+import PTN
+
+from tests.test_fastparse import CORPUS
+from turbopotato import fastparse
+
+REPEAT = 20
+
+
+def throughput(parse) -> float:
+    names = CORPUS * REPEAT
+    start = time.perf_counter()
+    for name in names:
+        parse(name)
+    return len(names) / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    print(f'fastparse: {throughput(fastparse.parse):.0f} names/s; PTN: {throughput(PTN.parse):.0f} names/s')
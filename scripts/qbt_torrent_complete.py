@@ -37,5 +37,11 @@ while True:
 
 if upload:
     sys.path.append(os.path.abspath(os.path.realpath(Path(__file__).parent.parent)))
-    import turbopotato
-    turbopotato.run(interactive=False, torrents=True, paths=[args.torrent_path])
+    from turbopotato.client import ServiceUnavailable, submit
+    try:
+        job_id = submit(interactive=False, torrents=True, paths=[args.torrent_path])
+        print(f'Queued job {job_id} for {args.torrent_name}')
+    except ServiceUnavailable as e:
+        print(f'{e}; processing in this process')
+        import turbopotato
+        turbopotato.run(interactive=False, torrents=True, paths=[args.torrent_path])
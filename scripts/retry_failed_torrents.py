@@ -6,6 +6,8 @@ import subprocess
 
 from qbittorrentapi import Client
 
+from turbopotato.client import ServiceUnavailable, submit
+
 
 try:
     with open(Path(__file__).parent / 'qbittorrent_config.txt') as file:
@@ -22,6 +24,14 @@ try:
 
             if top_dir:
                 print(f'Retrying "{torrent.name}"')
+                try:
+                    submit(paths=[str(Path(base_dir, top_dir))],
+                           interactive=False,
+                           no_notification_on_failure=True,
+                           torrents=True)
+                    continue
+                except ServiceUnavailable:
+                    pass
                 subprocess.call(
                     ' '.join(
                         [
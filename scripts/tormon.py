@@ -175,21 +175,21 @@ def print_transiting_torrents(log_path, cols):
             except IndexError:
                 lastline = ''
 
-            srch = 'Output:'          # indication of rsync output
+            srch = 'Progress:'        # indication of transfer progress
             cushion = 15              # chars between filename and details of last line of log file
             filename_end_length = 3   # if trimming filename, how much to keep from end of filename (e.g. 3 for file extension)
             cushion_char = "_"        # char to use to separate filename and list line of log detail
             percent_uploaded = 0      # initialize percent uploaded of file to zero
 
             # extract relevant portion of lastline of log file
-            if srch in lastline:   # if rsync output is in lastline
-                transfer_details = lastline[lastline.find(srch)+len(srch):].strip()  # get rsync output e.g "1.64G  97%  170.30kB/s    0:04:02"
+            if srch in lastline:   # if transfer progress is in lastline
+                transfer_details = lastline[lastline.find(srch)+len(srch):].split(' | ')[-1].strip()  # e.g "97% 1.64 GB 170.30 KB/s ETA 0:04:02"
                 if transfer_details.find('%') >= 0:
                     try:
-                        percent_uploaded = int(transfer_details[transfer_details.find('%')-2:transfer_details.find('%')])
+                        percent_uploaded = int(transfer_details[:transfer_details.find('%')])
                     except ValueError:  # somehow a non-integer was found...
                         percent_uploaded = 0
-            else:   # if something other than rsync output is lastline
+            else:   # if something other than transfer progress is lastline
                 # example: [2019-04-27 20:10:28,305] {      processor:232} INFO - >>> Finished Database Query
                 transfer_details = '{' + lastline[lastline.find('{')+1:cols-15].strip()
             transfer_details_list.append(transfer_details)
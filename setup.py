@@ -5,6 +5,7 @@ setup(
     version='0.0.0',
     packages=find_packages(exclude=['*.tests', '*.tests.*', 'tests.*', 'tests', 'scripts']),
     include_package_data=True,
+    package_data={'turbopotato': ['overrides.json']},
     install_requires=['unidecode',
                       'PyInquirer',
                       'parse-torrent-title',
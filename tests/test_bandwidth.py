@@ -0,0 +1,158 @@
+from datetime import datetime
+from pathlib import PurePosixPath
+import threading
+
+from turbopotato import transports as transports_module
+from turbopotato.bandwidth import BandwidthScheduler
+from turbopotato.bandwidth import MAX_RESCHEDULES
+from turbopotato.supervisor import Transfer
+from turbopotato.transit import with_bwlimit
+from turbopotato.transports import deliver
+from turbopotato.transports import Router
+from turbopotato.transports import Transport
+
+from tests.test_journal import make_journal
+
+DESTINATION = PurePosixPath('/volume1/Media/Movies/Movie (2019)/Movie (2019).mkv')
+
+
+class StubQBittorrent:
+    def __init__(self, *upload_rates):
+        self.upload_rates = list(upload_rates)
+
+    def transfer_info(self):
+        if not self.upload_rates:
+            raise ConnectionError('qBittorrent is down')
+        return {'up_info_speed': self.upload_rates.pop(0), 'dl_info_speed': 0}
+
+
+def at(hour: int, minute: int = 0) -> datetime:
+    return datetime(2020, 1, 1, hour, minute)
+
+
+def test_schedule_windows():
+    scheduler = BandwidthScheduler(schedule='07:00-23:00=5M; 23:00-01:30=500K', capacity='')
+    assert scheduler.scheduled_limit(at(12)) == 5 * 10**6
+    assert scheduler.scheduled_limit(at(23, 30)) == scheduler.scheduled_limit(at(1)) == 500 * 10**3
+    assert scheduler.scheduled_limit(at(3)) is None
+    assert BandwidthScheduler(schedule='', capacity='').limit() is None
+    assert not BandwidthScheduler(schedule='', capacity='').enabled
+
+
+def test_adaptive_limit():
+    client = StubQBittorrent(2 * 10**6, 0, 9 * 10**6)
+    scheduler = BandwidthScheduler(schedule='00:00-24:00=6M', capacity='10M', client=client)
+    scheduler.refresh_seeding_rate()
+    assert scheduler.limit() == 6 * 10**6  # seeding at 2M leaves 7.5M spare; the window caps it
+    assert scheduler.share(3) == 2 * 10**6
+    scheduler.refresh_seeding_rate()
+    assert scheduler.limit() == 6 * 10**6  # seeding keeps its reserve even when idle
+    scheduler.refresh_seeding_rate()
+    assert scheduler.limit() == 10**6  # busy seeding; transfers still get a minimum share
+    scheduler.refresh_seeding_rate()
+    assert scheduler.limit() == 6 * 10**6  # qBittorrent unreachable; fall back to the schedule
+
+
+def test_seeding_rate_refreshes_in_background():
+    answer = threading.Event()
+
+    class SlowQBittorrent(StubQBittorrent):
+        def transfer_info(self):
+            self.calls = getattr(self, 'calls', 0) + 1
+            answer.wait(5)
+            return super().transfer_info()
+
+    client = SlowQBittorrent(2 * 10**6)
+    scheduler = BandwidthScheduler(schedule='', capacity='10M', client=client)
+    # a limit asked for from the event loop doesn't wait on qBittorrent
+    assert scheduler.limit() is None
+    assert scheduler.seeding_rate() is None
+    answer.set()
+    assert scheduler._refreshing.acquire(timeout=5)
+    scheduler._refreshing.release()
+    assert client.calls == 1
+    assert scheduler.seeding_rate() == 2 * 10**6
+    assert scheduler.limit() == int(7.5 * 10**6)
+
+
+def test_with_bwlimit():
+    command = ['rsync', '--bwlimit=10', '-a', 'src', 'dest']
+    assert with_bwlimit(command, 2048000) == ['rsync', '--bwlimit=2000', '-a', 'src', 'dest']
+    assert with_bwlimit(command, None) == ['rsync', '-a', 'src', 'dest']
+
+
+class ScriptedScheduler(BandwidthScheduler):
+    def __init__(self, *limits):
+        super().__init__(schedule='', capacity='1M', client=StubQBittorrent())
+        self.limits = list(limits)
+
+    def limit(self):
+        return self.limits.pop(0) if len(self.limits) > 1 else self.limits[0]
+
+
+class RsyncScriptTransport(Transport):
+    """Runs an `rsync` script that logs its arguments and reports progress."""
+    name = 'script'
+
+    def __init__(self, script):
+        self.script = script
+
+    def plan(self, entries, resume=None):
+        return [Transfer(command=[str(self.script), '--partial', str(entry[0])], host='test', context=entry[2])
+                for entry in entries]
+
+
+def test_deliver_applies_and_reschedules_limits(tmp_path, monkeypatch):
+    monkeypatch.setattr(transports_module, 'journal', make_journal(tmp_path))
+    monkeypatch.setattr(transports_module, 'RESCHEDULE_INTERVAL', 0)
+    script = tmp_path / 'rsync'
+    script.write_text(f'#!/bin/sh\necho "$@" >> {tmp_path}/rsync.log\necho "    500  50%  1.00kB/s  0:00:01"\n')
+    script.chmod(0o755)
+    source = tmp_path / 'movie.mkv'
+    source.write_bytes(b'x' * 1000)
+    results = list()
+
+    # the limit rises while the first attempt runs, so it's restarted under the new one
+    deliver([(source, DESTINATION, 'file')], retries=0, backoff=0,
+            router=Router(spec='', default=RsyncScriptTransport(script)), scheduler=ScriptedScheduler(10240, 102400),
+            on_complete=lambda context, success, error: results.append((context, success, error)))
+    attempts = (tmp_path / 'rsync.log').read_text().splitlines()
+    assert [a.split()[0] for a in attempts] == ['--bwlimit=10', '--bwlimit=100']
+    assert results == [('file', True, None)]
+
+
+def test_concurrent_limits_stay_within_schedule(tmp_path, monkeypatch):
+    monkeypatch.setattr(transports_module, 'journal', make_journal(tmp_path))
+    script = tmp_path / 'rsync'
+    script.write_text(f'#!/bin/sh\necho "$@" >> {tmp_path}/rsync.log\nsleep 0.2\n')
+    script.chmod(0o755)
+    entries = list()
+    for name in ('a', 'b', 'c', 'd'):
+        (source := tmp_path / f'{name}.mkv').write_bytes(b'x' * 1000)
+        entries.append((source, DESTINATION.with_name(f'{name}.mkv'), name))
+
+    deliver(entries, concurrency=3, retries=0, backoff=0, router=Router(spec='', default=RsyncScriptTransport(script)),
+            scheduler=BandwidthScheduler(schedule='00:00-24:00=3M', capacity=''))
+    limits = [int(a.split()[0].split('=')[1]) for a in (tmp_path / 'rsync.log').read_text().splitlines()]
+    assert len(limits) == 4
+    # any three running at once together stay within the 3M window
+    assert sum(sorted(limits)[-3:]) * 1024 <= 3 * 10**6
+
+
+def test_restarts_are_capped(tmp_path, monkeypatch):
+    monkeypatch.setattr(transports_module, 'journal', make_journal(tmp_path))
+    monkeypatch.setattr(transports_module, 'RESCHEDULE_INTERVAL', 0)
+    script = tmp_path / 'rsync'
+    script.write_text(f'#!/bin/sh\necho "$@" >> {tmp_path}/rsync.log\necho "    500  50%  1.00kB/s  0:00:01"\n')
+    script.chmod(0o755)
+    source = tmp_path / 'movie.mkv'
+    source.write_bytes(b'x' * 1000)
+    results = list()
+
+    # the limit keeps swinging, but the file is only restarted MAX_RESCHEDULES times
+    deliver([(source, DESTINATION, 'file')], retries=0, backoff=0,
+            router=Router(spec='', default=RsyncScriptTransport(script)),
+            scheduler=ScriptedScheduler(*[10240, 102400] * 10, 10240),
+            on_complete=lambda context, success, error: results.append((context, success, error)))
+    assert len((tmp_path / 'rsync.log').read_text().splitlines()) == MAX_RESCHEDULES + 1
+    assert results == [('file', True, None)]
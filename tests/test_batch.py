@@ -0,0 +1,47 @@
+import os
+from pathlib import Path, PurePosixPath
+
+from turbopotato.batch import BatchTransfer
+from turbopotato.batch import plan_transfers
+from turbopotato.supervisor import TransferSupervisor
+
+SEASON = PurePosixPath('/volume1/Media/TV Shows/Show/Season 1')
+
+
+def make_entries(tmp_path: Path, remote_filepaths: list) -> list:
+    entries = list()
+    for i, remote_filepath in enumerate(remote_filepaths):
+        local_filepath = tmp_path / f'source.{i}.mkv'
+        local_filepath.write_bytes(b'x' * i)
+        entries.append((local_filepath, remote_filepath, f'file{i}'))
+    return entries
+
+
+def test_plan_transfers(tmp_path):
+    entries = make_entries(tmp_path, [SEASON / 'Show - S01E01.mkv',
+                                      PurePosixPath('/volume1/Media/Movies/Movie (2019)/Movie (2019).mkv'),
+                                      SEASON / 'Show - S01E02.mkv',
+                                      SEASON / 'Show - S01E01.mkv'])
+    transfers = plan_transfers(entries)
+    try:
+        assert [type(t).__name__ for t in transfers] == ['BatchTransfer', 'Transfer', 'Transfer']
+        batch = transfers[0]
+        assert batch.context == ['file0', 'file2']
+        assert batch.command[-1] == f"nas:'{SEASON}'/"
+        staged = Path(batch.command[-2]) / 'Show - S01E02.mkv'
+        assert staged.is_symlink() and os.readlink(staged) == str(tmp_path / 'source.2.mkv')
+        assert [t.context for t in transfers[1:]] == ['file1', 'file3']
+    finally:
+        for transfer in transfers:
+            transfer.close()
+    assert not Path(batch.command[-2]).exists()
+
+
+def test_per_file_outcomes(tmp_path):
+    batch = BatchTransfer(make_entries(tmp_path, [SEASON / 'Show - S01E01.mkv', SEASON / 'Show - S01E02.mkv']))
+    # rsync reports the first file complete, then fails part way through the second
+    batch.command = ['sh', '-c', r'printf "Show - S01E01.mkv\n  1.00M 100%%  1.00MB/s 0:00:01 (xfr#1, to-chk=1/2)\n'
+                                 r'Show - S01E02.mkv\n  512K  50%%\n"; exit 23']
+    TransferSupervisor().run([batch])
+    assert not batch.success
+    assert list(batch.outcomes()) == [('file0', True), ('file1', False)]
@@ -0,0 +1,70 @@
+import codecs
+import os
+
+import pytest
+
+from turbopotato.classifier import ASF_GUID
+from turbopotato.classifier import MediaClassifier
+from turbopotato.classifier import sniff
+from turbopotato.classifier import SUBTITLE
+from turbopotato.classifier import VIDEO
+
+SRT = '1\r\n00:00:01,000 --> 00:00:02,000\r\nHello\r\n'
+
+
+@pytest.mark.parametrize('head', [
+    b'\x1a\x45\xdf\xa3\x01\x00',                     # Matroska
+    b'\x00\x00\x01\xba\x44\x00',                     # MPEG program stream
+    ASF_GUID + b'\x00' * 8,                          # WMV
+    b'\x00\x00\x00\x20ftypisom',                     # MP4
+    b'RIFF\x00\x00\x00\x00AVI LIST',                 # AVI
+    b'\x47' + b'\x00' * 187 + b'\x47' + b'\x00' * 187 + b'\x47',  # MPEG transport stream
+    b'\x00\x00\x00\x01\x09\xf0\x00\x00\x00\x01\x67',  # raw H.264 starting with an access unit delimiter
+    b'\x00\x00\x01\x67\x64\x00\x1f',                 # raw H.264 starting with an SPS
+    b'\x00\x00\x00\x01\x40\x01\x0c\x01',             # raw H.265 starting with a VPS
+])
+def test_sniff_video(head):
+    assert sniff(head) == VIDEO
+
+
+@pytest.mark.parametrize('head', [
+    SRT.encode(),
+    codecs.BOM_UTF8 + SRT.encode(),
+    codecs.BOM_UTF16_LE + SRT.encode('utf-16-le'),
+    codecs.BOM_UTF16_BE + SRT.encode('utf-16-be'),
+    SRT.encode('utf-16-le'),
+    b'WEBVTT\n\n00:01.000 --> 00:02.000\nHello',
+    b'[Script Info]\nTitle: x',
+    b'{1}{25}Hello',
+    b'# VobSub index file, v7 (do not modify this line!)',
+])
+def test_sniff_subtitle(head):
+    assert sniff(head) == SUBTITLE
+
+
+@pytest.mark.parametrize('head', [b'', b'<html>', b'\x00\x00\x01\x00\x01\x00', b'PK\x03\x04', b'Rar!\x1a\x07'])
+def test_sniff_unrecognized(head):
+    assert sniff(head) is None
+
+
+def test_classification_cache(tmp_path):
+    video = tmp_path / 'movie.mkv'
+    video.write_bytes(b'\x1a\x45\xdf\xa3' + bytes(100))
+    junk = tmp_path / 'fake.mkv'
+    junk.write_bytes(b'PK\x03\x04' + bytes(100))
+    classifier = MediaClassifier(cache_dir=tmp_path)
+    assert classifier.classify(video) == VIDEO
+    assert classifier.classify(junk) is None
+    assert classifier.classify(tmp_path / 'notes.txt') is None  # only media extensions are read
+    classifier.save()
+
+    # results are reused while the file's stat is unchanged, without reading it again
+    stat = os.stat(video)
+    video.write_bytes(b'PK\x03\x04' + bytes(100))
+    os.utime(video, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    classifier = MediaClassifier(cache_dir=tmp_path)
+    assert classifier.classify(video) == VIDEO
+    assert classifier.classify(junk) is None
+
+    os.utime(video, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert classifier.classify(video) is None
@@ -0,0 +1,51 @@
+import os
+
+from turbopotato import discovery as discovery_module
+from turbopotato.discovery import discover
+
+
+def make_tree(root):
+    for directory in ('a/a1', 'a/a2', 'b'):
+        (root / directory).mkdir(parents=True)
+    for name in ('a/one.mkv', 'a/a1/two.mkv', 'a/a2/three.mkv', 'a/a2/notes.txt', 'b/four.mkv', 'single.mkv'):
+        (root / name).write_bytes(b'video')
+
+
+def names(candidates):
+    return [candidate.path.name for candidate in candidates]
+
+
+def test_discover(tmp_path):
+    make_tree(tmp_path)
+    accept = lambda name: name.endswith('.mkv')
+    candidates = list(discover([str(tmp_path / 'single.mkv'), str(tmp_path / 'a'), str(tmp_path / 'b'),
+                                str(tmp_path / 'missing')], accept=accept, threads=2))
+
+    # file arguments come first, then files as their directories are scanned; each file exactly once
+    assert names(candidates)[0] == 'single.mkv'
+    assert sorted(names(candidates)) == ['four.mkv', 'one.mkv', 'single.mkv', 'three.mkv', 'two.mkv']
+    assert all(candidate.stat.st_size == 5 for candidate in candidates)
+
+    assert sorted(names(discover([str(tmp_path)], threads=1))) == \
+        ['four.mkv', 'notes.txt', 'one.mkv', 'single.mkv', 'three.mkv', 'two.mkv']
+    assert names(discover([str(tmp_path / 'a' / 'a2' / 'notes.txt')], accept=accept)) == []
+
+
+def test_discover_symlinks_and_errors(tmp_path, monkeypatch):
+    make_tree(tmp_path)
+    links = tmp_path / 'links'
+    links.mkdir()
+    os.symlink(tmp_path / 'b' / 'four.mkv', links / 'linked.mkv')  # files are followed
+    os.symlink(tmp_path / 'a', links / 'a')  # directories aren't, so nothing is found twice
+    os.symlink(tmp_path / 'gone.mkv', links / 'broken.mkv')
+    assert names(discover([str(links)])) == ['linked.mkv']
+
+    scandir = os.scandir
+
+    def unreadable_a1(path):
+        if str(path).endswith('a1'):
+            raise PermissionError(13, 'Permission denied', path)
+        return scandir(path)
+
+    monkeypatch.setattr(discovery_module.os, 'scandir', unreadable_a1)
+    assert sorted(names(discover([str(tmp_path / 'a')]))) == ['notes.txt', 'one.mkv', 'three.mkv']
@@ -0,0 +1,63 @@
+import PTN
+import pytest
+
+from turbopotato import fastparse
+
+CORPUS = (
+    'What.We.Do.in.the.Shadows.S02E05.720p.HDTV.x264-CROOKS.mkv',
+    'What.We.Do.in.the.Shadows.S02E06.720p.HDTV.x264-CROOKS.mkv',
+    'The.Daily.Show.2020.01.02.720p.WEB.h264-TBS.mkv',
+    'The.Late.Show.with.Stephen.Colbert.2020.02.14.720p.WEB.x264-TBS.mkv',
+    'Inception.2010.1080p.BluRay.x264-SPARKS.mkv',
+    'The.Matrix.1999.720p.BrRip.x264-YIFY.mp4',
+    'Parasite.2019.1080p.BluRay.x264-CtrlHD.mkv',
+    'Joker.2019.2160p.WEB-DL.x265-GRP.mkv',
+    'Show.Name.S01.720p.WEB-GRP',
+    'the.outsider.s01e03.1080p.web.h264-ggez.mkv',
+    'The.Boys.S02E01.1080p.WEB.H264-GGEZ.mkv',
+    'Westworld.S03E08.720p.HDTV.x264-AVS.mkv',
+    'Better.Call.Saul.S05E10.PROPER.720p.WEB.h264-TBS.mkv',
+    'Survivor.S40E01.HDTV.x264-CROOKS.mkv',
+    'Star.Trek.Picard.S01E10.1080p.WEBRip.x264-XLF.mkv',
+    'Chernobyl.S01E05.720p.HDTV.x264-AVS.srt',
+    'Some Movie (2019) [1080p]',
+    'Free.Solo.2018.720p.HDTV.x264-DHD.mkv',
+    'Last.Week.Tonight.with.John.Oliver.2020.03.01.720p.WEB.h264-GRP.mkv',
+    'Mythic.Quest.S01E09.1080p.WEB.H264-OATH.mkv',
+    'Dune.2021.2160p.WEB-DL.DDP5.1.HEVC-GRP.mkv',
+    'Tenet.2020.1080p.BluRay.DTS.5.1.x264-GRP.mkv',
+    'Heat.1995.DVDRip.XviD.AC3-GRP.avi',
+    'Ozark.S03E01.720p.WEBRip.AAC2.0.x265-GRP.mkv',
+    'Alien.1979.EXTENDED.1080p.BDRip.TrueHD.7.1.avc-GRP.mkv',
+    'Show.S01E02.720p.HDTV.x264-GRP.ssa',
+    'Movie.2019.1080P.BLURAY.X264-GRP.MKV',
+    # names the fast path defers to PTN
+    'The.Boys.S02E01.REPACK.1080p.AMZN.WEB-DL.DDP5.1.H.264-NTb.mkv',
+    'Blade.Runner.2049.2017.1080p.BluRay.x264-SPARKS.mkv',
+    'Show.S01E01.Pilot.720p.HDTV.x264-GRP.mkv',
+    'Season 1',
+    'Show.S01E02.720p.HDTV.x264-GRP.m4v',
+    'Movie.2019.1080p.HDRip.XviD-GRP.avi',
+)
+
+
+@pytest.mark.parametrize('name', CORPUS)
+def test_fastparse_equivalence(name):
+    fast_results = fastparse.parse(name)
+    if fast_results is None:
+        return
+    assert fast_results == PTN.parse(name)
+
+
+def test_fastparse_coverage():
+    parsed = [name for name in CORPUS if fastparse.parse(name)]
+    assert len(parsed) / len(CORPUS) > 0.75
+
+
+def test_fastparse_fallback():
+    assert fastparse.parse('Show.S01E01.Pilot.720p.HDTV.x264-GRP.mkv') is None
+    assert fastparse.parse('Blade.Runner.2049.2017.1080p.BluRay.x264-SPARKS.mkv') is None
+    assert fastparse.parse('Season 1') is None
+    # PTN doesn't treat these extensions as the filetype
+    assert fastparse.parse('Show.S01E02.720p.HDTV.x264-GRP.m4v') is None
+
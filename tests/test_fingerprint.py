@@ -0,0 +1,63 @@
+import hashlib
+import os
+import subprocess
+from types import SimpleNamespace
+
+from turbopotato.fingerprint import fingerprint
+from turbopotato.fingerprint import FingerprintIndex
+from turbopotato.fingerprint import SAMPLE_SIZE
+from turbopotato.media_defs import MediaType
+from turbopotato.media_defs import QueryResult
+from turbopotato.remote_index import REMOTE_FINGERPRINT
+
+
+def remote_fingerprint(path) -> str:
+    """What the NAS computes for the same file."""
+    script = REMOTE_FINGERPRINT % dict(sample=SAMPLE_SIZE)
+    return subprocess.run(['sh', '-c', script, 'sh', str(path)], capture_output=True, check=True).stdout.decode().strip()
+
+
+def test_fingerprint(tmp_path):
+    large = tmp_path / 'large.mkv'
+    content = os.urandom(3 * SAMPLE_SIZE)
+    large.write_bytes(content)
+    digest = hashlib.sha256(content[:SAMPLE_SIZE] + content[-SAMPLE_SIZE:]).hexdigest()
+    assert fingerprint(large) == f'{len(content)}:{digest}' == remote_fingerprint(large)
+
+    # the middle of a file isn't sampled
+    changed = content[:SAMPLE_SIZE] + bytes(SAMPLE_SIZE) + content[-SAMPLE_SIZE:]
+    large.write_bytes(changed)
+    assert fingerprint(large) == f'{len(content)}:{digest}'
+
+    # samples overlap in files smaller than two of them
+    small = tmp_path / 'small.srt'
+    small.write_bytes(b'x' * (SAMPLE_SIZE + 10))
+    assert fingerprint(small) == remote_fingerprint(small)
+    assert fingerprint(small) != fingerprint(large)
+
+    empty = tmp_path / 'empty.mkv'
+    empty.touch()
+    assert fingerprint(empty) == f'0:{hashlib.sha256().hexdigest()}' == remote_fingerprint(empty)
+
+    assert fingerprint(tmp_path / 'missing.mkv') is None
+    assert fingerprint(tmp_path) is None
+
+
+def test_index(tmp_path):
+    movie = QueryResult(data=dict(id=42, title='Movie', release_date='2019-05-01'), media_type=MediaType.MOVIE)
+    file = SimpleNamespace(filepath=tmp_path / 'movie.mkv', fingerprint='5:abc', chosen_one=movie)
+    index = FingerprintIndex(cache_dir=tmp_path)
+    index.set(file, '/volume1/Media/Movies/Movie (2019)/Movie (2019).mkv')
+    index.set(SimpleNamespace(filepath=file.filepath, fingerprint=None, chosen_one=movie), '/elsewhere')
+    index.save()
+
+    index = FingerprintIndex(cache_dir=tmp_path)
+    entry = index.get(file)
+    assert entry['chosen_one'] == movie and entry['destination'].endswith('Movie (2019).mkv')
+    assert index.get(SimpleNamespace(filepath=file.filepath, fingerprint='5:def')) is None
+    assert len(index.cache) == 1
+
+    # unusable entries are discarded
+    index.cache.set('6:bad', dict(destination='/x'))
+    assert index.get(SimpleNamespace(filepath=file.filepath, fingerprint='6:bad')) is None
+    assert '6:bad' not in index.cache
@@ -0,0 +1,66 @@
+from turbopotato import follow as follow_module
+from turbopotato.follow import TorrentFollower
+
+
+class Item(dict):
+    __getattr__ = dict.__getitem__
+
+
+class StubClient:
+    """A two-episode torrent whose second episode finishes on the second poll."""
+    def __init__(self, save_path):
+        self.torrent = Item(name='Show.S01', hash='abc', state='downloading', category='', save_path=str(save_path))
+        self.files = [Item(name='Show.S01/Show.S01E01.mkv', priority=1, progress=1.0, piece_range=[0, 1]),
+                      Item(name='Show.S01/Show.S01E02.mkv', priority=1, progress=0.5, piece_range=[1, 3]),
+                      Item(name='Show.S01/sample.txt', priority=1, progress=0.0, piece_range=[3, 3]),
+                      Item(name='Show.S01/Show.S01E03.mkv', priority=0, progress=0.0, piece_range=[3, 3])]
+        self.piece_states = [2, 2, 1, 0]
+
+    def torrents_info(self, torrent_hashes):
+        return [self.torrent]
+
+    def torrents_files(self, torrent_hash):
+        return self.files
+
+    def torrents_piece_states(self, torrent_hash):
+        return self.piece_states
+
+
+class StubManifest:
+    def __init__(self):
+        self.done = set()
+
+    def is_done(self, path, stat=None):
+        return str(path) in self.done
+
+
+def test_files_are_processed_as_each_completes(tmp_path, monkeypatch):
+    (tmp_path / 'Show.S01').mkdir()
+    for name in ('Show.S01E01.mkv', 'Show.S01E02.mkv'):
+        (tmp_path / 'Show.S01' / name).write_bytes(b'\x1a\x45\xdf\xa3' + b'\0' * 1024)  # Matroska
+    manifest = StubManifest()
+    monkeypatch.setattr(follow_module, 'manifest', manifest)
+    updates = list()
+    monkeypatch.setattr('turbopotato.media.update_torrent', lambda torrent, **kwargs: updates.append(kwargs))
+
+    processed = list()
+
+    def process(paths):
+        processed.append(sorted(p.rsplit('/', 1)[1] for p in paths))
+        manifest.done.update(paths)
+
+    client = StubClient(tmp_path)
+    follower = TorrentFollower('abc', process=process, client=client)
+    assert not follower.poll()
+    assert processed == [['Show.S01E01.mkv']] and not updates
+
+    # complete, but a piece of it isn't hash-checked yet
+    client.files[1]['progress'] = 1.0
+    assert not follower.poll()
+    assert processed == [['Show.S01E01.mkv']]
+
+    client.piece_states = [2, 2, 2, 2]
+    client.torrent['state'] = 'uploading'
+    assert follower.poll()
+    assert processed == [['Show.S01E01.mkv'], ['Show.S01E02.mkv']]
+    assert updates == [dict(success=True, force_deletion=False)]
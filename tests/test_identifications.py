@@ -0,0 +1,50 @@
+import os
+from types import SimpleNamespace
+
+from turbopotato.identifications import IdentificationCache
+from turbopotato.media_defs import MediaType
+from turbopotato.media_defs import QueryResult
+
+
+def make_file(tmp_path, chosen_one=None):
+    filepath = tmp_path / 'Show.S01E02.mkv'
+    if not filepath.exists():
+        filepath.write_bytes(b'video')
+    return SimpleNamespace(filepath=filepath, torrent_hash='abc', torrent_relative_path='Show.S01E02.mkv',
+                           chosen_one=chosen_one)
+
+
+def test_chosen_one_round_trips_until_file_changes(tmp_path):
+    episode = QueryResult(data=dict(airedSeason=1, airedEpisodeNumber=2, episodeName='Two', firstAired='2020-01-02',
+                                    _series=dict(id=7, seriesName='Show', network='Net', _search_term='parent')),
+                          media_type=MediaType.SERIES)
+    episode.genre_ids = {99}
+    cache = IdentificationCache(cache_dir=tmp_path)
+    cache.set(make_file(tmp_path, chosen_one=episode))
+    cache.save()
+
+    cache = IdentificationCache(cache_dir=tmp_path)
+    restored = cache.get(make_file(tmp_path))
+    assert restored == episode
+    assert restored.to_dict() == episode.to_dict()
+    assert (restored.series_id, restored.network, restored.provider, restored.search_term) == (7, 'Net', 'tvdb', 'parent')
+    assert restored.is_documentary()
+
+    movie = QueryResult(data=dict(id=42, title='Movie', release_date='2019-05-01', genre_ids=[35]),
+                        media_type=MediaType.MOVIE)
+    assert QueryResult.from_dict(movie.to_dict()).to_dict() == movie.to_dict()
+
+    # a changed file is identified afresh
+    file = make_file(tmp_path)
+    stat = os.stat(file.filepath)
+    os.utime(file.filepath, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert cache.get(file) is None
+    assert cache.get(make_file(tmp_path)) is None  # and the entry is gone
+
+
+def test_invalidate(tmp_path):
+    cache = IdentificationCache(cache_dir=tmp_path)
+    movie = QueryResult(data=dict(id=42, title='Movie', release_date='2019-05-01'), media_type=MediaType.MOVIE)
+    cache.set(make_file(tmp_path, chosen_one=movie))
+    cache.invalidate(make_file(tmp_path))
+    assert cache.get(make_file(tmp_path)) is None
@@ -0,0 +1,82 @@
+import os
+from pathlib import PurePosixPath
+
+from turbopotato import transports as transports_module
+from turbopotato.cache import AppendOnlyLog
+from turbopotato.journal import COMPLETED
+from turbopotato.journal import TransferJournal
+from turbopotato.supervisor import Transfer
+from turbopotato.transports import deliver
+from turbopotato.transports import Router
+from turbopotato.transports import Transport
+
+DESTINATION = PurePosixPath('/volume1/Media/Movies/Movie (2019)/Movie (2019).mkv')
+
+
+def make_journal(tmp_path) -> TransferJournal:
+    journal = TransferJournal()
+    journal.log = AppendOnlyLog('transfers', cache_dir=tmp_path, sync=True)
+    return journal
+
+
+def test_journal_resume_offset(tmp_path):
+    source = tmp_path / 'movie.mkv'
+    source.write_bytes(b'x' * 1000)
+    journal = make_journal(tmp_path)
+    journal.planned(source, DESTINATION)
+    journal.started(source, DESTINATION)
+    journal.progress(source, DESTINATION, offset=400)
+    assert journal.resume_offset(source, DESTINATION) == 0  # progress is only journaled periodically
+
+    # after a crash, a new process sees where the transfer stopped
+    journal.failed(source, DESTINATION)
+    restarted = make_journal(tmp_path)
+    assert restarted.resume_offset(source, DESTINATION) == 400
+    restarted.planned(source, DESTINATION)
+    assert restarted.resume_offset(source, DESTINATION) == 400
+
+    os.utime(source, ns=(0, 0))
+    assert restarted.resume_offset(source, DESTINATION) == 0
+
+    restarted.completed(source, DESTINATION)
+    assert restarted.records[(str(source), str(DESTINATION))]['state'] == COMPLETED
+    restarted.compact(force=True)
+    assert list(make_journal(tmp_path).log.read()) == []
+
+
+class FlakyTransport(Transport):
+    """Fails a file's first attempt part way through, then succeeds."""
+    name = 'flaky'
+
+    def __init__(self):
+        self.attempts = list()
+
+    def plan(self, entries, resume=None):
+        transfers = list()
+        for entry in entries:
+            resuming = resume(entry)
+            self.attempts.append(resuming)
+            script = 'echo "  1.50G  60%"' if resuming else 'echo "  1.50G  60%"; exit 12'
+            transfers.append(Transfer(command=['sh', '-c', script], host='test', context=entry[2]))
+        return transfers
+
+
+def test_deliver_retries_and_resumes(tmp_path, monkeypatch):
+    monkeypatch.setattr(transports_module, 'journal', make_journal(tmp_path))
+    source = tmp_path / 'movie.mkv'
+    source.write_bytes(b'x' * 1000)
+    transport = FlakyTransport()
+    results = list()
+
+    deliver([(source, DESTINATION, 'file')], backoff=0, router=Router(spec='', default=transport),
+            on_complete=lambda context, success, error: results.append((context, success, error)))
+    assert transport.attempts == [False, True]
+    assert results == [('file', True, None)]
+
+    transport = FlakyTransport()
+    results.clear()
+    deliver([(tmp_path / 'movie.mkv', DESTINATION.with_name('other.mkv'), 'file')], retries=0, backoff=0,
+            router=Router(spec='', default=transport),
+            on_complete=lambda context, success, error: results.append((context, success, error)))
+    assert transport.attempts == [False]
+    assert results[0][1] is False and results[0][2] is not None
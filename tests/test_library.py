@@ -0,0 +1,45 @@
+from pathlib import PurePosixPath
+
+from turbopotato.library import LibraryCatalog
+from turbopotato.media_defs import MediaNameParse
+from turbopotato.media_defs import MediaType
+from turbopotato.media_defs import QueryResult
+from turbopotato.remote_index import RemoteLibraryIndex
+
+SHOW = PurePosixPath('/volume1/Media/TV Shows/Doctor Who (2005)')
+MOVIE = PurePosixPath('/volume1/Media/Movies/Movie (2019)')
+
+
+def make_catalog(tmp_path) -> LibraryCatalog:
+    index = RemoteLibraryIndex(cache_dir=tmp_path)
+    index.add(SHOW / 'Season 1' / 'Doctor Who (2005) - S01E01 - Rose.mkv', size=1)
+    index.add(MOVIE / 'Movie (2019).mkv', size=1)
+    return LibraryCatalog(cache_dir=tmp_path, index=index)
+
+
+def test_returning_show_resolves_to_series_id(tmp_path):
+    catalog = make_catalog(tmp_path)
+    episode = QueryResult(data=dict(airedSeason=1, airedEpisode=1, episodeName='Rose',
+                                    _series=dict(id=78804, seriesName='Doctor Who (2005)', network='BBC One')),
+                          media_type=MediaType.SERIES)
+    catalog.record(episode, SHOW / 'Season 1')
+    movie = QueryResult(data=dict(id=42, title='Movie', release_date='2019-01-01'), media_type=MediaType.MOVIE)
+    catalog.record(movie, MOVIE)
+    catalog.save()
+
+    catalog = make_catalog(tmp_path)
+    parts = MediaNameParse(MediaType.SERIES, title='Doctor Who', year=2005, season=2, episode=3)
+    assert catalog.identify(parts) == str(SHOW)
+    assert parts.series_id == 78804
+    assert catalog.series(78804)['network'] == 'BBC One'
+
+    parent = MediaNameParse(MediaType.MOVIE, title='Movie', year=2019)
+    parts = MediaNameParse(MediaType.MOVIE, title='movie 2019 1080p', parent_parts=parent)
+    assert catalog.identify(parts) == str(MOVIE)
+    assert parts.movie_id == 42
+
+    # unknown titles, and folders no longer on the NAS, still go to the databases
+    assert catalog.identify(MediaNameParse(MediaType.SERIES, title='Other Show', season=1, episode=1)) is None
+    catalog.index.files.pop(str(MOVIE / 'Movie (2019).mkv'))
+    catalog.index._directories = None
+    assert catalog.identify(MediaNameParse(MediaType.MOVIE, title='Movie', year=2019)) is None
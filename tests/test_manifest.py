@@ -0,0 +1,118 @@
+import os
+from pathlib import Path
+import subprocess
+import sys
+
+import pytest
+
+from turbopotato import arguments as arguments_module
+from turbopotato import media as media_module
+from turbopotato.arguments import Arguments
+from turbopotato.classifier import MediaClassifier
+from turbopotato.exceptions import NoMediaFiles
+from turbopotato.manifest import FAILURE
+from turbopotato.manifest import Manifest
+from turbopotato.manifest import SUCCESS
+from turbopotato.media import Media
+
+MKV = b'\x1a\x45\xdf\xa3' + b'\0' * 1024  # Matroska
+
+
+class Item(dict):
+    __getattr__ = dict.__getitem__
+
+
+def test_is_done(tmp_path):
+    video = tmp_path / 'video.mkv'
+    video.write_bytes(MKV)
+    manifest = Manifest(cache_dir=tmp_path / 'cache')
+    assert not manifest.is_done(video)
+
+    manifest.record(video, outcome=FAILURE)
+    assert not manifest.is_done(video)
+    manifest.record(video, outcome=SUCCESS, destination='/library/video.mkv')
+    assert manifest.is_done(video)
+    assert Manifest(cache_dir=tmp_path / 'cache').is_done(video)  # the latest record wins when reloaded
+
+    # a modified file is processed again
+    stat = video.stat()
+    os.utime(video, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert not manifest.is_done(video)
+    assert not manifest.is_done(tmp_path / 'missing.mkv')
+
+
+def test_compact(tmp_path):
+    kept, deleted = tmp_path / 'kept.mkv', tmp_path / 'deleted.mkv'
+    kept.write_bytes(MKV)
+    deleted.write_bytes(MKV)
+    manifest = Manifest(cache_dir=tmp_path / 'cache')
+    manifest.record(kept, outcome=FAILURE)
+    manifest.record(kept, outcome=SUCCESS)
+    manifest.record(deleted, outcome=SUCCESS)
+    deleted.unlink()
+
+    assert manifest.compact() == (3, 1)
+    assert manifest.is_done(kept)
+    assert len(list(Manifest(cache_dir=tmp_path / 'cache').log.read())) == 1
+
+
+@pytest.fixture
+def done_media(tmp_path, monkeypatch):
+    """A torrent directory with one video already transited and one not."""
+    (tmp_path / 'Show.S01').mkdir()
+    for name in ('Show.S01E01.mkv', 'Show.S01E02.mkv'):
+        (tmp_path / 'Show.S01' / name).write_bytes(MKV)
+    manifest = Manifest(cache_dir=tmp_path / 'cache')
+    manifest.record(tmp_path / 'Show.S01' / 'Show.S01E01.mkv', outcome=SUCCESS)
+    monkeypatch.setattr(arguments_module, 'manifest', manifest)
+    monkeypatch.setattr(arguments_module, 'classifier', MediaClassifier(cache_dir=tmp_path / 'cache'))
+    return tmp_path / 'Show.S01'
+
+
+def discovered(*argv: str):
+    args = Arguments()
+    args.ingest_arguments(args_override=list(argv))
+    return args, sorted(path.name for path in args.iter_media_files())
+
+
+def test_reprocess(done_media):
+    args, names = discovered(str(done_media))
+    assert names == ['Show.S01E02.mkv']
+    assert [path.name for path in args.done_paths] == ['Show.S01E01.mkv']
+
+    args, names = discovered('--reprocess', str(done_media))
+    assert names == ['Show.S01E01.mkv', 'Show.S01E02.mkv']
+    assert not args.done_paths
+
+
+def test_torrent_with_only_done_files_is_updated(done_media, monkeypatch):
+    (done_media / 'Show.S01E02.mkv').unlink()
+    torrent = Item(name='Show.S01', hash='abc', category='')
+
+    class StubTorrents:
+        @staticmethod
+        def get_torrent_by_filepath(relative_path):
+            return torrent if relative_path.startswith('Show.S01/') else None
+
+        @staticmethod
+        def is_transiting(torrent=None, torrent_hash=None):
+            return False
+
+    args = Arguments()
+    args.ingest_arguments(args_override=['--torrents', '--non-interactive', str(done_media)])
+    monkeypatch.setattr(media_module, 'args', args)
+    monkeypatch.setattr(media_module, 'torrents', StubTorrents)
+    updates = list()
+    monkeypatch.setattr(media_module, 'update_torrent', lambda torrent, success: updates.append((torrent.hash, success)))
+
+    with pytest.raises(NoMediaFiles):
+        Media()
+    assert updates == [('abc', True)]
+
+
+def test_subcommand_named_path_needs_guard(tmp_path):
+    (tmp_path / 'manifest').mkdir()
+    result = subprocess.run([sys.executable, '-m', 'turbopotato', 'manifest', 'compact'], cwd=tmp_path,
+                            capture_output=True, text=True, env=dict(os.environ, PYTHONPATH=str(Path(__file__).parent.parent)))
+    assert result.returncode != 0
+    assert 'turbopotato -- manifest' in result.stderr
@@ -0,0 +1,77 @@
+import asyncio
+from contextlib import nullcontext
+import threading
+from types import SimpleNamespace
+
+from turbopotato import media as media_module
+from turbopotato.arguments import Arguments
+from turbopotato.media import Media
+from turbopotato.media_defs import MediaType
+from turbopotato.media_defs import QueryResult
+from turbopotato.query import DBQuery
+
+
+class Item(dict):
+    __getattr__ = dict.__getitem__
+
+
+class Stub:
+    """Accepts any call; stands in for the persistent caches transit records to."""
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+class StubTorrents:
+    torrent = Item(name='Movie.2019', hash='abc', category='')
+
+    @classmethod
+    def get_torrent_by_filepath(cls, relative_path):
+        return cls.torrent if relative_path.startswith('Movie.2019/') else None
+
+    @staticmethod
+    def is_transiting(torrent=None, torrent_hash=None):
+        return False
+
+
+def test_torrents_are_released_off_the_event_loop(tmp_path, monkeypatch):
+    (tmp_path / 'Movie.2019').mkdir()
+    source = tmp_path / 'Movie.2019' / 'Movie.2019.mkv'
+    source.write_bytes(b'video')
+
+    args = Arguments()
+    args.ingest_arguments(args_override=['--torrents', '--non-interactive', str(source)])
+    monkeypatch.setattr(media_module, 'args', args)
+    monkeypatch.setattr(media_module, 'torrents', StubTorrents)
+    for name in ('identifications', 'fingerprints', 'manifest', 'library', 'planner'):
+        monkeypatch.setattr(media_module, name, Stub())
+    monkeypatch.setattr(media_module, 'remote_index', SimpleNamespace(refresh=lambda root: None, present=lambda _: set(),
+                                                                       add=lambda *a, **k: None, save=lambda: None))
+    monkeypatch.setattr(media_module, 'ssh_master', SimpleNamespace(session=nullcontext))
+
+    updates = list()
+    monkeypatch.setattr(media_module, 'update_torrent', lambda torrent, success: updates.append(
+        (torrent.hash, success, threading.current_thread() is threading.main_thread())))
+
+    def deliver(entries, on_complete, schedule, **kwargs):
+        async def supervise():
+            for _, _, file in entries:
+                on_complete(file, True, None)
+                schedule.completed(file)
+            await asyncio.sleep(0)
+            assert not updates or not updates[0][2]
+        schedule.add(entries)
+        asyncio.run(supervise())
+
+    monkeypatch.setattr(media_module, 'deliver', deliver)
+
+    media = Media(filepaths=[source])
+    file = media.files[0]
+    file.query = DBQuery()
+    file.chosen_one = QueryResult(data=dict(title='Movie', release_date='2019-01-01', genre_ids=set()),
+                                  media_type=MediaType.MOVIE)
+    media.transit()
+
+    # the torrent was updated by the time transit returned, but not from the event loop's thread
+    assert file.success
+    assert updates == [('abc', True, False)]
+    assert media.updated_torrents == {'abc'}
@@ -0,0 +1,100 @@
+import json
+import os
+from pathlib import Path
+
+from turbopotato import overrides as overrides_module
+from turbopotato.media_defs import MediaNameParse
+from turbopotato.media_defs import MediaType
+from turbopotato.overrides import AhoCorasick
+from turbopotato.overrides import Overrides
+from turbopotato.parser import parse
+
+
+def write_overrides(filepath: Path, data: list):
+    with open(filepath, 'w') as f:
+        json.dump(data, f)
+
+
+def test_packaged_overrides():
+    parsed = parse(Path('The.Boys.S02E01.1080p.WEB.H264-GGEZ.mkv'))
+    assert parsed.series_id == 355567
+
+
+def test_aho_corasick():
+    matcher = AhoCorasick({'he': 0, 'she': 1, 'hers': 2, 'his': 3})
+    assert sorted(matcher.search('ushers')) == [0, 1, 2]
+    assert list(matcher.search('xyz')) == []
+
+
+def test_override_matching(tmp_path):
+    filepath = tmp_path / 'overrides.json'
+    write_overrides(filepath, [
+        {'exact': 'the office', 'series_id': 1},
+        {'match': 'the office us', 'series_id': 2},
+        {'regex': r'^doctor who \(?2005', 'series_id': 3, 'season_offset': -1},
+        {'match': 'some movie', 'movie_id': 4},
+    ])
+    table = Overrides(filepath=filepath)
+
+    assert table.match('The  Office').series_id == 1
+    assert table.match('The Office US').series_id == 2
+    assert table.match('Some Movie Extended').movie_id == 4
+    assert table.match('Another Title') is None
+
+    parts = MediaNameParse(media_type=MediaType.SERIES, title='Doctor Who 2005', season=12, episode=1)
+    table.apply(parts)
+    assert parts.series_id == 3
+    assert parts.season == 11
+
+
+def test_override_priority(tmp_path):
+    filepath = tmp_path / 'overrides.json'
+    write_overrides(filepath, [
+        {'regex': 'show', 'series_id': 1},
+        {'regex': 'the', 'series_id': 2},
+        {'regex': r'(?P<name>movie) (?P=name)', 'movie_id': 3},
+        {'match': 'movie', 'movie_id': 4},
+        {'regex': 'movie', 'movie_id': 5},
+    ])
+    table = Overrides(filepath=filepath)
+
+    # the first listed override wins, not the one matching earliest in the title
+    assert table.match('the show').series_id == 1
+    assert table.match('the other').series_id == 2
+    # a regex's own named groups don't confuse the match
+    assert table.match('movie movie').movie_id == 3
+    assert table.match('a movie').movie_id == 4
+
+
+def test_many_regex_overrides(tmp_path):
+    filepath = tmp_path / 'overrides.json'
+    overrides = [{'regex': rf'^title {i}( |$)', 'series_id': i} for i in range(500)]
+    overrides.insert(400, {'regex': r'(show) \1', 'series_id': 9999})
+    write_overrides(filepath, overrides)
+    table = Overrides(filepath=filepath)
+
+    assert table.match('Title 123 (2019)').series_id == 123
+    # regexes share one pattern; one with a backreference is matched on its own
+    assert len(table._regexes) == 1
+    assert table.match('title 7').series_id == 7
+    assert table.match('show show').series_id == 9999
+    assert table.match('title 499 show show').series_id == 9999
+    assert table.match('title 3 show show').series_id == 3
+    assert table.match('untitled') is None
+
+    # a regex listed first wins even when a later one matches earlier in the title
+    write_overrides(filepath, [{'regex': r'show$', 'series_id': 1}, {'regex': r'^the', 'series_id': 2}])
+    assert Overrides(filepath=filepath).match('the show').series_id == 1
+
+
+def test_override_reload(tmp_path, monkeypatch):
+    monkeypatch.setattr(overrides_module, 'RELOAD_INTERVAL', 0)
+    filepath = tmp_path / 'overrides.json'
+    write_overrides(filepath, [{'match': 'first', 'series_id': 1}])
+    table = Overrides(filepath=filepath)
+    assert table.match('first').series_id == 1
+
+    write_overrides(filepath, [{'match': 'second', 'series_id': 2}])
+    os.utime(filepath, ns=(0, os.stat(filepath).st_mtime_ns + 1))
+    assert table.match('first') is None
+    assert table.match('second').series_id == 2
@@ -0,0 +1,37 @@
+import os
+
+import pytest
+
+from turbopotato import parallel as parallel_module
+from turbopotato.parallel import map_chunked
+
+
+def tag_with_pid(items):
+    return [(item, os.getpid()) for item in items]
+
+
+def fail_on_seven(items):
+    if 7 in items:
+        raise ValueError('seven')
+    return items
+
+
+def test_small_batches_run_in_process():
+    assert map_chunked(tag_with_pid, range(5), threshold=10) == [(i, os.getpid()) for i in range(5)]
+    assert map_chunked(tag_with_pid, range(5), threshold=0) == [(i, os.getpid()) for i in range(5)]
+    assert map_chunked(tag_with_pid, range(20), threshold=10, workers=1) == [(i, os.getpid()) for i in range(20)]
+
+
+def test_chunks_keep_order(monkeypatch):
+    monkeypatch.setattr(parallel_module, 'CHUNK_SIZE', 3)
+    results = map_chunked(tag_with_pid, range(20), threshold=10, workers=2)
+    assert [item for item, _ in results] == list(range(20))
+    assert all(pid != os.getpid() for _, pid in results)
+    # contiguous items share a worker
+    assert len({pid for item, pid in results if item in (3, 4, 5)}) == 1
+
+
+def test_worker_exceptions_propagate(monkeypatch):
+    monkeypatch.setattr(parallel_module, 'CHUNK_SIZE', 3)
+    with pytest.raises(ValueError, match='seven'):
+        map_chunked(fail_on_seven, range(20), threshold=10, workers=2)
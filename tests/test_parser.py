@@ -2,19 +2,31 @@ from pathlib import Path
 
 import pytest
 
+from turbopotato.parser import _cached_parse_name
 from turbopotato.parser import parse
+from turbopotato.parser import parse_many
 from turbopotato.media_defs import MediaType
 
 
 def test_parser():
     filename = Path('What.We.Do.in.the.Shadows.S02E05.720p.HDTV.x264-CROOKS.mkv')
     parsed = parse(filename)
-    assert parsed.codec == 'x264'
-    assert parsed.container == 'mkv'
+    assert parsed.codec == 'H.264'
+    assert parsed.encoder == 'CROOKS'
     assert parsed.episode == 5
-    assert parsed.group == 'CROOKS.mkv'
+    assert parsed.filetype == 'MKV'
     assert parsed.media_type is MediaType.SERIES
     assert parsed.quality == 'HDTV'
     assert parsed.resolution == '720p'
     assert parsed.season == 2
     assert parsed.title == 'What We Do in the Shadows'
+
+
+def test_parse_many():
+    filepaths = [Path(f'Show.Name.S01.720p.WEB-GRP/Season 1/Show.Name.S01E{e:02d}.720p.WEB-GRP.mkv') for e in range(1, 4)]
+    _cached_parse_name.cache_clear()  # other tests share the cache
+    parsed = parse_many(filepaths)
+    assert [p.episode for p in parsed] == [1, 2, 3]
+    assert all(p.parent_parts.title == 'Show Name' for p in parsed)
+    # three file names plus one shared parent directory
+    assert _cached_parse_name.cache_info().misses == 4
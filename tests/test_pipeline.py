@@ -0,0 +1,55 @@
+from turbopotato import pipeline as pipeline_module
+from turbopotato.pipeline import Pipeline
+
+
+def test_jobs_run_in_order(monkeypatch):
+    ran = list()
+
+    def run(paths, **options):
+        ran.append(paths)
+        if paths == ['bad']:
+            raise ValueError('bad path')
+        if paths == ['invalid']:
+            raise SystemExit(2)  # argparse rejecting the job's options
+
+    monkeypatch.setattr('turbopotato.main.run', run)
+    monkeypatch.setattr('turbopotato.log.configure_console_logging', lambda level: None)
+
+    pipeline = Pipeline()
+    job_ids = [pipeline.submit(paths=paths) for paths in (['a'], ['bad'], ['invalid'], ['b'])]
+    assert all(pipeline.status[job_id] == 'queued' for job_id in job_ids)
+    pipeline.start()
+    pipeline.stop(wait=True)
+
+    # a failed job doesn't take the worker down with it
+    assert ran == [['a'], ['bad'], ['invalid'], ['b']]
+    assert [pipeline.status[job_id] for job_id in job_ids] == ['done', 'failed', 'failed', 'done']
+
+
+def test_queued_duplicates_are_merged(monkeypatch):
+    ran = list()
+    monkeypatch.setattr('turbopotato.main.run', lambda paths, **options: ran.append(paths))
+    monkeypatch.setattr('turbopotato.log.configure_console_logging', lambda level: None)
+
+    pipeline = Pipeline()
+    job_id = pipeline.submit(paths=['a', 'b'], torrents=True)
+    assert pipeline.submit(paths=['b', 'a'], torrents=True) == job_id
+    assert pipeline.submit(paths=['a', 'b']) != job_id  # different options
+    pipeline.start()
+    pipeline.stop(wait=True)
+    assert len(ran) == 2
+
+    # once it has run, the same job can be queued again
+    assert pipeline.submit(paths=['a', 'b'], torrents=True) != job_id
+
+
+def test_finished_statuses_are_evicted(monkeypatch):
+    monkeypatch.setattr('turbopotato.main.run', lambda paths, **options: None)
+    monkeypatch.setattr('turbopotato.log.configure_console_logging', lambda level: None)
+    monkeypatch.setattr(pipeline_module, 'FINISHED_STATUSES', 2)
+
+    pipeline = Pipeline()
+    job_ids = [pipeline.submit(paths=[str(i)]) for i in range(4)]
+    pipeline.start()
+    pipeline.stop(wait=True)
+    assert pipeline.status == {job_ids[2]: 'done', job_ids[3]: 'done'}
@@ -0,0 +1,57 @@
+from types import SimpleNamespace
+
+from turbopotato import query as query_module
+from turbopotato.media_defs import MediaNameParse
+from turbopotato.media_defs import MediaType
+from turbopotato.media_defs import QueryResult
+from turbopotato.planner import QueryPlanner
+from turbopotato.planner import signatures
+from turbopotato.query import TVDBQuery
+
+
+def episode_parts(title='Show') -> MediaNameParse:
+    parent = MediaNameParse(MediaType.SERIES, title='Show', season=1)
+    return MediaNameParse(MediaType.SERIES, title=title, season=1, episode=2, parent_parts=parent)
+
+
+def test_plan_follows_recorded_outcomes(tmp_path):
+    planner = QueryPlanner(cache_dir=tmp_path)
+    parts = episode_parts(title='show s01e02')
+    assert planner.plan(parts) == (['tvdb', 'tmdb'], ['file', 'parent'])
+
+    result = QueryResult(data=dict(_series=dict(id=1, seriesName='Show', _search_term='parent')),
+                         media_type=MediaType.SERIES)
+    planner.record(parts, result)
+    planner.save()
+
+    planner = QueryPlanner(cache_dir=tmp_path)
+    assert planner.plan(parts) == (['tvdb', 'tmdb'], ['parent', 'file'])
+    # an unseen title with the same shape uses the generic signature
+    assert signatures(episode_parts(title='other'))[1] == signatures(parts)[1]
+    assert planner.plan(episode_parts(title='other')) == (['tvdb', 'tmdb'], ['parent', 'file'])
+    # an explicit ID isn't reordered
+    parts.series_id = 1
+    assert planner.plan(parts) == (['tvdb', 'tmdb'], ['file', 'parent'])
+
+
+def test_series_search_stops_at_first_exact_term(monkeypatch):
+    searched = list()
+
+    class Search:
+        def series(self, name):
+            searched.append(name)
+            return [dict(id=len(searched), seriesName='Show' if name == 'Show' else 'Showtime')]
+
+    monkeypatch.setattr(query_module, 'tvdb', SimpleNamespace(Search=Search))
+    parts = episode_parts(title='show s01e02')
+
+    query = TVDBQuery()
+    query._get_series(parts, parts.parent_parts, search_terms=['parent', 'file'])
+    assert searched == ['Show']
+    assert [s['seriesName'] for s in query.series_exact_match_list] == ['Show']
+
+    # a term without an exact match falls through to the next
+    searched.clear()
+    query = TVDBQuery()
+    query._get_series(parts, parts.parent_parts, search_terms=['file', 'parent'])
+    assert searched == ['show s01e02', 'Show']
@@ -0,0 +1,39 @@
+from turbopotato.progress import parse_line
+from turbopotato.progress import ProgressMonitor
+from turbopotato.supervisor import Transfer
+from turbopotato.supervisor import TransferSupervisor
+
+
+def test_parse_line():
+    event = parse_line('  1.23G  45%   98.76MB/s    0:01:02', name='movie.mkv')
+    assert event.name == 'movie.mkv'
+    assert event.bytes == 1230000000 and event.percent == 45
+    assert event.rate == 98760000 and event.eta == 62
+    assert not event.done and event.index is None
+
+    event = parse_line('2,734,686,208 100%  170.30kB/s    1:04:02 (xfr#3, to-chk=2/5)')
+    assert event.bytes == 2734686208 and event.rate == 170300 and event.eta == 3842
+    assert event.done and event.index == 3 and event.remaining == 2
+
+    assert parse_line('movie.mkv') is None
+    assert parse_line('sent 1.23G bytes  received 35 bytes  98.76M bytes/sec') is None
+
+
+def test_monitor_observers_and_summary():
+    monitor = ProgressMonitor()
+    events = list()
+    monitor.subscribe(events.append)
+    monitor.subscribe(lambda event: 1 / 0)  # a broken observer doesn't stop the others
+
+    transfer = Transfer(command=['sh', '-c', r'printf "  500  50%%  1.00kB/s  0:00:01\r  1,000 100%%  1.00kB/s  0:00:00\n"'],
+                        host='test', context='file')
+    transfer.on_progress = monitor.update
+    monitor.start('file', name='movie.mkv', offset=200)
+    TransferSupervisor().run([transfer])
+    summary = monitor.finish('file', success=True, size=1000)
+
+    assert [(e.name, e.bytes, e.percent) for e in events] == [('movie.mkv', 500, 50), ('movie.mkv', 1000, 100),
+                                                            ('movie.mkv', 1000, 100)]
+    assert events[-1].done
+    assert summary.success and summary.transferred == 800
+    assert monitor.pop('file') is summary and monitor.get('file') is None
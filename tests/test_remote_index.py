@@ -0,0 +1,141 @@
+import os
+from pathlib import Path, PurePosixPath
+import shutil
+import subprocess
+from types import SimpleNamespace
+
+from turbopotato import transports as transports_module
+from turbopotato.fingerprint import fingerprint
+from turbopotato.progress import monitor
+from turbopotato.remote_index import RemoteLibraryIndex
+from turbopotato.transit import SSHMaster
+from turbopotato.transports import deliver
+from turbopotato.transports import RemoteLinkTransfer
+from turbopotato.transports import Router
+from turbopotato.transports import RsyncTransport
+
+from tests.test_journal import make_journal
+
+# stand-in for ssh that runs the remote command locally
+FAKE_SSH = '''#!/bin/sh
+for arg; do command="$arg"; done
+exec sh -c "$command"
+'''
+
+
+def make_index(tmp_path) -> RemoteLibraryIndex:
+    ssh = tmp_path / 'ssh'
+    ssh.write_text(FAKE_SSH)
+    ssh.chmod(0o755)
+    return RemoteLibraryIndex(cache_dir=tmp_path / 'cache', master=SSHMaster(host='nas', ssh=str(ssh)))
+
+
+def test_refresh_and_present(tmp_path):
+    library = tmp_path / 'Media'
+    (library / 'Movies').mkdir(parents=True)
+    existing = library / 'Movies' / 'Movie (2019).mkv'
+    existing.write_bytes(b'a' * 200000)
+    partial = library / 'Movies' / '.rsync-partial' / 'Sequel (2021).mkv'
+    partial.parent.mkdir()
+    partial.write_bytes(b'c' * 100)
+    index = make_index(tmp_path)
+    index.refresh(PurePosixPath(library))
+    assert index.size(PurePosixPath(existing)) == 200000
+    assert index.size(PurePosixPath(partial)) is None  # an interrupted transfer isn't library content
+
+    # incremental refreshes pick up new files; a full refresh drops removed ones
+    added = library / 'Movies' / 'Other (2020).mkv'
+    added.write_bytes(b'b' * 10)
+    index.refresh(PurePosixPath(library))
+    assert index.size(PurePosixPath(added)) is None  # the listing is still current
+    index.refresh(PurePosixPath(library), max_age=0)
+    assert index.size(PurePosixPath(added)) == 10
+    assert str(library / 'Movies') in index.directories()
+    added.unlink()
+    index.refresh(PurePosixPath(library), full=True)
+    assert index.size(PurePosixPath(added)) is None
+    index.save()
+    assert make_index(tmp_path).size(PurePosixPath(existing)) == 200000
+
+    local = tmp_path / 'download.mkv'
+    local.write_bytes(b'a' * 200000)
+    different = tmp_path / 'different.mkv'
+    different.write_bytes(b'a' * 199999 + b'c')
+    assert index.present({PurePosixPath(existing): fingerprint(local)}) == {PurePosixPath(existing)}
+    assert index.present({PurePosixPath(existing): fingerprint(different)}) == set()
+    assert index.present({PurePosixPath(added): fingerprint(local), PurePosixPath(library / 'x.mkv'): None}) == set()
+
+
+
+def test_refresh_without_newerct(tmp_path, monkeypatch):
+    # a find like BusyBox's that lacks -newerct; records each attempt to use it
+    bin_dir = tmp_path / 'bin'
+    bin_dir.mkdir()
+    (bin_dir / 'find').write_text(f'''#!/bin/sh
+case "$*" in *-newerct*) echo >> {tmp_path / 'newerct'}; echo "find: unrecognized: -newerct" >&2; exit 1;; esac
+exec {shutil.which('find')} "$@"
+''')
+    (bin_dir / 'find').chmod(0o755)
+    monkeypatch.setenv('PATH', f'{bin_dir}{os.pathsep}{os.environ["PATH"]}')
+    library = tmp_path / 'Media'
+    library.mkdir()
+    index = make_index(tmp_path)
+    index.refresh(PurePosixPath(library))
+
+    for name in ('Movie (2019).mkv', 'Other (2020).mkv'):
+        (library / name).write_bytes(b'a' * 10)
+        index.refresh(PurePosixPath(library), max_age=0)
+        assert index.size(PurePosixPath(library / name)) == 10
+    assert (tmp_path / 'newerct').read_text() == '\n'  # checked once
+
+def test_duplicate_content_is_linked(tmp_path, monkeypatch):
+    monkeypatch.setattr(transports_module, 'journal', make_journal(tmp_path))
+    library = tmp_path / 'Media'
+    existing = library / 'TV Shows' / 'Show' / 'Season 1' / 'Show - S01E01 - Pilot.mkv'
+    existing.parent.mkdir(parents=True)
+    existing.write_bytes(b'a' * 200000)
+    index = make_index(tmp_path)
+    index.refresh(PurePosixPath(library))
+
+    proper = tmp_path / 'Show.S01E01.PROPER.mkv'
+    proper.write_bytes(b'a' * 200000)
+    destination = PurePosixPath(library / 'TV Shows' / 'Show' / 'Season 1' / 'Show - S01E01 - Pilot (PROPER).mkv')
+    stats = list()
+
+    def on_complete(context, success, error):
+        stats.append((success, monitor.get(context).saved, monitor.get(context).transferred))
+
+    deliver([(proper, destination, 'file')], retries=0, router=Router(spec='', default=RsyncTransport(index=index)),
+            on_complete=on_complete)
+    assert stats == [(True, 200000, 0)]
+    assert Path(destination).stat().st_ino == existing.stat().st_ino
+
+
+def test_failed_link_leaves_no_temporary_file(tmp_path):
+    existing = tmp_path / 'Media' / 'Movie (2019).mkv'
+    existing.parent.mkdir()
+    existing.write_bytes(b'a' * 100)
+    # the destination is a directory whose entry for the temporary file can't be overwritten
+    destination = tmp_path / 'Media' / 'Movie (2019) (PROPER).mkv'
+    (destination / '.Movie (2019) (PROPER).mkv.turbopotato' / 'blocker').mkdir(parents=True)
+    transfer = RemoteLinkTransfer(tmp_path / 'download.mkv', PurePosixPath(existing), PurePosixPath(destination),
+                                  index=make_index(tmp_path))
+    assert subprocess.run(transfer.command).returncode != 0
+    assert sorted(path.name for path in existing.parent.iterdir()) == ['Movie (2019) (PROPER).mkv', 'Movie (2019).mkv']
+
+
+def test_plan_reuses_known_fingerprints(tmp_path, monkeypatch):
+    library = tmp_path / 'Media'
+    existing = library / 'Movie (2019).mkv'
+    existing.parent.mkdir()
+    existing.write_bytes(b'a' * 200000)
+    index = make_index(tmp_path)
+    index.refresh(PurePosixPath(library))
+    download = tmp_path / 'download.mkv'
+    download.write_bytes(b'a' * 200000)
+    file = SimpleNamespace(fingerprint=fingerprint(download))
+    monkeypatch.setattr(transports_module, 'fingerprint', None)  # fails if the file is fingerprinted again
+
+    destination = PurePosixPath(library / 'Movie (2019) (PROPER).mkv')
+    transfers = RsyncTransport(index=index).plan([(download, destination, file)])
+    assert [type(transfer) for transfer in transfers] == [RemoteLinkTransfer]
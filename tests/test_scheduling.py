@@ -0,0 +1,58 @@
+from pathlib import PurePosixPath
+
+from turbopotato import transports as transports_module
+from turbopotato.scheduling import parse_priorities
+from turbopotato.scheduling import TransferSchedule
+from turbopotato.supervisor import Transfer
+from turbopotato.transports import deliver
+from turbopotato.transports import Router
+from turbopotato.transports import Transport
+
+from tests.test_journal import make_journal
+
+SIZES = {'remux': 60, 'e1': 1, 'e2': 2, 'e3': 3, 'movie': 10}
+GROUPS = {'remux': 'a', 'e1': 'b', 'e2': 'b', 'e3': 'a', 'movie': 'c'}
+CATEGORIES = {'a': 'movies', 'b': 'tv', 'c': ''}
+
+
+class RecordingTransport(Transport):
+    """Sends each file with a no-op command, one at a time, recording the order."""
+    name = 'recording'
+
+    def plan(self, entries, resume=None):
+        return [Transfer(command=['true'], host='test', name=entry[2], context=entry[2]) for entry in entries]
+
+
+def run(tmp_path, monkeypatch, schedule: TransferSchedule):
+    monkeypatch.setattr(transports_module, 'journal', make_journal(tmp_path))
+    entries = list()
+    for name in SIZES:
+        source = tmp_path / name
+        source.write_bytes(b'')
+        entries.append((source, PurePosixPath('/volume1/Media') / name, name))
+    order = list()
+    deliver(entries, concurrency=1, router=Router(spec='', default=RecordingTransport()), schedule=schedule,
+            on_start=lambda transfer: order.append(transfer.name))
+    return order
+
+
+def make_schedule(policy: str, **kwargs) -> TransferSchedule:
+    return TransferSchedule(policy=policy, size=lambda entry: SIZES[entry[2]], group=lambda entry: GROUPS[entry[2]],
+                            category=lambda entry: CATEGORIES[GROUPS[entry[2]]], **kwargs)
+
+
+def test_policies(tmp_path, monkeypatch):
+    priorities = parse_priorities('tv=1; movies=2')
+    assert run(tmp_path, monkeypatch, make_schedule('fifo')) == list(SIZES)
+    assert run(tmp_path, monkeypatch, make_schedule('smallest')) == ['e1', 'e2', 'e3', 'movie', 'remux']
+    assert run(tmp_path, monkeypatch, make_schedule('torrent')) == ['e1', 'e2', 'movie', 'e3', 'remux']
+    assert run(tmp_path, monkeypatch, make_schedule('priority', priorities=priorities)) == \
+        ['e1', 'e2', 'e3', 'remux', 'movie']
+
+
+def test_group_completion(tmp_path, monkeypatch):
+    completed = list()
+    order = run(tmp_path, monkeypatch, make_schedule('torrent', on_group_complete=lambda group, contexts:
+                                                     completed.append((group, sorted(contexts)))))
+    assert order == ['e1', 'e2', 'movie', 'e3', 'remux']
+    assert completed == [('b', ['e1', 'e2']), ('c', ['movie']), ('a', ['e3', 'remux'])]
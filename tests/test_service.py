@@ -0,0 +1,45 @@
+import threading
+
+import pytest
+
+from turbopotato.client import ServiceError
+from turbopotato.client import request
+from turbopotato.client import status
+from turbopotato.client import submit
+from turbopotato.service import Service
+
+
+@pytest.fixture
+def service(tmp_path):
+    service = Service(socket_path=tmp_path / 'tp.sock')
+    service._bind()
+    thread = threading.Thread(target=service.server.serve_forever, daemon=True)
+    thread.start()
+    yield service
+    service.server.shutdown()
+    service.server.server_close()
+
+
+def test_round_trip(service):
+    socket_path = service.socket_path
+    assert request(dict(action='ping'), socket_path=socket_path) == dict(ok=True)
+
+    # the pipeline isn't started, so jobs stay queued
+    job_id = submit(socket_path=socket_path, paths=['/downloads/Show.S01'], reprocess=True)
+    assert status(job_id, socket_path=socket_path) == 'queued'
+    assert service.pipeline.jobs.get_nowait()[2] == dict(paths=['/downloads/Show.S01'], reprocess=True,
+                                                         interactive=False)
+
+    with pytest.raises(ServiceError, match='Unknown job options'):
+        submit(socket_path=socket_path, paths=['/downloads'], colour='blue')
+    with pytest.raises(ServiceError, match='paths or torrent_hashes'):
+        submit(socket_path=socket_path)
+    with pytest.raises(ServiceError, match='Unknown job ID'):
+        status(job_id + 100, socket_path=socket_path)
+    with pytest.raises(ServiceError, match='Unknown action'):
+        request(dict(action='dance'), socket_path=socket_path)
+
+
+def test_second_service_refuses_to_bind(service):
+    with pytest.raises(RuntimeError, match='already running'):
+        Service(socket_path=service.socket_path)._bind()
@@ -0,0 +1,31 @@
+import os
+import subprocess
+import sys
+
+# cold `import turbopotato.__main__` budget in milliseconds; override for slow CI hosts
+IMPORT_TIME_BUDGET = float(os.environ.get('TP_IMPORT_TIME_BUDGET', 400))
+
+HEAVY_MODULES = ('nltk', 'PyInquirer', 'prompt_toolkit', 'qbittorrentapi', 'tvdbsimple', 'tmdbsimple', 'requests',
+                 'pkg_resources')
+
+
+def python(*argv: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *argv], capture_output=True, text=True, check=True)
+
+
+def test_heavy_modules_load_lazily():
+    check = ('import sys, types, turbopotato.__main__; '
+             f'print(",".join(m for m in {HEAVY_MODULES!r} if type(sys.modules.get(m)) is types.ModuleType))')
+    assert python('-c', check).stdout.strip() == ''
+
+
+def test_import_time_budget():
+    stderr = python('-X', 'importtime', '-c', 'import turbopotato.__main__').stderr
+    cumulative = dict()
+    for line in stderr.splitlines():
+        # import time: <self us> | <cumulative us> | <module>
+        fields = [field.strip() for field in line.split('|')]
+        if line.startswith('import time:') and fields[1].isdigit():
+            cumulative[fields[2]] = int(fields[1])
+    elapsed = cumulative['turbopotato.__main__'] / 1000
+    assert elapsed < IMPORT_TIME_BUDGET, f'CLI imports took {elapsed:.0f}ms; budget is {IMPORT_TIME_BUDGET:.0f}ms'
@@ -0,0 +1,94 @@
+import threading
+import time
+
+import pytest
+
+from turbopotato.supervisor import InProcessTransfer
+from turbopotato.supervisor import Transfer
+from turbopotato.supervisor import TransferSupervisor
+from turbopotato.transit import RemoteExecuteSendCommandError
+from turbopotato.transit import RemoteExecuteSendCommandFailed
+from turbopotato.transit import RemoteExecuteStalled
+from turbopotato.transit import RemoteExecuteTimeout
+
+
+def shell(script: str, host: str = 'nas') -> Transfer:
+    return Transfer(command=['sh', '-c', script], host=host, name=script)
+
+
+def test_progress_output():
+    transfer = shell(r'printf "  10%%\r  50%%\r 100%%\nsent 1 bytes\n"')
+    TransferSupervisor().run([transfer])
+    assert transfer.success
+    assert list(transfer.output) == ['10%', '50%', '100%', 'sent 1 bytes']
+    assert transfer.progress_lines == 3
+
+
+def test_concurrency_scales_throughput():
+    def elapsed(concurrency: int) -> float:
+        start = time.monotonic()
+        transfers = TransferSupervisor(concurrency=concurrency).run([shell('sleep 0.5') for _ in range(4)])
+        assert all(t.success for t in transfers)
+        return time.monotonic() - start
+
+    assert elapsed(concurrency=4) < elapsed(concurrency=1) / 2
+
+
+def test_per_host_limit():
+    running = {'a': 0, 'b': 0}
+    peak = {'a': 0, 'b': 0}
+
+    def on_start(transfer: Transfer):
+        running[transfer.host] += 1
+        peak[transfer.host] = max(peak[transfer.host], running[transfer.host])
+
+    def on_complete(transfer: Transfer):
+        running[transfer.host] -= 1
+
+    transfers = [shell('sleep 0.2', host=host) for host in 'aaabbb']
+    TransferSupervisor(concurrency=4, per_host=2).run(transfers, on_start=on_start, on_complete=on_complete)
+    assert peak == {'a': 2, 'b': 2}
+
+
+def test_failures():
+    failed, missing = shell('echo oops; exit 3'), Transfer(command=['/nonexistent/rsync'])
+    TransferSupervisor().run([failed, missing])
+    assert isinstance(failed.error, RemoteExecuteSendCommandError) and failed.returncode == 3
+    assert isinstance(missing.error, RemoteExecuteSendCommandFailed)
+
+
+
+def test_in_process():
+    class NamedTransfer(InProcessTransfer):
+        def execute(self):
+            if self.name == 'failed':
+                raise OSError('disk full')
+
+    class IncompleteTransfer(InProcessTransfer):
+        pass
+
+    done, failed = NamedTransfer(name='done'), NamedTransfer(name='failed')
+    TransferSupervisor().run([done, failed])
+    assert done.success
+    assert isinstance(failed.error, RemoteExecuteSendCommandFailed) and 'disk full' in str(failed.error)
+    with pytest.raises(TypeError):
+        IncompleteTransfer(name='incomplete')
+
+def test_stall_and_timeout():
+    stalled = shell('echo started; sleep 5')
+    TransferSupervisor(stall_timeout=0.3).run([stalled])
+    assert isinstance(stalled.error, RemoteExecuteStalled)
+    assert stalled.returncode is not None
+
+    slow = shell('while true; do echo 1%; sleep 0.1; done')
+    TransferSupervisor(timeout=0.5, stall_timeout=1).run([slow])
+    assert isinstance(slow.error, RemoteExecuteTimeout)
+
+
+def test_cancel():
+    supervisor = TransferSupervisor(concurrency=1)
+    threading.Timer(0.3, supervisor.cancel).start()
+    start = time.monotonic()
+    transfers = supervisor.run([shell('sleep 5'), shell('sleep 5')])
+    assert time.monotonic() - start < 3
+    assert all(isinstance(t.error, RemoteExecuteSendCommandFailed) for t in transfers)
@@ -0,0 +1,120 @@
+import os
+from pathlib import Path, PurePosixPath
+import shutil
+import subprocess
+import time
+
+import pytest
+
+from turbopotato.config import config
+from turbopotato.transit import PARTIAL_DIR
+from turbopotato.transit import send_file_command
+from turbopotato.transit import send_files_command
+from turbopotato.transit import SSHMaster
+from turbopotato.transit import with_bwlimit
+
+# stand-in for ssh: a master "connection" is a file at the control path
+FAKE_SSH = r'''#!/bin/sh
+echo "$@" >> "$(dirname "$0")/ssh.log"
+while [ $# -gt 0 ]; do
+    case "$1" in
+        -o) case "$2" in ControlPath=*) path="${2#ControlPath=}" ;; ControlMaster=yes) master=1 ;; esac; shift 2 ;;
+        -O) op="$2"; shift 2 ;;
+        *) shift ;;
+    esac
+done
+case "$op" in
+    check) [ -e "$path" ]; exit $? ;;
+    exit) rm -f "$path"; exit 0 ;;
+esac
+[ -n "$master" ] && touch "$path"
+exit 0
+'''
+
+# stand-in for ssh that runs the remote command locally, for rsync's -e
+LOCAL_SSH = r'''#!/bin/sh
+while [ $# -gt 0 ]; do
+    case "$1" in
+        -o) shift 2 ;;
+        -*) shift ;;
+        *) break ;;
+    esac
+done
+shift
+exec sh -c "$*"
+'''
+
+
+def fake_ssh(tmp_path: Path) -> str:
+    script = tmp_path / 'ssh'
+    script.write_text(FAKE_SSH)
+    script.chmod(0o755)
+    return str(script)
+
+
+def test_master_lifecycle(tmp_path):
+    master = SSHMaster(host='nas', ssh=fake_ssh(tmp_path))
+    with master.session():
+        control_path = master.control_path
+        assert control_path.exists()
+        with master.session():
+            assert master.control_path == control_path
+        assert control_path.exists()
+        assert f'ControlPath={control_path}' in master.options()
+        assert f'ControlPath={control_path}' in master.rsync_shell()
+        assert master.command('ls /volume1')[-2:] == ['nas', 'ls /volume1']
+    assert master.control_path is None
+    assert not control_path.exists() and not control_path.parent.exists()
+    assert 'ControlPath' not in ' '.join(master.options())
+
+
+def test_master_restarts_when_connection_drops(tmp_path):
+    master = SSHMaster(host='nas', ssh=fake_ssh(tmp_path))
+    with master.session():
+        master.control_path.unlink()
+        with master.session():
+            assert master.is_alive()
+    log = (tmp_path / 'ssh.log').read_text()
+    assert log.count('ControlMaster=yes') == 2
+
+
+def test_master_unavailable():
+    master = SSHMaster(host='nas', ssh='false')
+    with master.session():
+        assert not master.is_alive()
+        assert master.options() == ['-o', 'compression=no']
+
+
+def test_partial_files_stay_out_of_the_library():
+    commands = [send_file_command(local_filepath=Path('/downloads/movie.mkv'),
+                                  remote_filepath=PurePosixPath('/volume1/Media/Movies/M/M.mkv')),
+                send_files_command(source_directory='/tmp/staging', files_from='/tmp/files',
+                                   remote_directory=PurePosixPath('/volume1/Media/Movies/M'))]
+    for command in commands:
+        assert f'--partial-dir={PARTIAL_DIR}' in command
+        assert not any(arg in ('--partial', '--inplace') or arg.startswith('--append') for arg in command)
+
+
+@pytest.mark.skipif(shutil.which('rsync') is None, reason='rsync is not installed')
+def test_interrupted_send_leaves_no_destination_file(tmp_path, monkeypatch):
+    ssh = tmp_path / 'ssh'
+    ssh.write_text(LOCAL_SSH)
+    ssh.chmod(0o755)
+    monkeypatch.setattr(config, 'SSH_COMMAND', str(ssh))
+    source = tmp_path / 'movie.mkv'
+    source.write_bytes(os.urandom(4 * 1024 * 1024))
+    destination = tmp_path / 'library' / 'Movie (2019)' / 'Movie (2019).mkv'
+    command = send_file_command(local_filepath=source, remote_filepath=destination, host='nas')
+
+    process = subprocess.Popen(with_bwlimit(command, 256 * 1024), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    time.sleep(2)
+    process.terminate()
+    process.wait()
+    assert not destination.exists()
+    partial = destination.parent / PARTIAL_DIR / destination.name
+    assert 0 < partial.stat().st_size < source.stat().st_size
+
+    # the next send picks up the partial file and only then creates the destination
+    subprocess.run(command, check=True, capture_output=True)
+    assert destination.read_bytes() == source.read_bytes()
+    assert not partial.exists()
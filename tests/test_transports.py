@@ -0,0 +1,104 @@
+import os
+from pathlib import Path, PurePosixPath
+
+import pytest
+
+from turbopotato import transports as transports_module
+from turbopotato.bandwidth import BandwidthScheduler
+from turbopotato.cache import AppendOnlyLog
+from turbopotato.config import config
+from turbopotato.journal import TransferJournal
+from turbopotato.supervisor import TransferSupervisor
+from turbopotato.transports import benchmark
+from turbopotato.transports import copy_file
+from turbopotato.transports import deliver
+from turbopotato.transports import hardlink_file
+from turbopotato.transports import move_file
+from turbopotato.transports import parse_per_host
+from turbopotato.transports import reflink_file
+from turbopotato.transports import Router
+
+CONTENT = os.urandom(3 * 1024 * 1024 + 17)
+
+
+def make_source(tmp_path: Path) -> Path:
+    source = tmp_path / 'source' / 'Show.S01E01.mkv'
+    source.parent.mkdir(exist_ok=True)
+    source.write_bytes(CONTENT)
+    return source
+
+
+@pytest.mark.parametrize('operation', [copy_file, reflink_file, hardlink_file, move_file])
+def test_local_operations(tmp_path, operation):
+    source = make_source(tmp_path)
+    destination = tmp_path / 'library' / 'Show' / 'Season 1' / 'Show - S01E01.mkv'
+    operation(source, destination)
+    assert destination.read_bytes() == CONTENT
+    assert os.listdir(destination.parent) == [destination.name]
+    assert source.exists() == (operation is not move_file)
+    if operation is hardlink_file:
+        assert os.stat(source).st_ino == os.stat(destination).st_ino
+
+
+def test_router(tmp_path):
+    router = Router(spec=f'/volume1/Media=copy:{tmp_path}/media; /volume1/Media/TV Shows=hardlink:{tmp_path}/tv')
+    assert router.transport(PurePosixPath('/volume1/Media/Movies/M (2019)/M (2019).mkv')).name == 'copy'
+    assert router.transport(PurePosixPath('/volume1/Media/TV Shows/S/Season 1/S - S01E01.mkv')).name == 'hardlink'
+    assert router.transport(PurePosixPath('/volume2/Other/file.mkv')).name == 'rsync'
+    with pytest.raises(ValueError):
+        Router(spec='/volume1/Media=teleport')
+
+    source = make_source(tmp_path)
+    transfers = router.plan([(source, PurePosixPath('/volume1/Media/TV Shows/S/Season 1/S - S01E01.mkv'), 'file')])
+    TransferSupervisor().run(transfers)
+    assert [t.success for t in transfers] == [True]
+    assert (tmp_path / 'tv' / 'S' / 'Season 1' / 'S - S01E01.mkv').read_bytes() == CONTENT
+
+
+def test_router_keeps_sources(tmp_path):
+    spec = f'/volume1/Media=move:{tmp_path}/media'
+    destination = PurePosixPath('/volume1/Media/Movies/M (2019)/M (2019).mkv')
+    assert Router(spec=spec).transport(destination).consumes_source
+
+    # e.g. a seeding torrent's file stays where qBittorrent expects it
+    router = Router(spec=spec, keep_sources=True)
+    assert router.transport(destination).name == 'hardlink'
+    source = make_source(tmp_path)
+    transfers = router.plan([(source, destination, 'file')])
+    TransferSupervisor().run(transfers)
+    assert [t.success for t in transfers] == [True]
+    assert source.read_bytes() == (tmp_path / 'media' / 'Movies' / 'M (2019)' / 'M (2019).mkv').read_bytes()
+
+
+def test_benchmark(tmp_path):
+    results = benchmark(make_source(tmp_path), tmp_path / 'bench')
+    assert set(results) == {'copy', 'reflink', 'hardlink', 'move'}
+    assert all(seconds >= 0 for seconds in results.values())
+    assert os.listdir(tmp_path / 'bench') == []
+
+
+def test_transfers_per_host(tmp_path, monkeypatch):
+    assert parse_per_host('') is None
+    assert parse_per_host(' 2 ') == 2
+    for spec in ('0', 'two'):
+        with pytest.raises(ValueError):
+            parse_per_host(spec)
+
+    journal = TransferJournal()
+    journal.log = AppendOnlyLog('transfers', cache_dir=tmp_path, sync=True)
+    monkeypatch.setattr(transports_module, 'journal', journal)
+    limits = list()
+
+    class Supervisor(TransferSupervisor):
+        def __init__(self, **kwargs):
+            super().__init__(**kwargs)
+            limits.append(self.per_host)
+
+    monkeypatch.setattr(transports_module, 'TransferSupervisor', Supervisor)
+    monkeypatch.setattr(config, 'TRANSFERS_PER_HOST', '2')
+    router = Router(spec=f'/volume1/Media=copy:{tmp_path}/media')
+    destination = PurePosixPath('/volume1/Media/Movies/M (2019)/M (2019).mkv')
+    for per_host in (None, 1):
+        deliver([(make_source(tmp_path), destination, 'file')], concurrency=4, per_host=per_host, router=router,
+                scheduler=BandwidthScheduler(schedule='', capacity=''))
+    assert limits == [2, 1]
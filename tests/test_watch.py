@@ -0,0 +1,82 @@
+import select
+
+from turbopotato.inotify import Event
+from turbopotato.inotify import IN_Q_OVERFLOW
+from turbopotato.watch import Watcher
+
+
+class Item(dict):
+    __getattr__ = dict.__getitem__
+
+
+class StubClient:
+    """One torrent saved to save_path whose only file is half downloaded."""
+    def __init__(self, save_path):
+        self.torrent = Item(name='Show.S01', hash='abc', state='downloading', save_path=str(save_path))
+        self.files = [Item(name='Show.S01/Show.S01E01.mkv', priority=1, progress=0.5, piece_range=[0, 1])]
+        self.piece_states = [2, 1]
+
+    def torrents_info(self):
+        return [self.torrent]
+
+    def torrents_files(self, torrent_hash):
+        return self.files
+
+    def torrents_piece_states(self, torrent_hash):
+        return self.piece_states
+
+
+def handle_events(watcher: Watcher):
+    while select.select([watcher.inotify], [], [], 0.1)[0]:
+        for event in watcher.inotify.read_events():
+            watcher.handle_event(event)
+
+
+def test_handle_event(tmp_path):
+    watcher = Watcher(directories=[str(tmp_path)], pipeline=None, settle=0)
+    try:
+        watcher.add_directory(str(tmp_path))
+        (tmp_path / 'Show.S01').mkdir()
+        handle_events(watcher)  # the new directory is watched too
+        (tmp_path / 'Show.S01' / 'Show.S01E01.mkv').write_bytes(b'video')
+        (tmp_path / 'Show.S01' / 'notes.txt').write_bytes(b'text')
+        (tmp_path / 'Show.S01' / 'Show.S01E02.mkv').write_bytes(b'video')
+        handle_events(watcher)
+        assert sorted(watcher.pending) == [str(tmp_path / 'Show.S01' / name)
+                                           for name in ('Show.S01E01.mkv', 'Show.S01E02.mkv')]
+        assert all(pending.closed for pending in watcher.pending.values())
+
+        (tmp_path / 'Show.S01' / 'Show.S01E02.mkv').unlink()
+        handle_events(watcher)
+        assert list(watcher.pending) == [str(tmp_path / 'Show.S01' / 'Show.S01E01.mkv')]
+
+        # nothing is ready until its size and mtime are seen unchanged
+        assert watcher.ready_files() == []
+        assert watcher.ready_files() == [str(tmp_path / 'Show.S01' / 'Show.S01E01.mkv')]
+        assert not watcher.pending
+
+        watcher.handle_event(Event(wd=-1, mask=IN_Q_OVERFLOW, cookie=0, name=''))
+        assert list(watcher.pending) == [str(tmp_path / 'Show.S01' / 'Show.S01E01.mkv')]
+    finally:
+        watcher.close()
+
+
+def test_torrent_files_wait_for_qbittorrent(tmp_path):
+    (tmp_path / 'Show.S01').mkdir()
+    path = tmp_path / 'Show.S01' / 'Show.S01E01.mkv'
+    path.write_bytes(b'video')
+    client = StubClient(tmp_path)
+    watcher = Watcher(directories=[str(tmp_path)], pipeline=None, job_options=dict(torrents=True), settle=0,
+                      client=client)
+    try:
+        watcher.add_directory(str(tmp_path), scan=True)
+        assert watcher.ready_files() == []
+        # unchanged on disk, e.g. a stalled download, but still incomplete
+        assert watcher.ready_files() == []
+
+        client.files[0]['progress'] = 1.0
+        assert watcher.ready_files() == []  # a piece isn't hash-checked yet
+        client.piece_states = [2, 2]
+        assert watcher.ready_files() == [str(path)]
+    finally:
+        watcher.close()
@@ -1,8 +1,32 @@
+import importlib
+import os
+import sys
+
 from turbopotato import run
 
+COMMANDS = {
+    'follow': 'turbopotato.follow',
+    'manifest': 'turbopotato.manifest',
+    'serve': 'turbopotato.service',
+    'transports': 'turbopotato.transports',
+    'watch': 'turbopotato.watch',
+}
+
 
 def main():
-    run()
+    """
+    Run `turbopotato <command> ...` subcommands, else process the path arguments.
+
+    Paths named like a subcommand follow a `--` guard, e.g. `turbopotato -- watch`.
+    """
+    command = sys.argv[1] if sys.argv[1:2] else None
+    if command in COMMANDS:
+        if os.path.exists(command):
+            sys.exit(f'turbopotato: "{command}" is both a subcommand and a path here; '
+                     f'use "turbopotato -- {command}" to process the path, or run the subcommand from another directory')
+        importlib.import_module(COMMANDS[command]).command(argv=sys.argv[2:])
+    else:
+        run()
 
 
 if __name__ == "__main__":
@@ -2,13 +2,47 @@ import argparse
 import logging
 import os
 from pathlib import Path
+from typing import Iterator, List
 
-from turbopotato.exceptions import NoMediaFiles
+from turbopotato.classifier import classifier
+from turbopotato.classifier import SUBTITLE
+from turbopotato.classifier import VIDEO
+from turbopotato.discovery import discover
 from turbopotato.extensions import extensions
+from turbopotato.manifest import manifest
+from turbopotato.parallel import DEFAULT_THRESHOLD
+from turbopotato.scheduling import DEFAULT_POLICY
+from turbopotato.scheduling import POLICIES
+from turbopotato.supervisor import DEFAULT_CONCURRENCY
 from turbopotato.torrents import torrents
 
 logger = logging.getLogger('args')
 
+MINIMUM_SUBTITLE_FILE_SIZE = 10240  # 10KB
+
+
+def is_media_file(path: Path = None, stat: os.stat_result = None) -> bool:
+    if path is None:
+        return False
+    kind = classifier.classify(path=path, stat=stat)
+    if kind not in (VIDEO, SUBTITLE):
+        return False
+    if kind == SUBTITLE:
+        try:
+            size = (stat or os.stat(str(path))).st_size
+        except Exception as e:
+            size = MINIMUM_SUBTITLE_FILE_SIZE
+            logger.error(f'Failed to stat file "{path}": {e}')
+        if size < MINIMUM_SUBTITLE_FILE_SIZE:
+            logger.debug(f'Skipping subtitle file smaller than 10KB: {path}')
+            return False
+    return True
+
+
+def has_media_extension(name: str) -> bool:
+    ext = os.path.splitext(name)[1]
+    return extensions.is_video_extension(ext=ext) or extensions.is_subtitle_extension(ext=ext)
+
 
 class Arguments:
     def __init__(self):
@@ -20,10 +54,19 @@ class Arguments:
         self.log_level = None
         self.interactive = None
         self.no_notification_on_failure = None
+        self.reprocess = None
+        self.parallel_threshold = None
+        self.workers = None
+        self.transfers = None
+        self.transfers_per_host = None
+        self.transfer_order = None
         self.paths = list()
-        self.files = set()
+        self.done_paths: List[Path] = list()  # files skipped by the last discovery as already transited
 
-        self._parser = argparse.ArgumentParser(prog='turbopotato', description='transmit torrents')
+        self._parser = argparse.ArgumentParser(prog='turbopotato', description='transmit torrents',
+                                               epilog='subcommands: follow, manifest, serve, transports, watch '
+                                                      '(turbopotato <subcommand> -h); put "--" before paths '
+                                                      'named like a subcommand')
         self._parser.add_argument('-t', '--torrents',
                                   action='store_true',
                                   help='specify if media files are part of a torrent in qBittorrent')
@@ -48,6 +91,37 @@ class Arguments:
         self._parser.add_argument('-n', '--no-notification-on-failure', '--no_notification_on_failure',
                                   action='store_true',
                                   help='don\'t send notifications if processing is unsuccessful')
+        self._parser.add_argument('-r', '--reprocess',
+                                  action='store_true',
+                                  help='process files even if they were already transited successfully')
+        self._parser.add_argument('--parallel-threshold',
+                                  action='store',
+                                  default=DEFAULT_THRESHOLD,
+                                  type=int,
+                                  help='minimum number of files before parsing in a process pool (0 to disable)')
+        self._parser.add_argument('--workers',
+                                  action='store',
+                                  default=None,
+                                  type=int,
+                                  help='number of processes for parallel parsing (default: number of CPUs)')
+        self._parser.add_argument('--transfers',
+                                  action='store',
+                                  default=DEFAULT_CONCURRENCY,
+                                  type=int,
+                                  help='number of files to transfer concurrently')
+        self._parser.add_argument('--transfers-per-host',
+                                  action='store',
+                                  default=None,
+                                  type=int,
+                                  help='number of files to transfer concurrently to any one host '
+                                       '(default: TP_TRANSFERS_PER_HOST, else --transfers)')
+        self._parser.add_argument('--transfer-order',
+                                  action='store',
+                                  choices=POLICIES,
+                                  default=DEFAULT_POLICY,
+                                  type=str,
+                                  help='order to send files in: as found, smallest first, torrent by torrent, '
+                                       'or by category priority (TP_CATEGORY_PRIORITY)')
         self._parser.add_argument('paths',
                                   nargs='+',
                                   type=str,
@@ -63,41 +137,34 @@ class Arguments:
         self.log_level = self.args.log_level
         self.interactive = not self.args.non_interactive
         self.no_notification_on_failure = self.args.no_notification_on_failure or False
+        self.reprocess = self.args.reprocess or False
+        self.parallel_threshold = self.args.parallel_threshold
+        self.workers = self.args.workers
+        self.transfers = self.args.transfers
+        self.transfers_per_host = self.args.transfers_per_host
+        self.transfer_order = self.args.transfer_order
         self.paths = self.args.paths
 
-    def process_arguments(self):
+    def iter_media_files(self) -> Iterator[Path]:
+        """Stream media files found in the path arguments."""
         full_paths = [os.path.abspath(os.path.realpath(os.path.expanduser(path))) for path in self.paths]
-        for path in full_paths:
-            if os.path.isfile(path):
-                self._add_media_file(Path(path))
-            elif os.path.isdir(path):
-                for dir, _, dir_files in os.walk(path):
-                    for file in dir_files:
-                        self._add_media_file(Path(dir, file))
-            else:
-                logger.warning(f'Invalid path argument: {path}')
-
-        if not self.files:
-            raise NoMediaFiles
+        seen = set()
+        self.done_paths = list()
+        for candidate in discover(full_paths, accept=has_media_extension):
+            if candidate.path in seen:  # overlapping path arguments
+                continue
+            seen.add(candidate.path)
+            if not self.reprocess and manifest.is_done(candidate.path, stat=candidate.stat):
+                logger.debug(f'Skipping file already transited: {candidate.path}')
+                self.done_paths.append(candidate.path)
+                continue
+            if is_media_file(candidate.path, stat=candidate.stat):
+                yield candidate.path
+        classifier.save()
 
+    def process_arguments(self):
         if self.torrents:
             torrents.qbt_client.auth_log_in()
 
-    def _add_media_file(self, path: Path = None):
-        minimum_subtitle_file_size = 10240  # 10KB
-        if path is None:
-            return
-        file_extension = path.suffix
-        if extensions.is_video_extension(ext=file_extension):
-            try:
-                size = os.stat(str(path)).st_size
-            except Exception as e:
-                size = minimum_subtitle_file_size
-                logger.error(f'Failed to stat file "{path}": {e}')
-            if extensions.is_subtitle_extension(ext=file_extension) and (size < minimum_subtitle_file_size):
-                logger.debug(f'Skipping subtitle file smaller than 10KB: {path}')
-            else:
-                self.files.add(path)
-
 
 args = Arguments()
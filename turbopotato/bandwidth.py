@@ -0,0 +1,150 @@
+from collections import namedtuple
+from datetime import datetime
+import logging
+import threading
+import time
+from typing import Any, Callable, List, Union
+
+from turbopotato.config import config
+from turbopotato.progress import human_size
+from turbopotato.progress import UNITS
+from turbopotato.torrents import torrents
+
+logger = logging.getLogger('bandwidth')
+
+ADAPTIVE_INTERVAL = 60  # seconds between qBittorrent transfer info queries
+SEEDING_HEADROOM = 0.25  # room left for seeding to grow beyond its current upload rate
+SEEDING_RESERVE = 0.2  # share of upload capacity always left to seeding
+MINIMUM_SHARE = 0.1  # share of upload capacity transfers always get
+RESCHEDULE_INTERVAL = 10 * 60  # seconds a transfer runs before it may be restarted with a new limit
+RESCHEDULE_TOLERANCE = 0.25  # relative change in a transfer's limit that warrants restarting it
+MAX_RESCHEDULES = 3  # restarts of one file under a new limit; each makes rsync checksum its partial file again
+
+Window = namedtuple('Window', 'start end rate')  # minutes past midnight, rate in bytes/s (None for unlimited)
+
+
+def parse_rate(rate: str) -> Union[int, None]:
+    """Bytes/s from e.g. "500K", "12.5M" or "1G" (powers of 1000); "0", "off" or "unlimited" mean no limit."""
+    rate = rate.strip()
+    if rate.lower() in ('', '0', 'off', 'none', 'unlimited'):
+        return None
+    unit = rate[-1] if rate[-1] in UNITS else ''
+    try:
+        value = float(rate[:len(rate) - len(unit)])
+    except ValueError:
+        raise ValueError(f'Invalid rate "{rate}"; expected e.g. 500K, 12.5M or 1G') from None
+    return int(value * UNITS[unit]) or None
+
+
+def parse_time(value: str) -> int:
+    try:
+        hours, minutes = (int(part) for part in value.strip().split(':'))
+    except ValueError:
+        raise ValueError(f'Invalid time "{value}"; expected HH:MM') from None
+    if not (0 <= hours <= 24 and 0 <= minutes < 60) or hours * 60 + minutes > 24 * 60:
+        raise ValueError(f'Invalid time "{value}"; expected HH:MM')
+    return hours * 60 + minutes
+
+
+def limit_changed(applied: Union[int, None], current: Union[int, None]) -> bool:
+    if applied is None or current is None:
+        return applied != current
+    return abs(current - applied) > RESCHEDULE_TOLERANCE * applied
+
+
+def describe(rate: Union[int, None]) -> str:
+    return 'unlimited' if rate is None else f'{human_size(rate)}/s'
+
+
+class BandwidthScheduler:
+    """
+    Decide how fast uploads to the NAS may go.
+
+    Time windows come from TP_BANDWIDTH_SCHEDULE as `;`-separated `HH:MM-HH:MM=<rate>` entries, e.g.
+        07:00-23:00=5M;23:00-07:00=0
+    where a rate of 0 means unlimited; times outside every window are unlimited. If TP_UPLOAD_CAPACITY
+    (the link's upload rate, e.g. 12.5M) is set, the limit also adapts to qBittorrent's current upload
+    rate so transfers use the spare capacity while seeding keeps room to grow. Limits are asked for
+    from the transfer supervisor's event loop, so they only read the last known upload rate; a stale
+    one is refreshed on a background thread.
+
+    :param schedule: window spec; defaults to TP_BANDWIDTH_SCHEDULE
+    :param capacity: upload capacity; defaults to TP_UPLOAD_CAPACITY
+    :param client: qBittorrent client (anything with transfer_info()); defaults to torrents' client
+    :param clock: returns the current local time
+    """
+    def __init__(self, schedule: str = None, capacity: str = None, client: Any = None,
+                 clock: Callable[[], datetime] = datetime.now):
+        self.windows: List[Window] = list()
+        for entry in filter(None, (e.strip() for e in (config.BANDWIDTH_SCHEDULE if schedule is None else schedule).split(';'))):
+            self.add_window(entry)
+        self.capacity = parse_rate(config.UPLOAD_CAPACITY if capacity is None else capacity)
+        self._client = client
+        self.clock = clock
+        self._seeding_rate: Union[int, None] = None
+        self._seeding_checked = None
+        self._refreshing = threading.Lock()  # held while a background refresh is running
+
+    def add_window(self, entry: str):
+        span, _, rate = entry.partition('=')
+        start, _, end = span.partition('-')
+        if not rate or not end:
+            raise ValueError(f'Invalid bandwidth window "{entry}"; expected HH:MM-HH:MM=<rate>')
+        self.windows.append(Window(start=parse_time(start), end=parse_time(end), rate=parse_rate(rate)))
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.windows) or self.capacity is not None
+
+    @property
+    def client(self):
+        return self._client if self._client is not None else torrents.qbt_client
+
+    def scheduled_limit(self, at: datetime = None) -> Union[int, None]:
+        at = at or self.clock()
+        minute = at.hour * 60 + at.minute
+        for window in self.windows:
+            if window.start <= window.end:
+                inside = window.start <= minute < window.end
+            else:  # spans midnight
+                inside = minute >= window.start or minute < window.end
+            if inside:
+                return window.rate
+        return None
+
+    def refresh_seeding_rate(self) -> Union[int, None]:
+        """Query qBittorrent's current upload rate in bytes/s; blocks on the qBittorrent API."""
+        try:
+            rate = int(self.client.transfer_info()['up_info_speed'])
+        except Exception as e:
+            logger.warning(f'Failed to get qBittorrent transfer info; not adapting upload limit: {e}')
+            rate = None
+        self._seeding_rate, self._seeding_checked = rate, time.monotonic()
+        return rate
+
+    def _refresh_in_background(self):
+        try:
+            self.refresh_seeding_rate()
+        finally:
+            self._refreshing.release()
+
+    def seeding_rate(self) -> Union[int, None]:
+        """qBittorrent's last known upload rate in bytes/s, or None if it isn't known; never blocks."""
+        stale = self._seeding_checked is None or time.monotonic() - self._seeding_checked >= ADAPTIVE_INTERVAL
+        if stale and self.capacity is not None and self._refreshing.acquire(blocking=False):
+            threading.Thread(target=self._refresh_in_background, name='seeding-rate', daemon=True).start()
+        return self._seeding_rate
+
+    def limit(self) -> Union[int, None]:
+        """Total bytes/s uploads may use right now, or None for unlimited."""
+        limit = self.scheduled_limit()
+        if self.capacity is not None and (seeding := self.seeding_rate()) is not None:
+            reserve = max(seeding * (1 + SEEDING_HEADROOM), self.capacity * SEEDING_RESERVE)
+            spare = int(max(self.capacity - reserve, self.capacity * MINIMUM_SHARE))
+            limit = spare if limit is None else min(limit, spare)
+        return limit
+
+    def share(self, transfers: int) -> Union[int, None]:
+        """Limit for each of up to this many concurrent transfers; together they never exceed limit()."""
+        limit = self.limit()
+        return None if limit is None else max(1, limit // max(1, transfers))
@@ -0,0 +1,117 @@
+from collections import OrderedDict
+import logging
+import os
+from pathlib import Path, PurePosixPath
+import re
+import shutil
+import tempfile
+from typing import Any, Callable, Iterable, Iterator, List, Tuple
+
+from turbopotato.progress import parse_line
+from turbopotato.supervisor import Transfer
+from turbopotato.transit import REMOTE_HOST
+from turbopotato.transit import send_file_command
+from turbopotato.transit import send_files_command
+
+logger = logging.getLogger('batch')
+
+# rsync ends each file's progress with e.g. "(xfr#3, to-chk=2/5)"; versions before 3.1 print "xfer#"
+FILE_COMPLETE = re.compile(r'\((?:xfr|xfer)#\d+,')
+
+Entry = Tuple[Path, PurePosixPath, Any]  # (local filepath, remote filepath, context)
+
+
+class BatchTransfer(Transfer):
+    """
+    Send several files to one remote directory in a single rsync session.
+
+    Files are staged as symlinks named for their destinations, so one SSH connection and one
+    remote mkdir cover the whole group and files are renamed in flight. A file succeeds if the
+    session succeeds or if rsync reported finishing it before the session failed.
+    """
+    def __init__(self, entries: List[Entry], host: str = REMOTE_HOST):
+        remote_directory = entries[0][1].parent
+        self._staging_root = Path(tempfile.mkdtemp(prefix='turbopotato-batch-'))
+        staging_directory = self._staging_root / 'files'
+        staging_directory.mkdir()
+        files_from = self._staging_root / 'files-from'
+
+        self.contexts = OrderedDict()
+        with open(files_from, 'w') as f:
+            for local_filepath, remote_filepath, context in entries:
+                os.symlink(os.path.abspath(local_filepath), staging_directory / remote_filepath.name)
+                f.write(f'{remote_filepath.name}\n')
+                self.contexts[remote_filepath.name] = context
+
+        super().__init__(command=send_files_command(source_directory=staging_directory,
+                                                    files_from=files_from,
+                                                    remote_directory=remote_directory,
+                                                    host=host),
+                         host=host,
+                         name=f'{len(entries)} files to {remote_directory}',
+                         context=list(self.contexts.values()))
+        self.completed = set()
+        self._current = None
+
+    def outcomes(self) -> Iterator[Tuple[Any, bool]]:
+        for name, context in self.contexts.items():
+            yield context, self.success or name in self.completed
+
+    def on_line(self, line: str):
+        if line in self.contexts:
+            self._current = line
+        elif self._current:
+            if self.on_progress and (event := parse_line(line, name=self._current)) is not None:
+                self.on_progress(self.contexts[self._current], event)
+            if FILE_COMPLETE.search(line):
+                self.completed.add(self._current)
+                self._current = None
+
+    def close(self):
+        shutil.rmtree(self._staging_root, ignore_errors=True)
+
+
+def plan_transfers(entries: Iterable[Entry], host: str = REMOTE_HOST,
+                   resume: Callable[[Entry], bool] = None) -> List[Transfer]:
+    """
+    Group files by remote directory into batched transfers.
+
+    Directories receiving a single file are sent with a plain rsync. A file whose destination
+    name repeats within a directory, or that is resuming an interrupted transfer, is sent on its own
+    so the progress it resumes from is its own.
+
+    :param entries: (local filepath, remote filepath, context) for each file to send
+    :param host: destination host
+    :param resume: whether an entry is resuming an interrupted transfer
+    :return: transfers in the order their directories first appear
+    """
+    groups = OrderedDict()
+    duplicates = list()
+    resumes = list()
+    for entry in entries:
+        if resume and resume(entry):
+            resumes.append(entry)
+            continue
+        group = groups.setdefault(entry[1].parent, OrderedDict())
+        if entry[1].name in group:
+            duplicates.append(entry)
+        else:
+            group[entry[1].name] = entry
+
+    transfers = [single_transfer(entry, host=host) for entry in resumes]
+    for group in groups.values():
+        if len(group) > 1:
+            transfers.append(BatchTransfer(list(group.values()), host=host))
+        else:
+            transfers.extend(single_transfer(entry, host=host) for entry in group.values())
+    transfers.extend(single_transfer(entry, host=host) for entry in duplicates)
+    logger.debug(f'Planned {len(transfers)} transfers for {len(groups)} destination directories')
+    return transfers
+
+
+def single_transfer(entry: Entry, host: str = REMOTE_HOST) -> Transfer:
+    local_filepath, remote_filepath, context = entry
+    return Transfer(command=send_file_command(local_filepath=local_filepath, remote_filepath=remote_filepath, host=host),
+                    host=host,
+                    name=local_filepath.name,
+                    context=context)
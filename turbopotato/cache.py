@@ -0,0 +1,142 @@
+import json
+import logging
+import os
+from pathlib import Path
+import tempfile
+
+from turbopotato.config import config
+
+logger = logging.getLogger('cache')
+
+_MISSING = object()
+
+
+class PersistentCache:
+    """
+    Dictionary persisted as JSON in the turbopotato cache directory.
+
+    Contents are loaded on first access. save() re-reads the file and applies only the keys
+    changed by this process so concurrent runs don't clobber each other's updates.
+    """
+    def __init__(self, name: str, cache_dir: Path = None):
+        self.name = name
+        self.filepath = Path(cache_dir or config.CACHE_DIR, f'{name}.json')
+        self._data = None
+        self._changed = dict()
+
+    @property
+    def data(self) -> dict:
+        if self._data is None:
+            self._data = self._load()
+        return self._data
+
+    def _load(self) -> dict:
+        try:
+            with open(self.filepath, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return dict()
+        except (OSError, ValueError) as e:
+            logger.warning(f'Discarding unreadable cache "{self.filepath}": {e}')
+            return dict()
+        return data if isinstance(data, dict) else dict()
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def __len__(self):
+        return len(self.data)
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    def set(self, key, value):
+        self.data[key] = value
+        self._changed[key] = value
+
+    def pop(self, key, default=None):
+        if key not in self.data:
+            return default
+        self._changed[key] = _MISSING
+        return self.data.pop(key)
+
+    def clear(self):
+        for key in list(self.data):
+            self.pop(key)
+
+    def save(self):
+        if not self._changed:
+            return
+
+        data = self._load()
+        for key, value in self._changed.items():
+            if value is _MISSING:
+                data.pop(key, None)
+            else:
+                data[key] = value
+
+        try:
+            self.filepath.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_filepath = tempfile.mkstemp(dir=self.filepath.parent, prefix=f'.{self.name}.')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_filepath, self.filepath)
+        except OSError as e:
+            logger.warning(f'Failed to save cache "{self.filepath}": {e}')
+        else:
+            self._data = data
+            self._changed = dict()
+
+
+class AppendOnlyLog:
+    """
+    JSON-lines file in the turbopotato cache directory that records are only ever appended to.
+
+    Each append is a single write so concurrent writers don't interleave records. With sync=True
+    every record is fsync'd before append() returns. compact() atomically rewrites the file.
+    """
+    def __init__(self, name: str, cache_dir: Path = None, sync: bool = False):
+        self.name = name
+        self.filepath = Path(cache_dir or config.CACHE_DIR, f'{name}.jsonl')
+        self.sync = sync
+
+    def append(self, record: dict):
+        line = json.dumps(record) + '\n'
+        try:
+            self.filepath.parent.mkdir(parents=True, exist_ok=True)
+            fd = os.open(self.filepath, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line.encode('utf-8'))
+                if self.sync:
+                    os.fsync(fd)
+            finally:
+                os.close(fd)
+        except OSError as e:
+            logger.warning(f'Failed to append to "{self.filepath}": {e}')
+
+    def read(self):
+        try:
+            with open(self.filepath, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        # a partially written final record from a crash is expected
+                        logger.debug(f'Ignoring malformed record in "{self.filepath}": {line!r}')
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            logger.warning(f'Failed to read "{self.filepath}": {e}')
+
+    def compact(self, records):
+        try:
+            self.filepath.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_filepath = tempfile.mkstemp(dir=self.filepath.parent, prefix=f'.{self.name}.')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                for record in records:
+                    f.write(json.dumps(record) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_filepath, self.filepath)
+        except OSError as e:
+            logger.warning(f'Failed to compact "{self.filepath}": {e}')
@@ -0,0 +1,135 @@
+import codecs
+import logging
+import os
+from pathlib import Path
+import re
+from typing import Union
+
+from turbopotato.cache import PersistentCache
+from turbopotato.extensions import extensions
+
+logger = logging.getLogger('classify')
+
+VIDEO = 'video'
+SUBTITLE = 'subtitle'
+
+SNIFF_SIZE = 4096
+
+ASF_GUID = bytes.fromhex('3026b2758e66cf11a6d900aa0062ce6c')
+MP4_BOXES = (b'ftyp', b'moov', b'mdat', b'free', b'wide', b'skip', b'pnot')
+SIMPLE_SIGNATURES = (
+    b'\x1a\x45\xdf\xa3',  # Matroska/WebM
+    b'\x00\x00\x01\xba',  # MPEG program stream (VOB, MPG)
+    b'\x00\x00\x01\xb3',  # MPEG video
+    ASF_GUID,             # ASF/WMV
+    b'FLV',
+    b'OggS',
+    b'.RMF',              # RealMedia
+    b'YUV4MPEG2',
+)
+ANNEX_B_START_CODES = (b'\x00\x00\x00\x01', b'\x00\x00\x01')  # raw H.264/H.265 elementary streams
+H264_NAL_TYPES = (1, 5, 6, 7, 9)  # slice, IDR slice, SEI, SPS, access unit delimiter
+H265_NAL_TYPES = (1, 19, 20, 32, 33, 34, 35, 39)  # slices, IDR slices, VPS, SPS, PPS, AUD, SEI
+SRT_PATTERN = re.compile(r'\d+[ \t]*\r?\n\d{1,2}:\d{2}:\d{2}[,.]\d{1,3}[ \t]*-->')
+MICRODVD_PATTERN = re.compile(r'\{\d+\}\{\d*\}')
+SUBTITLE_PREFIXES = ('WEBVTT', '[Script Info]', '# VobSub index file', '<SAMI>', '<sami>')
+
+
+def _is_transport_stream(head: bytes, offset: int, packet_size: int) -> bool:
+    packets = [head[i:i+1] for i in range(offset, min(len(head), offset + 3 * packet_size), packet_size)]
+    return len(packets) >= 2 and all(packet == b'\x47' for packet in packets)
+
+
+def _is_annex_b(head: bytes) -> bool:
+    start_code = next((code for code in ANNEX_B_START_CODES if head.startswith(code)), None)
+    if start_code is None or len(head) < len(start_code) + 2:
+        return False
+    header = head[len(start_code):len(start_code) + 2]
+    if header[0] & 0x80:  # forbidden_zero_bit; also excludes MPEG-1/2 start codes
+        return False
+    return (header[0] & 0x1f) in H264_NAL_TYPES or (((header[0] >> 1) & 0x3f) in H265_NAL_TYPES and header[1] == 1)
+
+
+def _decode_text(head: bytes) -> str:
+    """Text of a subtitle file in UTF-8 (the usual case) or UTF-16 with or without a byte order mark."""
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return head.decode('utf-16', errors='ignore')
+    if len(head) >= 4 and head[1] == head[3] == 0 and head[0] and head[2]:
+        return head.decode('utf-16-le', errors='ignore')
+    if len(head) >= 4 and head[0] == head[2] == 0 and head[1] and head[3]:
+        return head.decode('utf-16-be', errors='ignore')
+    return head.decode('utf-8-sig', errors='ignore')
+
+
+def sniff(head: bytes) -> Union[str, None]:
+    """
+    Identify media content from the first bytes of a file.
+
+    :param head: leading bytes of the file
+    :return: VIDEO, SUBTITLE, or None if the content isn't recognized
+    """
+    if head.startswith(SIMPLE_SIGNATURES):
+        return VIDEO
+    if head[4:8] in MP4_BOXES:
+        return VIDEO
+    if head[:4] == b'RIFF' and head[8:12] in (b'AVI ', b'AVIX'):
+        return VIDEO
+    if _is_transport_stream(head, 0, 188) or _is_transport_stream(head, 4, 192):
+        return VIDEO
+    if _is_annex_b(head):
+        return VIDEO
+
+    text = _decode_text(head).lstrip()
+    if SRT_PATTERN.match(text) or MICRODVD_PATTERN.match(text) or text.startswith(SUBTITLE_PREFIXES):
+        return SUBTITLE
+    return None
+
+
+class MediaClassifier:
+    """
+    Classify files as video or subtitles from their extension and content.
+
+    Only files with a known video or subtitle extension are read. The leading bytes are then
+    checked for a media container or subtitle signature so project files and misnamed junk are
+    dropped. Results are cached by (device, inode, size, mtime) so re-scans don't read file contents.
+
+    :param cache_dir: where results are stored; defaults to TP_CACHE_DIR
+    """
+    def __init__(self, cache_dir=None):
+        self.cache = PersistentCache('classifications', cache_dir=cache_dir)
+
+    @staticmethod
+    def _key(stat: os.stat_result) -> str:
+        return f'{stat.st_dev}:{stat.st_ino}:{stat.st_size}:{stat.st_mtime_ns}'
+
+    def classify(self, path: Path, stat: os.stat_result = None) -> Union[str, None]:
+        if not (extensions.is_video_extension(ext=path.suffix) or extensions.is_subtitle_extension(ext=path.suffix)):
+            return None
+
+        try:
+            stat = stat or os.stat(path)
+        except OSError as e:
+            logger.error(f'Failed to stat file "{path}": {e}')
+            return None
+
+        key = self._key(stat)
+        if key in self.cache:
+            return self.cache.get(key) or None
+
+        try:
+            with open(path, 'rb') as f:
+                kind = sniff(f.read(SNIFF_SIZE))
+        except OSError as e:
+            logger.error(f'Failed to read file "{path}": {e}')
+            return None
+
+        if kind is None:
+            logger.warning(f'Skipping file with unrecognized content: {path}')
+        self.cache.set(key, kind or '')
+        return kind
+
+    def save(self):
+        self.cache.save()
+
+
+classifier = MediaClassifier()
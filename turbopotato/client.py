@@ -0,0 +1,45 @@
+import json
+from pathlib import Path
+import socket
+
+from turbopotato.config import config
+
+
+class ServiceUnavailable(Exception):
+    pass
+
+
+class ServiceError(Exception):
+    pass
+
+
+def request(message: dict, socket_path: Path = None, timeout: float = 5) -> dict:
+    """Send a request to a running `turbopotato serve` process and return its response."""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(str(socket_path or config.SOCKET_PATH))
+            sock.sendall(json.dumps(message).encode('utf-8') + b'\n')
+            with sock.makefile('r', encoding='utf-8') as f:
+                response = json.loads(f.readline() or '{}')
+    except (OSError, ValueError) as e:
+        raise ServiceUnavailable(f'turbopotato service unavailable at "{socket_path or config.SOCKET_PATH}": {e}') from e
+
+    if not response.get('ok'):
+        raise ServiceError(response.get('error', 'unknown error'))
+    return response
+
+
+def submit(socket_path: Path = None, **job) -> int:
+    """
+    Queue a job with a running `turbopotato serve` process.
+
+    :param socket_path: service socket; defaults to TP_SOCKET_PATH or the cache directory
+    :param job: keyword arguments for turbopotato.run(); torrent_hashes may be given instead of paths
+    :return: job ID
+    """
+    return request(dict(action='submit', job=job), socket_path=socket_path)['job_id']
+
+
+def status(job_id: int, socket_path: Path = None) -> str:
+    return request(dict(action='status', job_id=job_id), socket_path=socket_path)['status']
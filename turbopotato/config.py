@@ -1,6 +1,9 @@
+from functools import cached_property
 from os import environ
-from pkg_resources import resource_filename
 from pathlib import Path
+from typing import List, Union
+
+RESOURCE_DIR = Path(__file__).parent
 
 
 def get_line(file: Path, line: int = 1):
@@ -14,27 +17,94 @@ def get_line(file: Path, line: int = 1):
     return contents
 
 
+def get_lines(file: Path) -> List[str]:
+    try:
+        with open(file, 'r') as f:
+            return [line.rstrip() for line in f]
+    except (IOError, OSError) as e:
+        print(f'ERROR: Failed to read "{file}": {e}')
+    return list()
+
+
 class Config:
-    host = environ.get('TP_QBITTORRENT_CONFIG_HOST')
-    qbittorrent_host = host or get_line(Path(resource_filename(__name__, 'QBITTORRENT_CONFIG')), 1)[len('HOST:'):]
+    """
+    Settings from TP_* environment variables, falling back to resource files installed with the package.
+
+    Values are resolved on first access so importing turbopotato doesn't read files that a run never needs.
+    """
+    @cached_property
+    def _qbittorrent_config(self) -> List[str]:
+        return get_lines(RESOURCE_DIR / 'QBITTORRENT_CONFIG')
+
+    def _qbittorrent_setting(self, line: int, prefix: str) -> Union[str, None]:
+        try:
+            return self._qbittorrent_config[line - 1][len(prefix):]
+        except IndexError:
+            return None
+
+    @cached_property
+    def qbittorrent_host(self):
+        return environ.get('TP_QBITTORRENT_CONFIG_HOST') or self._qbittorrent_setting(1, 'HOST:')
+
+    @cached_property
+    def qbittorrent_port(self):
+        return environ.get('TP_QBITTORRENT_CONFIG_PORT') or self._qbittorrent_setting(2, 'PORT:')
+
+    @cached_property
+    def qbittorrent_username(self):
+        return environ.get('TP_QBITTORRENT_CONFIG_USERNAME') or self._qbittorrent_setting(3, 'USERNAME:')
+
+    @cached_property
+    def qbittorrent_password(self):
+        return environ.get('TP_QBITTORRENT_CONFIG_PASSWORD') or self._qbittorrent_setting(4, 'PASSWORD:')
+
+    @cached_property
+    def TVDB_API_KEY(self):
+        return environ.get('TP_TVDB_API_KEY') or get_line(RESOURCE_DIR / 'TVDB_API_KEY')
+
+    @cached_property
+    def TMDB_API_KEY(self):
+        return environ.get('TP_TMDB_API_KEY') or get_line(RESOURCE_DIR / 'TMDB_API_KEY')
+
+    @cached_property
+    def GMAIL_APP_PASSWORD(self):
+        return environ.get('TP_GMAIL_APP_PASSWORD') or get_line(RESOURCE_DIR / 'GMAIL_APP_PASSWORD')
+
+    @cached_property
+    def OVERRIDES_FILE(self):
+        return Path(environ.get('TP_OVERRIDES_FILE') or RESOURCE_DIR / 'overrides.json')
+
+    @cached_property
+    def CACHE_DIR(self):
+        return Path(environ.get('TP_CACHE_DIR') or Path.home() / '.cache' / 'turbopotato')
+
+    @cached_property
+    def TRANSPORTS(self):
+        return environ.get('TP_TRANSPORTS') or ''
 
-    port = environ.get('TP_QBITTORRENT_CONFIG_PORT')
-    qbittorrent_port = port or get_line(Path(resource_filename(__name__, 'QBITTORRENT_CONFIG')), 2)[len('PORT:'):]
+    @cached_property
+    def SSH_COMMAND(self):
+        return environ.get('TP_SSH_COMMAND') or 'ssh'
 
-    username = environ.get('TP_QBITTORRENT_CONFIG_USERNAME')
-    qbittorrent_username = username or get_line(Path(resource_filename(__name__, 'QBITTORRENT_CONFIG')), 3)[len('USERNAME:'):]
+    @cached_property
+    def BANDWIDTH_SCHEDULE(self):
+        return environ.get('TP_BANDWIDTH_SCHEDULE') or ''
 
-    password = environ.get('TP_QBITTORRENT_CONFIG_PASSWORD')
-    qbittorrent_password = password or get_line(Path(resource_filename(__name__, 'QBITTORRENT_CONFIG')), 4)[len('PASSWORD:'):]
+    @cached_property
+    def UPLOAD_CAPACITY(self):
+        return environ.get('TP_UPLOAD_CAPACITY') or ''
 
-    tvdb_key = environ.get('TP_TVDB_API_KEY')
-    TVDB_API_KEY = tvdb_key or get_line(Path(resource_filename(__name__, 'TVDB_API_KEY')))
+    @cached_property
+    def TRANSFERS_PER_HOST(self):
+        return environ.get('TP_TRANSFERS_PER_HOST') or ''
 
-    tmdb_key = environ.get('TP_TMDB_API_KEY')
-    TMDB_API_KEY = tmdb_key or get_line(Path(resource_filename(__name__, 'TMDB_API_KEY')))
+    @cached_property
+    def CATEGORY_PRIORITY(self):
+        return environ.get('TP_CATEGORY_PRIORITY') or ''
 
-    gmail_password = environ.get('TP_GMAIL_APP_PASSWORD')
-    GMAIL_APP_PASSWORD = gmail_password or get_line(Path(resource_filename(__name__, 'GMAIL_APP_PASSWORD')))
+    @cached_property
+    def SOCKET_PATH(self):
+        return Path(environ.get('TP_SOCKET_PATH') or self.CACHE_DIR / 'turbopotato.sock')
 
 
 config = Config()
@@ -0,0 +1,71 @@
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+import logging
+import os
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Tuple
+
+logger = logging.getLogger('discovery')
+
+DISCOVERY_THREADS = 4
+
+Candidate = namedtuple('Candidate', 'path stat')
+
+
+def _scan_directory(directory: str, accept: Callable[[str], bool] = None) -> Tuple[List[Candidate], List[str]]:
+    files, subdirectories = list(), list()
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirectories.append(entry.path)
+                    elif entry.is_file() and (accept is None or accept(entry.name)):
+                        files.append(Candidate(path=Path(entry.path), stat=entry.stat()))
+                except OSError as e:
+                    logger.error(f'Failed to stat file "{entry.path}": {e}')
+    except OSError as e:
+        logger.warning(f'Failed to scan directory "{directory}": {e}')
+    return files, subdirectories
+
+
+def discover(paths: Iterable[str], accept: Callable[[str], bool] = None,
+             threads: int = DISCOVERY_THREADS) -> Iterator[Candidate]:
+    """
+    Stream files found under the given paths.
+
+    Directories are scanned with os.scandir() and sibling subtrees are walked concurrently in a
+    small thread pool. Files are yielded as soon as their directory has been scanned along with
+    the stat result from the directory entry so callers don't need to stat them again.
+
+    :param paths: files or directories to search
+    :param accept: filter applied to file names before they are stat'd
+    :param threads: number of directories to scan concurrently
+    :return: iterator of Candidate(path, stat)
+    """
+    directories = list()
+    for path in paths:
+        if os.path.isfile(path):
+            if accept is None or accept(os.path.basename(path)):
+                try:
+                    yield Candidate(path=Path(path), stat=os.stat(path))
+                except OSError as e:
+                    logger.error(f'Failed to stat file "{path}": {e}')
+        elif os.path.isdir(path):
+            directories.append(path)
+        else:
+            logger.warning(f'Invalid path argument: {path}')
+
+    if not directories:
+        return
+
+    with ThreadPoolExecutor(max_workers=threads, thread_name_prefix='discovery') as pool:
+        pending = {pool.submit(_scan_directory, directory, accept) for directory in directories}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                files, subdirectories = future.result()
+                pending.update(pool.submit(_scan_directory, subdirectory, accept) for subdirectory in subdirectories)
+                yield from files
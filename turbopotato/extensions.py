@@ -1,5 +1,5 @@
 class Extensions:
-    video_extensions = (
+    video_extensions = frozenset((
         '.264',
         '.3G2',
         '.3GP',
@@ -489,7 +489,11 @@ class Extensions:
         '.ZM2',
         '.ZM3',
         '.ZMV'
-    )
+    ))
+
+    subtitle_extensions = frozenset((
+        '.SRT',
+    ))
 
     @staticmethod
     def is_video_extension(ext: str = ''):
@@ -497,7 +501,7 @@ class Extensions:
 
     @staticmethod
     def is_subtitle_extension(ext: str = ''):
-        return str(ext).upper() in ('.SRT',)
+        return str(ext).upper() in Extensions.subtitle_extensions
 
 
 extensions = Extensions()
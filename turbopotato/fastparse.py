@@ -0,0 +1,124 @@
+import logging
+import re
+from typing import Union
+
+logger = logging.getLogger('fastparse')
+
+# extensions PTN reports as the filetype; names with other extensions are left to PTN
+FILETYPES = ('mkv', 'avi', 'mp4', 'srt', 'sub', 'ssa')
+EXTENSIONS = FILETYPES + ('m4v', 'mov', 'mpg', 'mpeg', 'ts', 'wmv', 'idx', 'ass')
+
+# PTN's names for the tokens below, keyed by the token with separators removed and lowercased
+CODECS = {'x264': 'H.264', 'h264': 'H.264', 'avc': 'H.264', 'x265': 'H.265', 'h265': 'H.265', 'hevc': 'H.265',
+          'xvid': 'Xvid'}
+QUALITIES = {'hdtv': 'HDTV', 'pdtv': 'PDTV', 'webdl': 'WEB-DL', 'webrip': 'WEBRip', 'web': 'WEBRip',
+             'bluray': 'Blu-ray', 'bdrip': 'BDRip', 'brrip': 'BRRip', 'dvdrip': 'DVD-Rip'}
+AUDIO = {'dd': 'Dolby Digital', 'ddp': 'Dolby Digital Plus', 'ac3': 'Dolby Digital', 'eac3': 'Dolby Digital Plus',
+         'aac': 'AAC', 'dts': 'DTS', 'truehd': 'Dolby TrueHD', 'mp3': 'MP3'}
+
+# tokens that mark the end of the title; the first one found must exist
+ANCHORS = ('season', 'date', 'year')
+
+# every release-name token recognized by the fast path, compiled into a single alternation
+_TOKENS = re.compile(r'''
+    (?<![a-z0-9])
+    (?:
+        s(?P<season>\d{1,2})(?:e(?P<episode>\d{1,3}))?
+      | (?P<date>(?P<date_year>(?:19|20)\d{2})[ ._-](?P<month>0[1-9]|1[0-2])[ ._-](?P<day>0[1-9]|[12]\d|3[01]))
+      | (?P<year>(?:19|20)\d{2})
+      | (?P<resolution>\d{3,4}[pi])
+      | (?P<quality>hdtv|pdtv|web-?dl|web-?rip|web|blu-?ray|bdrip|brrip|dvdrip)
+      | (?P<codec>[xh]\.?26[45]|hevc|xvid|avc)
+      | (?P<audio>(?P<audio_format>ddp?|e?ac3|aac|dts|truehd)(?:[ .]?(?P<channels>\d\.\d))?|mp3)
+      | (?P<proper>proper)
+      | (?P<repack>repack)
+      | (?P<extended>extended)
+    )
+    (?![a-z0-9])
+''', re.IGNORECASE | re.VERBOSE)
+
+_ENCODER = re.compile(r'-(?P<encoder>[a-z0-9]+)$', re.IGNORECASE)
+_SEPARATORS = re.compile(r'^[\s._\-\[\]()]*$')
+_TITLE_SEPARATORS = str.maketrans('._', '  ')
+_TOKEN_SEPARATORS = str.maketrans('', '', '.-')
+
+
+def parse(name: str) -> Union[dict, None]:
+    """
+    Single-pass parser for common release names.
+
+    Returns the same keys and values as PTN.parse() for the fields it recognizes (title, season,
+    episode, year, month, day, resolution, quality, codec, audio, encoder, filetype, proper, repack,
+    extended), so results don't depend on which parser produced them. If any part of the name isn't
+    understood, confidence is too low and None is returned so the caller can fall back to PTN.
+
+    :param name: file or directory name
+    :return: parsed fields or None if the name should be parsed by PTN
+    """
+    body, extension = name, ''
+    if '.' in name and name.rsplit('.', 1)[1].lower() in EXTENSIONS:
+        body, extension = name.rsplit('.', 1)
+        if extension.lower() not in FILETYPES:
+            return None
+
+    results = dict()
+    title_end = None
+    position = 0
+    for match in _TOKENS.finditer(body):
+        key = 'season' if match.group('season') is not None else match.lastgroup
+
+        if title_end is None:
+            if key not in ANCHORS:
+                return None  # descriptive token before the title could be part of the title
+            title_end = match.start()
+        elif not _SEPARATORS.match(body[position:match.start()]):
+            return None  # unrecognized text between tokens
+        position = match.end()
+
+        if key == 'season':
+            fields = {'season': int(match.group('season'))}
+            if match.group('episode') is not None:
+                fields['episode'] = int(match.group('episode'))
+        elif key == 'date':
+            fields = {'year': int(match.group('date_year')),
+                      'month': int(match.group('month')),
+                      'day': int(match.group('day'))}
+        elif key == 'year':
+            fields = {'year': int(match.group('year'))}
+        elif key == 'resolution':
+            fields = {key: match.group(key).lower()}
+        elif key in ('proper', 'repack', 'extended'):
+            fields = {key: True}
+        elif key == 'codec':
+            fields = {key: CODECS[match.group(key).lower().translate(_TOKEN_SEPARATORS)]}
+        elif key == 'quality':
+            fields = {key: QUALITIES[match.group(key).lower().translate(_TOKEN_SEPARATORS)]}
+        elif key == 'audio':
+            audio = AUDIO[(match.group('audio_format') or match.group(key)).lower()]
+            fields = {key: f'{audio} {match.group("channels")}' if match.group('channels') else audio}
+        else:
+            fields = {key: match.group(key)}
+
+        if any(field in results for field in fields):
+            return None  # repeated fields are ambiguous (e.g. a year in the title)
+        results.update(fields)
+
+    if title_end is None:
+        return None
+
+    remainder = body[position:]
+    if encoder_match := _ENCODER.search(remainder):
+        results['encoder'] = encoder_match.group('encoder')
+        remainder = remainder[:encoder_match.start()]
+    if not _SEPARATORS.match(remainder):
+        return None
+
+    title = body[:title_end].translate(_TITLE_SEPARATORS).strip(' -[(')
+    if not title:
+        return None
+    results['title'] = title
+
+    if extension:
+        results['filetype'] = extension.upper()
+
+    return results
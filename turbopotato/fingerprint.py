@@ -0,0 +1,74 @@
+import hashlib
+import logging
+import mmap
+import os
+from pathlib import Path
+import time
+from typing import Union
+
+from turbopotato.cache import PersistentCache
+from turbopotato.media_defs import QueryResult
+
+logger = logging.getLogger('fingerprint')
+
+SAMPLE_SIZE = 64 * 1024  # 64KiB
+
+
+def fingerprint(filepath: Path) -> Union[str, None]:
+    """
+    Fast content fingerprint: file size plus a SHA-256 of the first and last 64KiB.
+
+    The samples are read through mmap so only the pages at either end of the file are touched.
+    The same digest can be computed for a remote file with:
+        { head -c 65536 FILE; tail -c 65536 FILE; } | sha256sum
+
+    :param filepath: file to fingerprint
+    :return: "<size>:<hex digest>" or None if the file can't be read
+    """
+    sha = hashlib.sha256()
+    try:
+        with open(filepath, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    sha.update(mm[:SAMPLE_SIZE])
+                    sha.update(mm[max(0, size - SAMPLE_SIZE):])
+    except (OSError, ValueError) as e:
+        logger.warning(f'Failed to fingerprint "{filepath}": {e}')
+        return None
+    return f'{size}:{sha.hexdigest()}'
+
+
+class FingerprintIndex:
+    """
+    Maps content fingerprints to the identification and destination of previously transited files.
+
+    :param cache_dir: where the index is stored; defaults to TP_CACHE_DIR
+    """
+    def __init__(self, cache_dir=None):
+        self.cache = PersistentCache('fingerprints', cache_dir=cache_dir)
+
+    def get(self, file) -> Union[dict, None]:
+        if not file.fingerprint:
+            return None
+        entry = self.cache.get(file.fingerprint)
+        if not entry:
+            return None
+        try:
+            return dict(chosen_one=QueryResult.from_dict(entry['chosen_one']), destination=entry['destination'])
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning(f'Discarding unusable fingerprint entry for "{file.filepath.name}": {e}')
+            self.cache.pop(file.fingerprint)
+            return None
+
+    def set(self, file, destination):
+        if not file.fingerprint or not isinstance(file.chosen_one, QueryResult):
+            return
+        self.cache.set(file.fingerprint,
+                       dict(chosen_one=file.chosen_one.to_dict(), destination=str(destination), time=time.time()))
+
+    def save(self):
+        self.cache.save()
+
+
+fingerprints = FingerprintIndex()
@@ -0,0 +1,215 @@
+import argparse
+import logging
+from pathlib import Path
+import time
+from typing import Any, Callable, Dict, List, Union
+
+from turbopotato.arguments import has_media_extension
+from turbopotato.arguments import is_media_file
+from turbopotato.log import configure_console_logging
+from turbopotato.manifest import manifest
+from turbopotato.torrents import torrents
+from turbopotato.transit import ssh_master
+
+logger = logging.getLogger('follow')
+
+DEFAULT_INTERVAL = 30  # seconds between polls of qBittorrent
+PIECE_DOWNLOADED = 2  # torrents_piece_states: 0 not downloaded, 1 downloading, 2 downloaded and hash-checked
+CHECKING_STATES = ('checkingUP', 'checkingDL', 'checkingResumeData', 'moving')
+
+
+class TorrentFollower:
+    """
+    Transit a torrent's media files one by one as each finishes downloading.
+
+    qBittorrent's file list is polled and a media file is processed once its progress is 100% and
+    every piece it spans is downloaded (qBittorrent marks a piece downloaded only after its hash
+    checks out). Files that become ready in the same poll are processed together, with torrent
+    updates skipped; once every wanted file has been processed the torrent is updated from their
+    combined outcome, as a run over the whole torrent would have done.
+
+    :param torrent_hash: torrent to follow
+    :param process: runs turbopotato over a list of paths; see default_process
+    :param interval: seconds between polls
+    :param timeout: seconds to follow the torrent before giving up; None to follow until it completes
+    :param skip_torrent_updates: don't update the torrent once all files are done
+    :param force_torrent_deletion: delete the torrent once all files are done
+    :param client: qBittorrent client; defaults to torrents' client
+    """
+    def __init__(self, torrent_hash: str, process: Callable[[List[str]], Any] = None, interval: float = DEFAULT_INTERVAL,
+                 timeout: float = None, skip_torrent_updates: bool = False, force_torrent_deletion: bool = False,
+                 client: Any = None):
+        self.torrent_hash = torrent_hash
+        self.process = process or default_process
+        self.interval = interval
+        self.timeout = timeout
+        self.skip_torrent_updates = skip_torrent_updates
+        self.force_torrent_deletion = force_torrent_deletion
+        self._client = client
+        self.outcomes: Dict[str, bool] = dict()  # torrent file name -> transited successfully
+
+    @property
+    def client(self):
+        return self._client if self._client is not None else torrents.qbt_client
+
+    def get_torrent(self):
+        try:
+            return self.client.torrents_info(torrent_hashes=self.torrent_hash)[0]
+        except Exception as e:
+            logger.warning(f'Torrent not found for "{self.torrent_hash}": {e}')
+            return None
+
+    @staticmethod
+    def wanted(file) -> bool:
+        """Media files qBittorrent is set to download."""
+        return file.priority > 0 and has_media_extension(file.name)
+
+    @staticmethod
+    def local_path(torrent, file) -> Union[Path, None]:
+        """Where a torrent file is on disk; incomplete torrents may still be in qBittorrent's download path."""
+        for directory in filter(None, (torrent.get('download_path'), torrent.get('save_path'))):
+            if (path := Path(directory, file.name)).is_file():
+                return path
+        return None
+
+    def ready_files(self, torrent, files: list, piece_states: list) -> Dict[str, Path]:
+        """Wanted files not yet processed that are complete and hash-checked, by torrent file name."""
+        ready = dict()
+        if torrent.state in CHECKING_STATES:
+            return ready
+        for file in files:
+            if file.name in self.outcomes or not self.wanted(file) or file.progress < 1:
+                continue
+            first, last = file.piece_range
+            if not all(state == PIECE_DOWNLOADED for state in piece_states[first:last + 1]):
+                continue
+            if (path := self.local_path(torrent, file)) is not None:
+                ready[file.name] = path
+        return ready
+
+    def poll(self) -> bool:
+        """Process newly ready files; returns whether the torrent is finished with (or gone)."""
+        if (torrent := self.get_torrent()) is None:
+            return True
+        try:
+            files = self.client.torrents_files(torrent_hash=self.torrent_hash)
+            piece_states = self.client.torrents_piece_states(torrent_hash=self.torrent_hash)
+        except Exception as e:
+            logger.warning(f'Failed to get files of "{torrent.name}": {e}')
+            return False
+
+        if ready := self.ready_files(torrent, files, piece_states):
+            for name, path in list(ready.items()):
+                if not is_media_file(path):  # e.g. a tiny subtitle; a whole-torrent run would skip it too
+                    ready.pop(name)
+                    self.outcomes[name] = True
+            to_process = [str(path) for path in ready.values() if not manifest.is_done(path)]
+            if to_process:
+                logger.info(f'{len(to_process)} file(s) of "{torrent.name}" ready: {[Path(p).name for p in to_process]}')
+                try:
+                    self.process(to_process)
+                except Exception as e:
+                    logger.error(f'Failed to process files of "{torrent.name}": {e}', exc_info=True)
+            # judged now, before qBittorrent can move a completed torrent's files elsewhere
+            for name, path in ready.items():
+                self.outcomes[name] = manifest.is_done(path)
+
+        remaining = [file.name for file in files if self.wanted(file) and file.name not in self.outcomes]
+        if remaining:
+            logger.debug(f'Waiting on {len(remaining)} file(s) of "{torrent.name}"')
+            return False
+        self.finalize()
+        return True
+
+    def finalize(self):
+        """Update the torrent now that every wanted file has been processed."""
+        if (torrent := self.get_torrent()) is None:
+            return
+        if not self.outcomes:
+            logger.error(f'No media files to process in "{torrent.name}".')
+            return
+        success = all(self.outcomes.values())
+        failed = [name for name, outcome in self.outcomes.items() if not outcome]
+        logger.info(f'All files of "{torrent.name}" processed' + (f'; failed: {failed}' if failed else ''))
+        if self.skip_torrent_updates:
+            return
+        if torrents.is_transiting(torrent):
+            logger.warning(f'Torrent "{torrent.name}" is transiting in another run; leaving its update to that run')
+            return
+        from turbopotato.media import update_torrent
+        update_torrent(torrent, success=success, force_deletion=self.force_torrent_deletion)
+
+    def run(self):
+        started = time.monotonic()
+        while not self.poll():
+            if self.timeout is not None and time.monotonic() - started > self.timeout:
+                logger.warning(f'Gave up following "{self.torrent_hash}" after {self.timeout:.0f}s')
+                return
+            time.sleep(self.interval)
+
+
+def torrent_file_ready(path: Union[str, Path], client: Any = None) -> Union[bool, None]:
+    """
+    Whether qBittorrent has finished downloading and hash-checking the torrent file at path.
+
+    :param path: file in a torrent's save path or download path
+    :param client: qBittorrent client; defaults to torrents' client
+    :return: None if no torrent has the file
+    """
+    client = client if client is not None else torrents.qbt_client
+    path = Path(path)
+    try:
+        for torrent in client.torrents_info():
+            for directory in filter(None, (torrent.get('download_path'), torrent.get('save_path'))):
+                try:
+                    name = path.relative_to(directory).as_posix()
+                except ValueError:
+                    continue
+                files = [file for file in client.torrents_files(torrent_hash=torrent.hash) if file.name == name]
+                if files:
+                    piece_states = client.torrents_piece_states(torrent_hash=torrent.hash)
+                    return name in TorrentFollower(torrent.hash, client=client).ready_files(torrent, files, piece_states)
+    except Exception as e:
+        logger.warning(f'Failed to get torrent progress of "{path}": {e}')
+        return False
+    return None
+
+
+def default_process(paths: List[str], **options):
+    """Run turbopotato over part of a torrent, leaving the torrent itself alone."""
+    from turbopotato.main import run
+    run(paths=paths, torrents=True, interactive=False, skip_torrent_updates=True, **options)
+
+
+def command(argv: list = None):
+    parser = argparse.ArgumentParser(prog='turbopotato follow',
+                                     description='transit each media file of a downloading torrent as soon as it completes')
+    parser.add_argument('-f', '--force-torrent-deletion', action='store_true',
+                        help='automatically delete torrent data')
+    parser.add_argument('-u', '--skip-torrent-updates', action='store_true',
+                        help='don\'t update torrents (move/delete/update)')
+    parser.add_argument('-n', '--no-notification-on-failure', action='store_true',
+                        help='don\'t send notifications if processing is unsuccessful')
+    parser.add_argument('-i', '--interval', action='store', type=float, default=DEFAULT_INTERVAL,
+                        help='seconds between checks of the torrent\'s files')
+    parser.add_argument('--timeout', action='store', type=float, default=None,
+                        help='hours to follow the torrent before giving up (default: until it completes)')
+    parser.add_argument('-l', '--log_level', action='store', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                        default='INFO', type=str, help='log level to display on console')
+    parser.add_argument('torrent_hash', type=str, help='hash of the torrent to follow')
+    parsed = parser.parse_args(args=argv)
+
+    configure_console_logging(level=parsed.log_level)
+    follower = TorrentFollower(torrent_hash=parsed.torrent_hash,
+                               process=lambda paths: default_process(
+                                   paths, log_level=parsed.log_level,
+                                   no_notification_on_failure=parsed.no_notification_on_failure),
+                               interval=parsed.interval,
+                               timeout=parsed.timeout * 60 * 60 if parsed.timeout is not None else None,
+                               skip_torrent_updates=parsed.skip_torrent_updates,
+                               force_torrent_deletion=parsed.force_torrent_deletion)
+    try:
+        with ssh_master.session():
+            follower.run()
+    except KeyboardInterrupt:
+        logger.info('KeyboardInterrupt. Exiting.')
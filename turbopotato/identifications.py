@@ -0,0 +1,75 @@
+import logging
+import os
+import time
+from typing import Union
+
+from turbopotato.cache import PersistentCache
+from turbopotato.media_defs import QueryResult
+
+logger = logging.getLogger('identify')
+
+MAX_AGE = 60 * 60 * 24 * 30  # 30 days
+
+
+class IdentificationCache:
+    """
+    Durable record of the chosen match for each (torrent hash, file path).
+
+    Retries of a torrent whose identification already succeeded can proceed straight
+    to transit. Entries are discarded if the file's size or modification time changes.
+
+    :param cache_dir: where identifications are stored; defaults to TP_CACHE_DIR
+    """
+    def __init__(self, cache_dir=None):
+        self.cache = PersistentCache('identifications', cache_dir=cache_dir)
+
+    @staticmethod
+    def key(file) -> str:
+        return f'{file.torrent_hash or ""}:{file.torrent_relative_path or file.filepath}'
+
+    @staticmethod
+    def _file_state(file) -> Union[dict, None]:
+        try:
+            stat = os.stat(file.filepath)
+        except OSError as e:
+            logger.debug(f'Failed to stat "{file.filepath}": {e}')
+            return None
+        return dict(size=stat.st_size, mtime=stat.st_mtime_ns)
+
+    def get(self, file) -> Union[QueryResult, None]:
+        entry = self.cache.get(self.key(file))
+        if not entry:
+            return None
+
+        if self._file_state(file) != entry.get('state'):
+            logger.debug(f'Discarding cached identification for "{file.filepath.name}"; file changed.')
+            self.cache.pop(self.key(file))
+            return None
+
+        try:
+            return QueryResult.from_dict(entry['chosen_one'])
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning(f'Discarding unusable cached identification for "{file.filepath.name}": {e}')
+            self.cache.pop(self.key(file))
+            return None
+
+    def set(self, file):
+        if not isinstance(file.chosen_one, QueryResult):
+            return
+        state = self._file_state(file)
+        if state is None:
+            return
+        self.cache.set(self.key(file), dict(state=state, chosen_one=file.chosen_one.to_dict(), time=time.time()))
+
+    def invalidate(self, file):
+        if self.cache.pop(self.key(file)) is not None:
+            logger.debug(f'Invalidated cached identification for "{file.filepath.name}"')
+
+    def save(self):
+        for key, entry in list(self.cache.data.items()):
+            if time.time() - entry.get('time', 0) > MAX_AGE:
+                self.cache.pop(key)
+        self.cache.save()
+
+
+identifications = IdentificationCache()
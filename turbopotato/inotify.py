@@ -0,0 +1,90 @@
+import ctypes
+import ctypes.util
+import errno
+from collections import namedtuple
+import os
+import struct
+from typing import Iterator
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+IN_CLOEXEC = 0o2000000
+IN_NONBLOCK = 0o4000
+
+_EVENT_HEADER = struct.Struct('iIII')
+
+Event = namedtuple('Event', 'wd mask cookie name')
+
+
+class InotifyError(OSError):
+    pass
+
+
+def _libc():
+    libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+    for name in ('inotify_init1', 'inotify_add_watch', 'inotify_rm_watch'):
+        if not hasattr(libc, name):
+            raise InotifyError(errno.ENOSYS, f'{name} is not available; inotify requires Linux')
+    libc.inotify_add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+    libc.inotify_rm_watch.argtypes = (ctypes.c_int, ctypes.c_int)
+    return libc
+
+
+class Inotify:
+    """Minimal ctypes binding for the Linux inotify API."""
+    def __init__(self):
+        self._libc = _libc()
+        self.fd = self._check(self._libc.inotify_init1(IN_CLOEXEC | IN_NONBLOCK))
+
+    @staticmethod
+    def _check(result: int) -> int:
+        if result < 0:
+            err = ctypes.get_errno()
+            raise InotifyError(err, os.strerror(err))
+        return result
+
+    def fileno(self) -> int:
+        return self.fd
+
+    def add_watch(self, path: str, mask: int) -> int:
+        return self._check(self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask))
+
+    def rm_watch(self, wd: int):
+        self._libc.inotify_rm_watch(self.fd, wd)
+
+    def read_events(self) -> Iterator[Event]:
+        """Read all queued events without blocking."""
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return
+            offset = 0
+            while offset < len(data):
+                wd, mask, cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+                offset += length
+                yield Event(wd=wd, mask=mask, cookie=cookie, name=name)
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,124 @@
+import logging
+import os
+from pathlib import Path
+import time
+from typing import Dict, Tuple, Union
+
+from turbopotato.cache import AppendOnlyLog
+
+logger = logging.getLogger('journal')
+
+PLANNED = 'planned'
+IN_PROGRESS = 'in_progress'
+COMPLETED = 'completed'
+FAILED = 'failed'
+
+PROGRESS_INTERVAL = 30  # seconds between progress records for a transfer
+PROGRESS_BYTES = 256 * 1024 * 1024  # ...or after this many more bytes
+COMPACT_THRESHOLD = 5000  # records
+
+Key = Tuple[str, str]  # (source, destination)
+
+
+class TransferJournal:
+    """
+    Crash-safe record of transfers and how far each got.
+
+    Every state change (planned, in progress with a byte offset, completed, failed) is appended
+    and fsync'd, so after a crash the journal shows which files of a batch landed and where an
+    interrupted file stopped. A transfer can resume only while its source is unchanged.
+    """
+    def __init__(self):
+        self.log = AppendOnlyLog('transfers', sync=True)
+        self._records: Union[Dict[Key, dict], None] = None
+        self._last_progress: Dict[Key, Tuple[float, int]] = dict()
+        self._latest_offset: Dict[Key, int] = dict()
+
+    @property
+    def records(self) -> Dict[Key, dict]:
+        if self._records is None:
+            self._records = dict()
+            for record in self.log.read():
+                try:
+                    self._records[(record['source'], record['destination'])] = record
+                except (KeyError, TypeError):
+                    continue
+        return self._records
+
+    def _append(self, source: Path, destination, state: str, offset: int = None):
+        key = (str(source), str(destination))
+        previous = self.records.get(key) or dict()
+        if state == PLANNED or 'size' not in previous:
+            try:
+                stat = os.stat(source)
+            except OSError as e:
+                logger.warning(f'Not journaling "{source}"; failed to stat: {e}')
+                return
+            size, mtime = stat.st_size, stat.st_mtime_ns
+        else:
+            size, mtime = previous['size'], previous['mtime']
+        if offset is None:
+            offset = previous.get('offset', 0) if state != PLANNED else 0
+        record = dict(source=key[0], destination=key[1], size=size, mtime=mtime, state=state, offset=offset,
+                      time=time.time())
+        self.records[key] = record
+        self.log.append(record)
+
+    def planned(self, source: Path, destination):
+        previous = self.records.get((str(source), str(destination)))
+        # keep an interrupted transfer's offset so it can be resumed
+        if previous and previous.get('state') in (IN_PROGRESS, FAILED) and previous.get('offset'):
+            return
+        self._append(source, destination, PLANNED)
+
+    def started(self, source: Path, destination, offset: int = 0):
+        self._last_progress[(str(source), str(destination))] = (time.monotonic(), offset)
+        self._latest_offset[(str(source), str(destination))] = offset
+        self._append(source, destination, IN_PROGRESS, offset=offset)
+
+    def reload(self):
+        """Forget cached records so changes from other processes are seen."""
+        self._records = None
+
+    def progress(self, source: Path, destination, offset: int):
+        key = (str(source), str(destination))
+        self._latest_offset[key] = offset
+        last_time, last_offset = self._last_progress.get(key, (0, 0))
+        if offset - last_offset >= PROGRESS_BYTES or time.monotonic() - last_time >= PROGRESS_INTERVAL:
+            self._last_progress[key] = (time.monotonic(), offset)
+            self._append(source, destination, IN_PROGRESS, offset=offset)
+
+    def completed(self, source: Path, destination):
+        key = (str(source), str(destination))
+        self._last_progress.pop(key, None)
+        self._latest_offset.pop(key, None)
+        self._append(source, destination, COMPLETED, offset=self.records.get(key, {}).get('size'))
+
+    def failed(self, source: Path, destination):
+        key = (str(source), str(destination))
+        self._last_progress.pop(key, None)
+        self._append(source, destination, FAILED, offset=self._latest_offset.pop(key, None))
+
+    def resume_offset(self, source: Path, destination) -> int:
+        """Offset an interrupted transfer of this unchanged source to this destination reached, else 0."""
+        record = self.records.get((str(source), str(destination)))
+        if not record or record.get('state') not in (IN_PROGRESS, FAILED) or not record.get('offset'):
+            return 0
+        try:
+            stat = os.stat(source)
+        except OSError:
+            return 0
+        if stat.st_size != record.get('size') or stat.st_mtime_ns != record.get('mtime'):
+            return 0
+        return record['offset']
+
+    def compact(self, force: bool = False):
+        """Rewrite the journal without completed transfers once it has grown past COMPACT_THRESHOLD records."""
+        if not force and sum(1 for _ in self.log.read()) < COMPACT_THRESHOLD:
+            return
+        self._records = None
+        self.log.compact(r for r in self.records.values() if r.get('state') != COMPLETED)
+        self._records = None
+
+
+journal = TransferJournal()
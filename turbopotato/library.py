@@ -0,0 +1,106 @@
+import logging
+from pathlib import PurePosixPath
+import re
+import time
+from typing import Dict, List, Union
+
+from turbopotato.cache import PersistentCache
+from turbopotato.media_defs import clean_path_part
+from turbopotato.media_defs import MediaNameParse
+from turbopotato.media_defs import MediaType
+from turbopotato.media_defs import QueryResult
+from turbopotato.remote_index import remote_index
+from turbopotato.remote_index import RemoteLibraryIndex
+
+logger = logging.getLogger('library')
+
+
+def folder_key(name: str) -> str:
+    """Comparable form of a show or movie folder name."""
+    return ' '.join(re.findall(r'[a-z0-9]+', clean_path_part(name).lower()))
+
+
+class LibraryCatalog:
+    """
+    Show and movie folders in the NAS library and the database ID each was filed under.
+
+    A folder's ID is recorded as files are transited into it. A new file whose parsed title names a
+    folder that still exists on the NAS (per the remote index) can then be queried by ID: the
+    series' details are kept here too, so a returning show needs only the episode lookup.
+
+    :param cache_dir: where the catalog is stored; defaults to TP_CACHE_DIR
+    :param index: listing of the NAS library
+    """
+    def __init__(self, cache_dir=None, index: RemoteLibraryIndex = None):
+        self.cache = PersistentCache('library', cache_dir=cache_dir)
+        self.index = index or remote_index
+        self._by_key: Union[Dict[str, List[str]], None] = None
+
+    @property
+    def by_key(self) -> Dict[str, List[str]]:
+        if self._by_key is None:
+            self._by_key = dict()
+            for folder in self.cache.data:
+                self._by_key.setdefault(folder_key(PurePosixPath(folder).name), list()).append(folder)
+        return self._by_key
+
+    def record(self, chosen_one: QueryResult, destination_directory: PurePosixPath):
+        """Remember the ID the folder a file was transited into belongs to."""
+        if not isinstance(chosen_one, QueryResult) or not destination_directory:
+            return
+        if chosen_one.media_type is MediaType.SERIES and chosen_one.series_id:
+            folder = destination_directory.parent  # the show, not the season
+            entry = dict(media_type=MediaType.SERIES.name, provider='tvdb', id=chosen_one.series_id,
+                         series=dict(id=chosen_one.series_id, seriesName=chosen_one.title, network=chosen_one.network,
+                                     aliases=chosen_one.aliases, status=chosen_one.status))
+        elif chosen_one.media_type is MediaType.MOVIE and chosen_one.movie_id:
+            folder = destination_directory
+            entry = dict(media_type=MediaType.MOVIE.name, provider='tmdb', id=chosen_one.movie_id)
+        else:
+            return
+        previous = self.cache.get(str(folder)) or dict()
+        if {k: previous.get(k) for k in entry} != entry:
+            self.cache.set(str(folder), dict(entry, time=time.time()))
+            self._by_key = None
+
+    def lookup(self, parts: MediaNameParse) -> Union[dict, None]:
+        """The recorded entry (plus its folder) for an existing folder matching the parsed names, if exactly one does."""
+        if parts is None or parts.media_type not in (MediaType.SERIES, MediaType.MOVIE):
+            return None
+        names = list()
+        for p in (parts, parts.parent_parts):
+            if p and p.title:
+                names += [f'{p.title} {p.year}', p.title] if p.year else [p.title]
+        existing = self.index.directories()
+        for name in names:
+            matches = [folder for folder in self.by_key.get(folder_key(name), list())
+                       if folder in existing and self.cache.get(folder, {}).get('media_type') == parts.media_type.name]
+            if len(matches) == 1:
+                return dict(self.cache.get(matches[0]), folder=matches[0])
+            if matches:
+                logger.debug(f'Library folders matching "{name}" are ambiguous: {matches}')
+                return None
+        return None
+
+    def identify(self, parts: MediaNameParse) -> Union[str, None]:
+        """Set the series or movie ID on parts from a matching library folder; returns the folder."""
+        if parts is None or parts.series_id or parts.movie_id or not (entry := self.lookup(parts)):
+            return None
+        if entry['media_type'] == MediaType.SERIES.name:
+            parts.series_id = entry['id']
+        else:
+            parts.movie_id = entry['id']
+        return entry['folder']
+
+    def series(self, series_id) -> Union[dict, None]:
+        """Series details recorded for an ID, in the shape TVDB returns them."""
+        for entry in self.cache.data.values():
+            if entry.get('media_type') == MediaType.SERIES.name and str(entry.get('id')) == str(series_id):
+                return dict(entry['series'])
+        return None
+
+    def save(self):
+        self.cache.save()
+
+
+library = LibraryCatalog()
@@ -82,3 +82,30 @@ class Log:
                 os.remove(log)
             except Exception as e:
                 print(f'Error deleting log file {log}: {e}')
+
+
+def configure_console_logging(level: str = 'INFO'):
+    """Log to the console only; used by long-running modes between runs."""
+    logging.config.dictConfig({
+        'version': 1,
+        'disable_existing_loggers': False,
+        'formatters': {
+            'console': {
+                'format': '[%(asctime)s] {%(name)10s:%(lineno)3d} %(levelname)5s - %(message)s'
+            }
+        },
+        'handlers': {
+            'console': {
+                'level': level,
+                'formatter': 'console',
+                'class': 'logging.StreamHandler',
+                'stream': 'ext://sys.stdout',
+            }
+        },
+        'loggers': {
+            '': {
+                'level': 'DEBUG',
+                'handlers': ['console'],
+            }
+        }
+    })
@@ -1,15 +1,14 @@
 import logging
 from typing import Union, List, Tuple, AnyStr
 
-from tvdbsimple.base import AuthenticationError
-
 from turbopotato.arguments import args
 from turbopotato.exceptions import NoMediaFiles
 from turbopotato.log import Log
 from turbopotato.media import Media
 from turbopotato.notify import notify
 from turbopotato.prompt import prompt
-from turbopotato.torrents import qBittorrentError
+from turbopotato.query import tvdb
+from turbopotato.torrents import qbt_api
 
 logger = logging.getLogger('main')
 
@@ -28,9 +27,10 @@ def main(args_override: list = None):
         notify(media=media, logs=logs)
     except NoMediaFiles:
         logger.error(f'No media files to process. Aborting.')
-    except qBittorrentError as e:
+    # exception classes below are looked up only when an exception reaches them, so their modules load lazily
+    except qbt_api.APIError as e:
         logger.error(f'Error communicating with qBittorrent: {e}')
-    except AuthenticationError as e:
+    except tvdb.base.AuthenticationError as e:
         logger.error(f'Error communicating with theTVDB: {e}')
     except Exception as e:
         logger.error(f'Unhandled exception: {e}', exc_info=True)
@@ -44,7 +44,8 @@ def main(args_override: list = None):
 
 def run(paths: Union[List, Tuple, AnyStr] = None, torrents: bool = False, force_torrent_deletion: bool = False,
         ask_for_torrent_update: bool = False, skip_torrent_updates: bool = False, log_level: str = None,
-        interactive: bool = True, no_notification_on_failure: bool = False):
+        interactive: bool = True, no_notification_on_failure: bool = False, reprocess: bool = False,
+        transfers: int = None, transfers_per_host: int = None, transfer_order: str = None):
     args_override = list()
     if torrents:
         args_override.append('--torrents')
@@ -61,6 +62,14 @@ def run(paths: Union[List, Tuple, AnyStr] = None, torrents: bool = False, force_
         args_override.append('--non-interactive')
     if no_notification_on_failure:
         args_override.append('--no-notification-on-failure')
+    if reprocess:
+        args_override.append('--reprocess')
+    if transfers:
+        args_override.extend(['--transfers', str(transfers)])
+    if transfers_per_host:
+        args_override.extend(['--transfers-per-host', str(transfers_per_host)])
+    if transfer_order:
+        args_override.extend(['--transfer-order', transfer_order])
     if paths:
         if isinstance(paths, (list, tuple)):
             args_override.extend(paths)
@@ -0,0 +1,108 @@
+import argparse
+import logging
+import os
+from pathlib import Path
+import time
+from typing import Dict, Tuple, Union
+
+from turbopotato.cache import AppendOnlyLog
+
+logger = logging.getLogger('manifest')
+
+SUCCESS = 'success'
+FAILURE = 'failure'
+
+
+def _identity(stat: os.stat_result) -> Tuple[int, int]:
+    return stat.st_dev, stat.st_ino
+
+
+class Manifest:
+    """
+    Append-only record of processed files and their outcomes.
+
+    Files are identified by (device, inode) and considered unchanged while their size and mtime
+    match. The most recent record for a file wins; `turbopotato manifest compact` discards
+    superseded records and records for files that no longer exist.
+
+    :param cache_dir: directory of the manifest; defaults to the turbopotato cache directory
+    """
+    def __init__(self, cache_dir: Path = None):
+        self.log = AppendOnlyLog('manifest', cache_dir=cache_dir)
+        self._records: Union[Dict[Tuple[int, int], dict], None] = None
+
+    @property
+    def records(self) -> Dict[Tuple[int, int], dict]:
+        if self._records is None:
+            self._records = dict()
+            for record in self.log.read():
+                try:
+                    self._records[(record['dev'], record['ino'])] = record
+                except (KeyError, TypeError):
+                    continue
+        return self._records
+
+    def is_done(self, path: Path, stat: os.stat_result = None) -> bool:
+        """Whether the file was already transited successfully and hasn't changed since."""
+        try:
+            stat = stat or os.stat(path)
+        except OSError:
+            return False
+        record = self.records.get(_identity(stat))
+        return bool(
+            record
+            and record.get('outcome') == SUCCESS
+            and record.get('size') == stat.st_size
+            and record.get('mtime') == stat.st_mtime_ns
+        )
+
+    def get(self, path: Path) -> Union[dict, None]:
+        try:
+            return self.records.get(_identity(os.stat(path)))
+        except OSError:
+            return None
+
+    def record(self, path: Path, outcome: str, destination=None):
+        try:
+            stat = os.stat(path)
+        except OSError as e:
+            logger.warning(f'Not recording "{path}" in manifest; failed to stat: {e}')
+            return
+        record = dict(dev=stat.st_dev, ino=stat.st_ino, size=stat.st_size, mtime=stat.st_mtime_ns,
+                      path=str(path), destination=str(destination) if destination else None,
+                      outcome=outcome, time=time.time())
+        self.records[_identity(stat)] = record
+        self.log.append(record)
+
+    def compact(self) -> Tuple[int, int]:
+        """
+        Rewrite the manifest with only the latest record for each file that still exists unchanged.
+
+        :return: number of records before and after compaction
+        """
+        before = sum(1 for _ in self.log.read())
+        self._records = None
+        kept = list()
+        for identity, record in self.records.items():
+            try:
+                stat = os.stat(record['path'])
+            except OSError:
+                continue
+            if _identity(stat) == identity and stat.st_size == record.get('size') and stat.st_mtime_ns == record.get('mtime'):
+                kept.append(record)
+        self.log.compact(kept)
+        self._records = None
+        return before, len(kept)
+
+
+def command(argv: list = None):
+    parser = argparse.ArgumentParser(prog='turbopotato manifest', description='manage the processed files manifest')
+    parser.add_argument('action', choices=['compact'], help='compact: drop superseded and stale records')
+    parsed = parser.parse_args(args=argv)
+
+    if parsed.action == 'compact':
+        before, after = manifest.compact()
+        print(f'Compacted manifest "{manifest.log.filepath}" from {before} to {after} records.')
+
+
+manifest = Manifest()
@@ -1,24 +1,44 @@
 from collections import namedtuple
-from copy import copy
+from concurrent.futures import ThreadPoolExecutor
 import logging
 import os
 from pathlib import Path, PurePosixPath
-from typing import List, Union
-
-import PyInquirer
+import time
+from typing import Iterable, List, Union
 
 from turbopotato.arguments import args
 from turbopotato.exceptions import NoMediaFiles
+from turbopotato.fingerprint import fingerprint
+from turbopotato.fingerprint import fingerprints
+from turbopotato.identifications import identifications
+from turbopotato.lazy import lazy_import
+from turbopotato.library import library
+from turbopotato.manifest import FAILURE
+from turbopotato.manifest import SUCCESS
+from turbopotato.manifest import manifest
 from turbopotato.media_defs import clean_path_part
 from turbopotato.media_defs import MediaNameParse
 from turbopotato.media_defs import MediaType
 from turbopotato.media_defs import QueryResult
-from turbopotato.parser import parse
+from turbopotato.parallel import map_chunked
+from turbopotato.parser import parse_many
+from turbopotato.planner import planner
+from turbopotato.progress import FileProgress
+from turbopotato.progress import human_duration
+from turbopotato.progress import human_size
+from turbopotato.progress import monitor
 from turbopotato.query import DBQuery
 from turbopotato.query import TMDBQuery
 from turbopotato.query import TVDBQuery
+from turbopotato.remote_index import remote_index
+from turbopotato.scheduling import TransferSchedule
+from turbopotato.supervisor import Transfer
 from turbopotato.torrents import torrents
-from turbopotato.transit import send_file
+from turbopotato.transit import ssh_master
+from turbopotato.transports import deliver
+from turbopotato.transports import Router
+
+PyInquirer = lazy_import('PyInquirer')
 
 logger = logging.getLogger('media')
 
@@ -31,20 +51,68 @@ TV_SHOWS_PATH = MEDIA_ROOT / "TV Shows"
 
 FileGroup = namedtuple('FileGroup', 'success files name')
 
+QUERY_PROVIDERS = {'tmdb': TMDBQuery, 'tvdb': TVDBQuery}
+
+
+def update_torrent(torrent, success: bool, force_deletion: bool = None):
+    """Move, recategorize or delete a torrent now that all of its files are done."""
+    force_deletion = args.force_torrent_deletion if force_deletion is None else force_deletion
+    torrents_root_dir = '/home/user/torrents/'
+    delete_categories = ('errored delete after upload', 'delete after upload')
+    skip_update_categories = ('skip update after upload',)
+
+    category = None
+    location = None
+    if torrent.category not in skip_update_categories:
+        if success:
+            if force_deletion or torrent.category in delete_categories:
+                logger.info(f'Deleting {torrent.name}')
+                torrents.wrap_api_call(torrents.qbt_client.torrents_delete,
+                                       delete_files=True,
+                                       hashes=torrent.hash)
+            else:
+                category = 'uploaded'
+                location = '1completed'
+        elif torrent.category in delete_categories:
+            category = 'errored delete after upload'
+            location = '2errored'
+        elif not torrent.category:
+            category = 'errored'
+            location = '2errored'
+        if location:
+            logger.info(f'Moving "{torrent.name}" to "{location}" directory')
+            torrents.wrap_api_call(torrents.qbt_client.torrents_set_location,
+                                   location=torrents_root_dir + location,
+                                   hashes=torrent.hash)
+        if category:
+            logger.info(f'Setting category to "{category}" for "{torrent.name}"')
+            torrents.wrap_api_call(torrents.qbt_client.torrents_set_category,
+                                   category=category,
+                                   hashes=torrent.hash)
+
 
 class File:
     def __init__(self, filepath: Path = None):
         self.filepath = filepath
         self.original_torrent = None
         self.torrent_hash = None
+        self.torrent_relative_path = None
 
         self.success = False
         self.skip = False
         self.failure_reason = ''
+        self.transfer_stats: Union[FileProgress, None] = None
 
         self._parts: MediaNameParse = None
         self.query: DBQuery = None
         self._chosen_one: QueryResult = None
+        self._fingerprint = None
+
+    @property
+    def fingerprint(self) -> Union[str, None]:
+        if self._fingerprint is None:
+            self._fingerprint = fingerprint(self.filepath)
+        return self._fingerprint
 
     @property
     def parts(self):
@@ -126,24 +194,41 @@ class File:
         return None
 
     def identify_media(self):
-        query_precedence = (TMDBQuery(), TVDBQuery())
+        if folder := library.identify(self.parts):
+            logger.info(f'Found "{folder}" in library; querying by ID '
+                        f'{self.parts.series_id or self.parts.movie_id}')
+        providers, search_terms = planner.plan(parts=self.parts)
 
-        if self.parts.media_type is MediaType.SERIES:
-            query_precedence = tuple(reversed(query_precedence))
-
-        self.query = query_precedence[0].query(parts=self.parts)
-        if not self.query.is_matches:
-            self.query = query_precedence[1].query(parts=self.parts)
+        for provider in providers:
+            self.query = QUERY_PROVIDERS[provider]().query(parts=self.parts, search_terms=search_terms)
+            if self.query.is_matches:
+                break
 
 
 class Media:
-    def __init__(self):
-        self.files: Union[List[File], None] = list(map(File, args.files)) if args.files else None
-
-        if args.torrents:
-            self._find_torrent_for_each_file()
+    def __init__(self, filepaths: Iterable[Path] = None):
+        """
+        :param filepaths: media files to process; defaults to streaming them from the path arguments
+        """
+        self.files: List[File] = list()
+        self.done_files: List[File] = list()  # files of torrents skipped as already transited by an earlier run
+        self.updated_torrents = set()  # hashes of torrents already updated after transit
+
+        # each file is matched to its torrent as discovery yields it, while other directories are still being scanned
+        for filepath in (args.iter_media_files() if filepaths is None else filepaths):
+            file = File(filepath)
+            if not args.torrents or self._find_torrent(file):
+                self.files.append(file)
+
+        if args.torrents and filepaths is None:
+            for filepath in args.done_paths:
+                file = File(filepath)
+                if self._find_torrent(file):
+                    self.done_files.append(file)
 
         if not self.files:
+            # e.g. a torrent re-added after its files were transited; it still needs its final update
+            self.update_torrents()
             raise NoMediaFiles
         else:
             logger.debug('Files to process:')
@@ -155,35 +240,36 @@ class Media:
     def __iter__(self):
         return iter(self.files)
 
-    def _find_torrent_for_each_file(self):
-        files_copy = copy(self.files)
-        self.files = list()
-
-        for file in files_copy:
-            # traverse the filepath parts backwards trying to find the torrent by name.
-            # as long as a torrent name isn't changed, torrents will be the name of the file or one of its parent dirs
-            # torrent = next(filter(None, map(torrents.get_torrent, reversed(file.filepath.parts))), None)
-            torrent = None
-            for count in range(len(file.filepath.parts)-1, 0, -1):
-                if torrent := torrents.get_torrent_by_filepath('/'.join(file.filepath.parts[count:])):
-                    break
-
-            if torrent is None:
-                logger.warning(f'Torrent not found. Skipping "{file.filepath}"')
-                continue
-
-            if torrents.is_transiting(torrent):
-                logger.warning(f'Torrent "({torrent.name})" is already transiting. Skipping "{file.filepath}"')
-                continue
-
-            if torrent.category == 'skip upload' and not args.interactive:
-                logger.warning(f'Torrent category is "{torrent.category}", Skipping "{file.filepath}"')
-                continue
-
-            logger.debug(f'Using torrent "{torrent.name}" for "{file.filepath}"')
-            file.torrent_hash = torrent.hash
-            file.original_torrent = torrent
-            self.files.append(file)
+    @staticmethod
+    def _find_torrent(file: File) -> bool:
+        """Attach the file's torrent; returns False if the file should be skipped."""
+        # traverse the filepath parts backwards trying to find the torrent by name.
+        # as long as a torrent name isn't changed, torrents will be the name of the file or one of its parent dirs
+        # torrent = next(filter(None, map(torrents.get_torrent, reversed(file.filepath.parts))), None)
+        torrent = None
+        relative_path = None
+        for count in range(len(file.filepath.parts)-1, 0, -1):
+            relative_path = '/'.join(file.filepath.parts[count:])
+            if torrent := torrents.get_torrent_by_filepath(relative_path):
+                break
+
+        if torrent is None:
+            logger.warning(f'Torrent not found. Skipping "{file.filepath}"')
+            return False
+
+        if torrents.is_transiting(torrent):
+            logger.warning(f'Torrent "({torrent.name})" is already transiting. Skipping "{file.filepath}"')
+            return False
+
+        if torrent.category == 'skip upload' and not args.interactive:
+            logger.warning(f'Torrent category is "{torrent.category}", Skipping "{file.filepath}"')
+            return False
+
+        logger.debug(f'Using torrent "{torrent.name}" for "{file.filepath}"')
+        file.torrent_hash = torrent.hash
+        file.torrent_relative_path = relative_path
+        file.original_torrent = torrent
+        return True
 
     def get_file_groups(self) -> List[FileGroup]:
         file_groups = list()
@@ -208,6 +294,15 @@ class Media:
 
         return file_groups
 
+    def get_done_file_groups(self) -> List[FileGroup]:
+        """Groups for torrents with no files to process because all were already transited successfully."""
+        processing = set(f.torrent_hash for f in self.files)
+        file_groups = list()
+        for torrent_hash in set(f.torrent_hash for f in self.done_files) - processing:
+            files = [f for f in self.done_files if f.torrent_hash == torrent_hash]
+            file_groups.append(FileGroup(success=True, files=files, name=files[0].original_torrent.name))
+        return file_groups
+
     def set_transiting(self):
         if args.torrents:
             for torrent in list({file.original_torrent.hash: file.original_torrent for file in self.files}.values()):
@@ -216,53 +311,29 @@ class Media:
                                        hashes=torrent.hash,
                                        category='transiting')
 
+    def update_torrent_group(self, file_group: FileGroup):
+        """Move, recategorize or delete a group's torrent now that all of its files are done."""
+        torrent = file_group.files[0].original_torrent
+        update_torrent(torrent, success=file_group.success)
+        self.updated_torrents.add(torrent.hash)
+
     def update_torrents(self):
         """
         follow rules to appropriately update category.
         if torrent is still marked transiting, restore back to original state.
         this is primarily to ensure torrents are not left in a transiting state when wrapping things up.
         """
-        torrents_root_dir = '/home/user/torrents/'
-        delete_categories = ('errored delete after upload', 'delete after upload')
-        skip_update_categories = ('skip update after upload',)
-
         if args.torrents:
-            update_torrents = not args.skip_torrent_updates
+            file_groups = [file_group for file_group in self.get_file_groups() + self.get_done_file_groups()
+                           if file_group.files[0].torrent_hash not in self.updated_torrents]
+            update_torrents = not args.skip_torrent_updates and bool(file_groups)
             if update_torrents and args.ask_for_torrent_updates:
                 update_torrents = PyInquirer.prompt(questions={'type': 'confirm',
                                                                'name': 'update',
                                                                'message': 'Update torrents?'}).get('update', False)
             if update_torrents:
-                for file_group in self.get_file_groups():
-                    category = None
-                    location = None
-                    torrent = file_group.files[0].original_torrent
-                    if torrent.category not in skip_update_categories:
-                        if file_group.success:
-                            if args.force_torrent_deletion or torrent.category in delete_categories:
-                                logger.info(f'Deleting {torrent.name}')
-                                torrents.wrap_api_call(torrents.qbt_client.torrents_delete,
-                                                       delete_files=True,
-                                                       hashes=torrent.hash)
-                            else:
-                                category = 'uploaded'
-                                location = '1completed'
-                        elif torrent.category in delete_categories:
-                            category = 'errored delete after upload'
-                            location = '2errored'
-                        elif not torrent.category:
-                            category = 'errored'
-                            location = '2errored'
-                        if location:
-                            logger.info(f'Moving "{torrent.name}" to "{location}" directory')
-                            torrents.wrap_api_call(torrents.qbt_client.torrents_set_location,
-                                                   location=torrents_root_dir + location,
-                                                   hashes=torrent.hash)
-                        if category:
-                            logger.info(f'Setting category to "{category}" for "{torrent.name}"')
-                            torrents.wrap_api_call(torrents.qbt_client.torrents_set_category,
-                                                   category=category,
-                                                   hashes=torrent.hash)
+                for file_group in file_groups:
+                    self.update_torrent_group(file_group)
 
             # one last roll through to ensure torrents are not left as 'transiting'
             for torrent in list({file.original_torrent.hash: file.original_torrent for file in self.files}.values()):
@@ -273,29 +344,43 @@ class Media:
                                            category=torrent.category or '')
 
     def parse_filenames(self):
-        for file in self.files:
-            try:
-                file.parts = parse(filepath=file.filepath)
-            except Exception as e:
-                file.failure_reason = f'Error during filename parsing: {e}'
-                logger.exception(f'Error during filename parsing. Filename: {file.filepath.name}. Error: {e}')
+        parsed = map_chunked(parse_many, [file.filepath for file in self.files],
+                             threshold=args.parallel_threshold, workers=args.workers)
+        for file, parts in zip(self.files, parsed):
+            if isinstance(parts, Exception):
+                file.failure_reason = f'Error during filename parsing: {parts}'
+                logger.error(f'Error during filename parsing. Filename: {file.filepath.name}. Error: {parts}',
+                             exc_info=parts)
+                continue
+            file.parts = parts
             logger.debug(f'Parsed {file.filepath.name}: {file.parts}')
             if file.parts.parent_parts:
                 logger.debug(f'Parsed parent {file.filepath.parent}: {file.parts.parent_parts}')
 
     def identify_media(self):
+        # returning shows are found among the library's folders
+        with ssh_master.session():
+            remote_index.refresh(MEDIA_ROOT)
         for file in self.files:
             logger.info(f'')
             logger.info(f'>>> Starting identification for {file.filepath.name}...')
-            file.identify_media()
+            if cached_chosen_one := identifications.get(file):
+                logger.info(f'Using previous identification: {cached_chosen_one}')
+                file.query = DBQuery()
+                file.chosen_one = cached_chosen_one
+            elif previous := fingerprints.get(file):
+                logger.info(f'Recognized content previously sent to "{previous["destination"]}": {previous["chosen_one"]}')
+                file.query = DBQuery()
+                file.chosen_one = previous['chosen_one']
+            else:
+                file.identify_media()
             logger.info(f'<<< Finished identification for {file.filepath.name}.')
 
     def transit(self):
+        entries = list()
         for file in self.files:
-            logger.info(f'')
-            logger.info(f'>>> Starting transit for {file.filepath.name}...')
             if not file.chosen_one or file.skip:
-                logger.warning(f'Cannot transit. Chosen one: {file.chosen_one}. Skip file: {file.skip}.')
+                logger.warning(f'Cannot transit {file.filepath.name}. Chosen one: {file.chosen_one}. Skip file: {file.skip}.')
                 continue
 
             dest_dir = file.destination_directory
@@ -303,15 +388,96 @@ class Media:
 
             if not dest_dir or not dest_filename:
                 file.failure_reason = f'Insufficient information to construct destination filepath.'
-                logger.error(file.failure_reason)
+                logger.error(f'{file.failure_reason} File: {file.filepath.name}')
+                manifest.record(file.filepath, outcome=FAILURE)
                 continue
 
+            # remember the identification so a retry after a failed transfer can skip straight to transit
+            identifications.set(file)
+
+            entries.append((file.filepath, dest_dir/dest_filename, file))
+
+        # torrents keep seeding from their files, so they're never moved out from under qBittorrent
+        router = Router(keep_sources=args.torrents)
+
+        def succeeded(file: File, destination: PurePosixPath):
+            file.success = True
+            fingerprints.set(file, destination=destination)
+            # a moved file can't be rediscovered, so there's nothing for the manifest to skip
+            if not router.transport(destination).consumes_source:
+                manifest.record(file.filepath, outcome=SUCCESS, destination=destination)
+            if file.fingerprint:
+                remote_index.add(destination, size=int(file.fingerprint.split(':', 1)[0]))
+            library.record(file.chosen_one, file.destination_directory)
+            if file.query.is_matches:
+                planner.record(parts=file.parts, chosen_one=file.chosen_one)
+
+        def on_start(transfer: Transfer):
+            logger.info(f'')
+            logger.info(f'>>> Starting transit for {transfer.name}...')
+
+        def on_complete(file: File, success: bool, error: Union[Exception, None]):
+            destination = file.destination_directory/file.destination_filename
+            file.transfer_stats = monitor.get(file)
+            if success:
+                logger.info(f'File successfully transited: {file.filepath.name}')
+                if file.transfer_stats:
+                    logger.info(f'Transferred {file.transfer_stats}')
+                succeeded(file, destination)
+            else:
+                file.failure_reason = f'Failed to transmit file. Error: {error}'
+                logger.error(f'{file.failure_reason} File: {file.filepath.name}')
+                manifest.record(file.filepath, outcome=FAILURE, destination=destination)
+            logger.info(f'<<< Finished transit for {file.filepath.name}.')
+
+        def release(file_group: FileGroup):
             try:
-                send_file(local_filepath=file.filepath, remote_filepath=dest_dir/dest_filename)
-                logger.info('File successfully transited')
-                file.success = True
+                self.update_torrent_group(file_group)
             except Exception as e:
-                file.failure_reason = f'Failed to transmit file. Error: {e}'
-                logger.exception(file.failure_reason)
+                logger.error(f'Failed to update torrent "{file_group.name}": {e}', exc_info=True)
 
-            logger.info(f'<<< Finished transit for {file.filepath.name}.')
+        # qBittorrent calls block, so torrents are updated from their own thread rather than the transfer
+        # supervisor's event loop that group completions are reported on
+        releases = ThreadPoolExecutor(max_workers=1, thread_name_prefix='torrent-updates')
+
+        def on_group_complete(torrent_hash: str, files: List[File]):
+            # release each torrent as soon as its files are done rather than after the whole run
+            if args.torrents and not args.skip_torrent_updates and not args.ask_for_torrent_updates:
+                for file_group in self.get_file_groups():
+                    if file_group.files[0].torrent_hash == torrent_hash:
+                        releases.submit(release, file_group)
+
+        schedule = TransferSchedule(policy=args.transfer_order,
+                                    group=(lambda entry: entry[2].torrent_hash) if args.torrents else None,
+                                    category=lambda entry: getattr(entry[2].original_torrent, 'category', ''),
+                                    on_group_complete=on_group_complete)
+
+        with releases, ssh_master.session():  # waits for queued torrent updates before returning
+            # a re-added torrent's files may already be in the library; don't send them again
+            if entries:
+                remote_index.refresh(MEDIA_ROOT)
+                present = remote_index.present({destination: file.fingerprint for _, destination, file in entries})
+                for _, destination, file in entries:
+                    if destination in present:
+                        logger.info(f'Already in library with identical content: {destination}. Skipping transit.')
+                        succeeded(file, destination)
+                entries = [entry for entry in entries if entry[1] not in present]
+
+            start = time.monotonic()
+            deliver(entries, concurrency=args.transfers, per_host=args.transfers_per_host,
+                    on_start=on_start, on_complete=on_complete, router=router, schedule=schedule)
+            elapsed = time.monotonic() - start
+        sent = [file for _, _, file in entries if file.success]
+        transferred = sum(f.transfer_stats.transferred for f in sent if f.transfer_stats)
+        saved = sum(f.transfer_stats.saved for f in sent if f.transfer_stats)
+        if entries:
+            logger.info(f'Transit summary: {len(sent)} of {len(entries)} files, '
+                        f'{human_size(transferred)} in {human_duration(elapsed)} '
+                        f'({human_size(transferred / elapsed if elapsed > 0 else 0)}/s)'
+                        + (f'; {human_size(saved)} not sent by linking identical library files' if saved else ''))
+
+        planner.save()
+        identifications.save()
+        fingerprints.save()
+        remote_index.save()
+        library.save()
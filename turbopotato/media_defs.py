@@ -105,6 +105,13 @@ class MediaName:
             all(getattr(self, a) == getattr(other, a) for a in ('title', 'year', 'season', 'episode', 'episode_name'))
         )
 
+    def to_dict(self) -> dict:
+        """JSON-serializable representation of the media name; see QueryResult.from_dict()."""
+        data = {k: v for k, v in vars(self).items() if k not in ('parent_parts', 'raw_parse')}
+        data['media_type'] = self.media_type.name if isinstance(self.media_type, MediaType) else None
+        data['genre_ids'] = sorted(self.genre_ids)
+        return data
+
     def is_documentary(self):
         return 99 in getattr(self, 'genre_ids', set())
 
@@ -166,13 +173,21 @@ class QueryResult(MediaName):
 
         self.fuzzy_match_score = data.get('_fuzzy_score', -1)
 
+        # database and search term that produced this result; used for query planning
+        self.provider = ''
+        self.search_term = data.get('_search_term', '')
+
         if self.media_type is MediaType.MOVIE:
+            self.provider = 'tmdb' if data.get('id') else ''
+            self.movie_id = data.get('id')
             self.title = data['title']
             self.genre_ids = set(data.get('genre_ids') or set())
             self.genre_ids.update([gid for gid in data.get('genres', [])])
             self.year = data.get('release_date', '')[:4]
         elif self.media_type is MediaType.SERIES:
             series = data.get('_series', '')
+            self.provider = 'tvdb' if series.get('id') else ''
+            self.search_term = series.get('_search_term', '')
             self.title = series.get('seriesName', '')
             self.series_id = series.get('id', '')
             self.episode = data.get('airedEpisodeNumber', '')
@@ -182,3 +197,14 @@ class QueryResult(MediaName):
             self.network = series.get('network')
             self.aliases = series.get('aliases')
             self.status = series.get('status')
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        """Rebuild a result saved with to_dict()."""
+        media_type = MediaType[data['media_type']] if data.get('media_type') else None
+        result = cls(data=dict(title='', _series=dict()), media_type=media_type)
+        for key, value in data.items():
+            if key != 'media_type' and hasattr(result, key):
+                setattr(result, key, value)
+        result.genre_ids = set(result.genre_ids)
+        return result
@@ -46,6 +46,8 @@ def notify(media: Media, logs: Log):
                 summary += f'<tr><td>Identified Information</td><td>{file.chosen_one}</td></tr>'
                 summary += f'<tr><td>Destination Directory</td><td>{file.destination_directory}</td></tr>'
                 summary += f'<tr><td>Destination Filename</td><td>{file.destination_filename}</td></tr>'
+                if file.transfer_stats:
+                    summary += f'<tr><td>Transfer</td><td>{file.transfer_stats}</td></tr>'
             else:
                 summary += '<tr><td colspan="2"><b>Failed to add media to your library<b></td></tr>'
                 summary += f'<tr><td>Filename</td><td>{file.filepath.name}</td></tr>'
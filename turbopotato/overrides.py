@@ -0,0 +1,206 @@
+from collections import deque
+import json
+import logging
+import os
+from pathlib import Path
+import re
+import time
+from typing import Dict, Iterator, List, Tuple, Union
+
+from turbopotato.config import config
+from turbopotato.media_defs import MediaNameParse
+
+logger = logging.getLogger('overrides')
+
+RELOAD_INTERVAL = 5  # seconds between checks for a modified overrides file
+# regexes that can't share a pattern with others: named groups, backreferences, conditionals, inline flags
+SELF_CONTAINED_REGEX = re.compile(r'\\[1-9]|\(\?P[<=]|\(\?\(|\(\?[aiLmsux]+\)')
+
+
+def normalize_title(title: str) -> str:
+    return ' '.join(str(title).lower().split())
+
+
+class Override:
+    """
+    Forced identification for titles that name-based lookup gets wrong.
+
+    Exactly one of the following selects the titles to match; titles are normalized
+    to lowercase with single spaces before matching:
+        match: text contained anywhere in the title
+        exact: the entire title
+        regex: regular expression searched for in the title
+    """
+    def __init__(self, index: int, data: dict):
+        self.index = index
+        self.match = normalize_title(data['match']) if data.get('match') else None
+        self.exact = normalize_title(data['exact']) if data.get('exact') else None
+        self.regex = data.get('regex') or None
+        self.series_id = data.get('series_id')
+        self.movie_id = data.get('movie_id')
+        self.season_offset = int(data.get('season_offset', 0))
+        self.episode_offset = int(data.get('episode_offset', 0))
+
+        if sum(bool(x) for x in (self.match, self.exact, self.regex)) != 1:
+            raise ValueError(f'Override {index} must specify exactly one of "match", "exact", or "regex"')
+        if self.regex:
+            re.compile(self.regex)
+
+    def __repr__(self):
+        return f'<{type(self).__name__}: {vars(self)}>'
+
+    def apply(self, parts: MediaNameParse):
+        if self.series_id:
+            parts.series_id = self.series_id
+        if self.movie_id:
+            parts.movie_id = self.movie_id
+        if self.season_offset and isinstance(parts.season, int):
+            parts.season += self.season_offset
+        if self.episode_offset and isinstance(parts.episode, int):
+            parts.episode += self.episode_offset
+
+
+class AhoCorasick:
+    """Multi-pattern substring matcher; search cost depends on the text length, not the number of patterns."""
+    def __init__(self, patterns: Dict[str, int]):
+        self._goto: List[Dict[str, int]] = [dict()]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [list()]
+
+        for pattern, value in patterns.items():
+            state = 0
+            for char in pattern:
+                if char not in self._goto[state]:
+                    self._goto.append(dict())
+                    self._fail.append(0)
+                    self._out.append(list())
+                    self._goto[state][char] = len(self._goto) - 1
+                state = self._goto[state][char]
+            self._out[state].append(value)
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._out[next_state].extend(self._out[self._fail[next_state]])
+
+    def search(self, text: str) -> Iterator[int]:
+        state = 0
+        for char in text:
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            yield from self._out[state]
+
+
+class Overrides:
+    """
+    Table of title overrides loaded from the overrides file (TP_OVERRIDES_FILE or the packaged overrides.json).
+
+    All overrides are compiled into a single matcher: a dict for exact titles, an Aho-Corasick automaton
+    for substrings, and one alternation of the regular expressions with a group named for each override.
+    When several overrides match, the one listed first in the file wins. The file is reloaded when it changes.
+    """
+    def __init__(self, filepath: Path = None):
+        self.filepath = filepath
+        self.overrides: List[Override] = list()
+        self._exact: Dict[str, int] = dict()
+        self._substrings: Union[AhoCorasick, None] = None
+        self._combined: Union[re.Pattern, None] = None
+        self._first_combined = None  # index of the first override in the combined pattern
+        self._regexes: List[Tuple[int, re.Pattern]] = list()  # self-contained regexes, matched on their own
+        self._mtime = None
+        self._last_check = 0
+
+    def _reload_if_modified(self):
+        if time.monotonic() - self._last_check < RELOAD_INTERVAL and self._mtime is not None:
+            return
+        self._last_check = time.monotonic()
+
+        filepath = self.filepath or config.OVERRIDES_FILE
+        try:
+            mtime = os.stat(filepath).st_mtime_ns
+        except OSError as e:
+            if self._mtime != -1:
+                logger.warning(f'Overrides file "{filepath}" unavailable: {e}')
+            self._mtime = -1
+            return
+        if mtime == self._mtime:
+            return
+
+        try:
+            with open(filepath, 'r', encoding='utf-8') as f:
+                overrides = [Override(index, data) for index, data in enumerate(json.load(f))]
+        except (OSError, ValueError, KeyError, TypeError, re.error) as e:
+            logger.error(f'Failed to load overrides from "{filepath}"; keeping previous overrides. Error: {e}')
+        else:
+            self.compile(overrides)
+            logger.debug(f'Loaded {len(overrides)} overrides from "{filepath}"')
+        self._mtime = mtime
+
+    def compile(self, overrides: List[Override]):
+        self.overrides = overrides
+        self._exact = dict()
+        for override in overrides:
+            if override.exact:
+                self._exact.setdefault(override.exact, override.index)
+        substrings = dict()
+        for override in overrides:
+            if override.match:
+                substrings.setdefault(override.match, override.index)
+        self._substrings = AhoCorasick(substrings) if substrings else None
+        combined = list()
+        self._regexes = list()
+        for override in overrides:
+            if not override.regex:
+                continue
+            if SELF_CONTAINED_REGEX.search(override.regex):
+                self._regexes.append((override.index, re.compile(override.regex)))
+            else:
+                combined.append((override.index, f'(?P<_{override.index}>{override.regex})'))
+        self._combined = re.compile('|'.join(regex for _, regex in combined)) if combined else None
+        self._first_combined = combined[0][0] if combined else None
+
+    def match(self, title: str) -> Union[Override, None]:
+        self._reload_if_modified()
+        if not title or not self.overrides:
+            return None
+
+        title = normalize_title(title)
+        matches = list()
+        if title in self._exact:
+            matches.append(self._exact[title])
+        if self._substrings:
+            matches.extend(self._substrings.search(title))
+        best = min(matches, default=None)
+        # at each position the alternation picks the first listed regex, so scan every match position
+        position = 0
+        while self._combined and (best is None or best > self._first_combined) \
+                and (match := self._combined.search(title, position)):
+            index = int(match.lastgroup[1:])
+            if best is None or index < best:
+                best = index
+            position = match.start() + 1
+        for index, regex in self._regexes:
+            if best is not None and index >= best:
+                break
+            if regex.search(title):
+                best = index
+                break
+        return self.overrides[best] if best is not None else None
+
+    def apply(self, parts: MediaNameParse) -> Union[Override, None]:
+        if parts is None:
+            return None
+        if override := self.match(parts.title):
+            logger.debug(f'Applying override for "{parts.title}": {override}')
+            override.apply(parts)
+        return override
+
+
+overrides = Overrides()
@@ -0,0 +1,32 @@
+from concurrent.futures import ProcessPoolExecutor
+import logging
+from typing import Callable, List, Sequence
+
+logger = logging.getLogger('parallel')
+
+DEFAULT_THRESHOLD = 1000
+CHUNK_SIZE = 250
+
+
+def map_chunked(func: Callable[[List], List], items: Sequence, threshold: int = DEFAULT_THRESHOLD,
+                workers: int = None) -> List:
+    """
+    Apply a batch function to items, sharding them across a process pool for large batches.
+
+    Items are split into contiguous chunks so related items (e.g. files in the same directory)
+    land in the same worker. Results are concatenated in the order of the original items.
+
+    :param func: picklable function that accepts a list of items and returns a list of results
+    :param items: items to process
+    :param threshold: minimum number of items before a process pool is used; 0 disables the pool
+    :param workers: number of processes; defaults to the number of CPUs
+    :return: results for all items
+    """
+    items = list(items)
+    if not threshold or len(items) < threshold or workers == 1:
+        return func(items)
+
+    chunks = [items[i:i + CHUNK_SIZE] for i in range(0, len(items), CHUNK_SIZE)]
+    logger.debug(f'Processing {len(items)} items in {len(chunks)} chunks with {func.__name__}')
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return [result for chunk_results in pool.map(func, chunks) for result in chunk_results]
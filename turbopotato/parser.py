@@ -1,20 +1,40 @@
+from copy import deepcopy
+from functools import lru_cache
 import logging
 from pathlib import Path
 from string import printable, digits
+from typing import Iterable, List, Tuple, Union
 
 import PTN
 
+from turbopotato import fastparse
 from turbopotato.media_defs import MediaNameParse
 from turbopotato.media_defs import MediaType
+from turbopotato.overrides import overrides
 
 logger = logging.getLogger('parse')
 
+PARSE_CACHE_SIZE = 4096
 
-def parse(filepath: Path = None):
-    ptn_results = PTN.parse(filepath.name)
 
-    # determine which parent directory should be considered the real parent
-    parent_path = filepath.parent
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _cached_parse_name(name: str) -> dict:
+    return fastparse.parse(name) or PTN.parse(name)
+
+
+def parse_name(name: str) -> dict:
+    """
+    Parse a file or directory name with the fast-path parser, falling back to PTN.
+
+    Results are memoized by name; the returned dict is a copy that is safe to modify.
+    """
+    return deepcopy(_cached_parse_name(name))
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _resolve_parent(parent_path: Path) -> Tuple[Path, Union[int, None]]:
+    """Determine which parent directory should be considered the real parent and any season number it names."""
+    season_in_dir = None
     if parent_path:
         # season is important because parsing out a season number means we're dealing with a series
         if parent_path.name.lower().startswith('season'):
@@ -24,11 +44,42 @@ def parse(filepath: Path = None):
             except ValueError:
                 pass
             else:
-                parent_path = filepath.parent.parent
-                if not ptn_results.get('season'):
-                    ptn_results['season'] = season_in_dir
+                parent_path = parent_path.parent
         elif parent_path.name.lower() in ('subs', 'subtitles', 'subtitle'):
-            parent_path = filepath.parent.parent
+            parent_path = parent_path.parent
+    return parent_path, season_in_dir
+
+
+def parse_cache_info() -> str:
+    info = _cached_parse_name.cache_info()
+    lookups = info.hits + info.misses
+    hit_rate = info.hits / lookups if lookups else 0
+    return f'{info.hits} hits, {info.misses} misses ({hit_rate:.0%} hit rate, {info.currsize}/{info.maxsize} entries)'
+
+
+def parse_many(filepaths: Iterable[Path]) -> List[Union[MediaNameParse, Exception]]:
+    """
+    Parse a batch of files, sharing parse results for repeated names such as common parent directories.
+
+    :param filepaths: files to parse
+    :return: MediaNameParse for each file in order, or the exception raised while parsing it
+    """
+    results = list()
+    for filepath in filepaths:
+        try:
+            results.append(parse(filepath=filepath))
+        except Exception as e:
+            results.append(e)
+    logger.debug(f'Parse cache: {parse_cache_info()}')
+    return results
+
+
+def parse(filepath: Path = None):
+    ptn_results = parse_name(filepath.name)
+
+    parent_path, season_in_dir = _resolve_parent(filepath.parent)
+    if season_in_dir is not None and not ptn_results.get('season'):
+        ptn_results['season'] = season_in_dir
 
     media_type = MediaType.SERIES if ptn_results.get('season') else MediaType.MOVIE
 
@@ -36,7 +87,7 @@ def parse(filepath: Path = None):
     # if the filename alone didn't provide enough information
     parent_ptn_results = {}
     if parent_path:
-        parent_ptn_results = PTN.parse(parent_path.name)
+        parent_ptn_results = parse_name(parent_path.name)
 
     parts = MediaNameParse(media_type=media_type,
                            parent_parts=MediaNameParse(media_type=media_type, **parent_ptn_results),
@@ -49,11 +100,4 @@ def parse_tweak(parts: MediaNameParse = None):
     if parts is None:
         return
 
-    if 'the daily show' in parts.title.lower():
-        parts.series_id = 71256
-    elif 'the magicians us' in parts.title.lower():
-        parts.series_id = 299139
-    elif 'the outsider' in parts.title.lower():
-        parts.series_id = 365480
-    elif 'the boys' in parts.title.lower():
-        parts.series_id = 355567
+    overrides.apply(parts=parts)
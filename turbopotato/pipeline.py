@@ -0,0 +1,95 @@
+from collections import deque
+import itertools
+import logging
+import queue
+import threading
+from typing import Dict, Tuple, Union
+
+logger = logging.getLogger('pipeline')
+
+FINISHED_STATUSES = 1000  # statuses of finished jobs kept for status requests; older ones are evicted
+
+
+class Pipeline:
+    """
+    Long-lived, in-process job runner.
+
+    Jobs are keyword arguments for turbopotato.main.run() and are processed one at a time
+    on a worker thread since a run uses the module-level argument and torrent singletons.
+    Imports, parser caches, and the qBittorrent session stay warm between jobs.
+
+    A job submitted while an identical one (same set of paths, same options) is still queued
+    isn't queued again; the queued job's ID is returned instead. Only the most recent
+    FINISHED_STATUSES finished jobs keep their status.
+    """
+    def __init__(self, log_level: str = 'INFO'):
+        self.log_level = log_level
+        self.jobs = queue.Queue()
+        self.status: Dict[int, str] = dict()
+        self._ids = itertools.count(1)
+        self._queued: Dict[Tuple, int] = dict()  # job key -> ID of the queued job
+        self._finished = deque()  # IDs of finished jobs, oldest first
+        self._lock = threading.Lock()
+        self._thread: Union[threading.Thread, None] = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._worker, name='pipeline', daemon=True)
+            self._thread.start()
+
+    def stop(self, wait: bool = True):
+        if self._thread is not None:
+            self.jobs.put(None)
+            if wait:
+                self._thread.join()
+            self._thread = None
+
+    @staticmethod
+    def _key(job: dict) -> Tuple:
+        paths = job.get('paths') or tuple()
+        if isinstance(paths, str):
+            paths = (paths,)
+        return frozenset(map(str, paths)), tuple(sorted((k, repr(v)) for k, v in job.items() if k != 'paths'))
+
+    def submit(self, **job) -> int:
+        key = self._key(job)
+        with self._lock:
+            if (job_id := self._queued.get(key)) is not None:
+                logger.info(f'Job {job_id} is already queued: {job}')
+                return job_id
+            job_id = next(self._ids)
+            self.status[job_id] = 'queued'
+            self._queued[key] = job_id
+        self.jobs.put((job_id, key, job))
+        logger.info(f'Queued job {job_id}: {job}')
+        return job_id
+
+    def _set_status(self, job_id: int, status: str):
+        with self._lock:
+            self.status[job_id] = status
+            if status in ('done', 'failed'):
+                self._finished.append(job_id)
+                while len(self._finished) > FINISHED_STATUSES:
+                    self.status.pop(self._finished.popleft(), None)
+
+    def _worker(self):
+        from turbopotato.log import configure_console_logging
+        from turbopotato.main import run
+
+        while (item := self.jobs.get()) is not None:
+            job_id, key, job = item
+            with self._lock:
+                self._queued.pop(key, None)  # the files may change while it runs; an identical job is queued again
+            self._set_status(job_id, 'running')
+            status = 'failed'
+            try:
+                run(**job)
+            except (Exception, SystemExit) as e:  # argparse exits on invalid job options
+                logger.error(f'Job {job_id} failed: {e}', exc_info=True)
+            else:
+                status = 'done'
+            finally:
+                # each run configures logging to its own log files and removes them when finished
+                configure_console_logging(level=self.log_level)
+                self._set_status(job_id, status)
+            logger.info(f'Finished job {job_id}: {status}')
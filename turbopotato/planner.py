@@ -0,0 +1,90 @@
+import logging
+import re
+from typing import List, Tuple
+
+from turbopotato.cache import PersistentCache
+from turbopotato.media_defs import MediaNameParse
+from turbopotato.media_defs import MediaType
+from turbopotato.media_defs import QueryResult
+
+logger = logging.getLogger('planner')
+
+PROVIDERS = ('tmdb', 'tvdb')
+SEARCH_TERMS = ('file', 'parent')
+
+
+def parent_shape(parts: MediaNameParse = None) -> str:
+    parent_parts = parts.parent_parts if parts else None
+    if not parent_parts or not parent_parts.title:
+        return 'none'
+    if parent_parts.season != '':
+        return 'series'
+    if parent_parts.year:
+        return 'movie'
+    return 'title'
+
+
+def signatures(parts: MediaNameParse) -> Tuple[str, str]:
+    """
+    Build the parse-feature signatures used to key observed query outcomes.
+
+    The specific signature includes the title tokens; the generic one does not so
+    outcomes can still inform ordering for titles that haven't been seen before.
+    """
+    title_tokens = ' '.join(re.findall(r'[a-z0-9]+', str(parts.title).lower()))
+    has_season = parts.season != ''
+    has_date = bool(parts.year and parts.month and parts.day)
+    features = f'season={int(has_season)}|date={int(has_date)}|parent={parent_shape(parts)}'
+    return f'{title_tokens}|{features}', f'*|{features}'
+
+
+def _order(defaults: tuple, hits: dict) -> List[str]:
+    return sorted(defaults, key=lambda name: (-hits.get(name, 0), defaults.index(name)))
+
+
+class QueryPlanner:
+    """
+    Order database providers and search terms by how often they produced the accepted match.
+
+    Outcomes are recorded in the persistent cache per parse-feature signature. Queries stop at the
+    first search term that finds an exact match, so putting the usual winner first saves lookups.
+
+    :param cache_dir: where outcomes are stored; defaults to TP_CACHE_DIR
+    """
+    def __init__(self, cache_dir=None):
+        self.cache = PersistentCache('query_plan', cache_dir=cache_dir)
+
+    def plan(self, parts: MediaNameParse) -> Tuple[List[str], List[str]]:
+        default_providers = PROVIDERS
+        if parts.series_id or (parts.media_type is MediaType.SERIES and not parts.movie_id):
+            default_providers = tuple(reversed(PROVIDERS))
+        if parts.series_id or parts.movie_id:
+            # an explicit ID already determines the database to query
+            return list(default_providers), list(SEARCH_TERMS)
+
+        providers, search_terms = list(default_providers), list(SEARCH_TERMS)
+        for signature in signatures(parts):
+            stats = self.cache.get(signature)
+            if stats:
+                providers = _order(default_providers, stats.get('providers', {}))
+                search_terms = _order(SEARCH_TERMS, stats.get('search_terms', {}))
+                logger.debug(f'Query plan for "{signature}": providers {providers}, search terms {search_terms}')
+                break
+        return providers, search_terms
+
+    def record(self, parts: MediaNameParse, chosen_one: QueryResult):
+        if parts is None or not isinstance(chosen_one, QueryResult) or not chosen_one.provider:
+            return
+        for signature in signatures(parts):
+            stats = self.cache.get(signature) or dict(providers={}, search_terms={}, total=0)
+            stats['providers'][chosen_one.provider] = stats['providers'].get(chosen_one.provider, 0) + 1
+            if chosen_one.search_term in SEARCH_TERMS:
+                stats['search_terms'][chosen_one.search_term] = stats['search_terms'].get(chosen_one.search_term, 0) + 1
+            stats['total'] += 1
+            self.cache.set(signature, stats)
+
+    def save(self):
+        self.cache.save()
+
+
+planner = QueryPlanner()
@@ -0,0 +1,177 @@
+from collections import namedtuple
+import logging
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Union
+
+logger = logging.getLogger('progress')
+
+LOG_INTERVAL = 30  # seconds between progress log lines for a file
+
+# rsync --progress line, e.g. "  1.23G  45%  98.76MB/s    0:01:02 (xfr#3, to-chk=2/5)"
+PROGRESS_LINE = re.compile(r'^\s*(?P<amount>[\d.,]+)(?P<unit>[KMGTP]?)\s+(?P<percent>\d+)%'
+                           r'(?:\s+(?P<rate>[\d.,]+)(?P<rate_unit>[kKMGTP]?)B/s)?'
+                           r'(?:\s+(?P<eta>\d+:\d{2}:\d{2}))?'
+                           r'(?:\s+\((?:xfr|xfer)#(?P<index>\d+),\s+(?:to|ir)-(?:chk|check)=(?P<remaining>\d+)/(?P<total>\d+)\))?')
+# --human-readable (given once) prints powers of 1000
+UNITS = {'': 1, 'K': 10**3, 'k': 10**3, 'M': 10**6, 'G': 10**9, 'T': 10**12, 'P': 10**15}
+
+ProgressEvent = namedtuple('ProgressEvent', 'name bytes percent rate eta index remaining done')
+ProgressEvent.__doc__ = """
+Progress of one file's transfer.
+
+bytes: transferred so far; percent: of the file; rate: bytes/s; eta: seconds remaining;
+index: position among files completed in the session (final events only); remaining: files left to check;
+done: the file finished.
+"""
+
+
+def _amount(value: str, unit: str) -> int:
+    return int(float(value.replace(',', '')) * UNITS[unit])
+
+
+def parse_line(line: str, name: str = '') -> Union[ProgressEvent, None]:
+    """Parse an rsync --progress line; returns None if line isn't one."""
+    match = PROGRESS_LINE.match(line)
+    if not match:
+        return None
+    eta = None
+    if match.group('eta'):
+        hours, minutes, seconds = (int(part) for part in match.group('eta').split(':'))
+        eta = hours * 3600 + minutes * 60 + seconds
+    return ProgressEvent(name=name,
+                         bytes=_amount(match.group('amount'), match.group('unit')),
+                         percent=int(match.group('percent')),
+                         rate=_amount(match.group('rate'), match.group('rate_unit')) if match.group('rate') else None,
+                         eta=eta,
+                         index=int(match.group('index')) if match.group('index') else None,
+                         remaining=int(match.group('remaining')) if match.group('remaining') else None,
+                         done=match.group('index') is not None)
+
+
+def human_size(size: float) -> str:
+    for unit in ('B', 'KB', 'MB', 'GB', 'TB'):
+        if abs(size) < 1000 or unit == 'TB':
+            return f'{size:.0f} {unit}' if unit == 'B' else f'{size:.2f} {unit}'
+        size /= 1000
+
+
+def human_duration(seconds: float) -> str:
+    seconds = int(round(seconds))
+    return f'{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}'
+
+
+class FileProgress:
+    """Running totals for one file's transfer."""
+    def __init__(self, name: str, offset: int = 0):
+        self.name = name
+        self.offset = offset  # bytes already present when a resumed transfer started
+        self.started = time.monotonic()
+        self.finished: Union[float, None] = None
+        self.bytes = offset
+        self.percent = 0
+        self.rate: Union[int, None] = None
+        self.eta: Union[int, None] = None
+        self.success: Union[bool, None] = None
+        self.sent = True  # False if the destination was created without sending the file
+        self._last_log = 0.0
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def transferred(self) -> int:
+        return max(self.bytes - self.offset, 0) if self.sent else 0
+
+    @property
+    def saved(self) -> int:
+        """Bytes that didn't need sending because the content was already on the NAS."""
+        return self.bytes if self.success and not self.sent else 0
+
+    @property
+    def average_rate(self) -> float:
+        return self.transferred / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __str__(self):
+        if not self.sent:
+            return f'nothing: {human_size(self.saved)} linked from identical content on the NAS'
+        return f'{human_size(self.transferred)} in {human_duration(self.elapsed)} ({human_size(self.average_rate)}/s)'
+
+
+class ProgressMonitor:
+    """
+    Collects transfer progress and fans it out to observers.
+
+    Observers are called with each ProgressEvent as it arrives (from the transfer event loop, so they
+    should be quick). Per-file totals are kept for the run summary, and a progress line is logged for
+    each file at most every LOG_INTERVAL seconds instead of logging rsync's output.
+    """
+    def __init__(self):
+        self.files: Dict[int, FileProgress] = dict()
+        self._observers: List[Callable[[ProgressEvent], None]] = list()
+        self._lock = threading.Lock()
+
+    def subscribe(self, observer: Callable[[ProgressEvent], None]):
+        with self._lock:
+            self._observers.append(observer)
+
+    def unsubscribe(self, observer: Callable[[ProgressEvent], None]):
+        with self._lock:
+            if observer in self._observers:
+                self._observers.remove(observer)
+
+    def _publish(self, event: ProgressEvent):
+        with self._lock:
+            observers = list(self._observers)
+        for observer in observers:
+            try:
+                observer(event)
+            except Exception as e:
+                logger.warning(f'Progress observer {observer} failed: {e}', exc_info=True)
+
+    def get(self, context: Any) -> Union[FileProgress, None]:
+        return self.files.get(id(context))
+
+    def start(self, context: Any, name: str, offset: int = 0):
+        self.files[id(context)] = FileProgress(name, offset=offset)
+
+    def update(self, context: Any, event: ProgressEvent):
+        file_progress = self.files.setdefault(id(context), FileProgress(event.name))
+        file_progress.bytes = event.bytes
+        file_progress.percent = event.percent
+        file_progress.rate = event.rate
+        file_progress.eta = event.eta
+        now = time.monotonic()
+        if now - file_progress._last_log >= LOG_INTERVAL and not event.done:
+            file_progress._last_log = now
+            rate = f'{human_size(event.rate)}/s' if event.rate is not None else '?'
+            eta = human_duration(event.eta) if event.eta is not None else '?'
+            logger.debug(f'Progress: {file_progress.name} | {event.percent}% {human_size(event.bytes)} {rate} ETA {eta}')
+        self._publish(event._replace(name=file_progress.name))
+
+    def finish(self, context: Any, success: bool, size: int = None, sent: bool = True) -> FileProgress:
+        """
+        Record a file's final outcome.
+
+        :param size: the file's size if it was transferred (or already present)
+        :param sent: whether the file's data was sent, rather than its destination made from data already there
+        """
+        file_progress = self.files.setdefault(id(context), FileProgress(''))
+        file_progress.finished = time.monotonic()
+        file_progress.success = success
+        file_progress.sent = sent
+        if success:
+            file_progress.bytes = size if size is not None else file_progress.bytes
+            file_progress.percent = 100
+        self._publish(ProgressEvent(name=file_progress.name, bytes=file_progress.bytes, percent=file_progress.percent,
+                                    rate=file_progress.average_rate, eta=0 if success else None, index=None,
+                                    remaining=None, done=True))
+        return file_progress
+
+    def pop(self, context: Any) -> Union[FileProgress, None]:
+        return self.files.pop(id(context), None)
+
+
+monitor = ProgressMonitor()
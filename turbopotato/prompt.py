@@ -1,15 +1,17 @@
 import logging
 from typing import Union, List
 
-import PyInquirer
-
 from turbopotato.arguments import args
+from turbopotato.identifications import identifications
+from turbopotato.lazy import lazy_import
 from turbopotato.media_defs import MediaType
 from turbopotato.media_defs import MediaName, MediaNameParse, QueryResult
 from turbopotato.media import File
 from turbopotato.media import Media
 from turbopotato.query import TVDBQuery
 
+PyInquirer = lazy_import('PyInquirer')
+
 logger = logging.getLogger('prompt')
 
 
@@ -133,6 +135,7 @@ def choose_match(file: File) -> bool:
             if ans == 'Send to Media Library':
                 return False  # quit out and move on to the next file
             elif ans == 'Manually Enter Information':
+                identifications.invalidate(file)
                 is_new_query, new_media = prompt_new_media_information(file, file.chosen_one)
                 if is_new_query:  # query with user-entered information
                     file.parts = new_media
@@ -143,6 +146,7 @@ def choose_match(file: File) -> bool:
             elif ans == 'Quit':
                 raise Abort
             else:  # default to skipping the file
+                identifications.invalidate(file)  # the user rejected it; don't reuse it next run
                 file.skip = True
                 file.failure_reason = 'File was skipped by user.'
                 if ans != 'Skip File':
@@ -1,30 +1,46 @@
 from datetime import datetime
+from functools import lru_cache
 from functools import partial
 import logging
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
 from multiprocessing.pool import ThreadPool
-from requests import HTTPError
 from string import punctuation
-from typing import List, Tuple, Union
-
-import tvdbsimple as tvdb
-import tmdbsimple as tmdb
+from typing import List, Sequence, Tuple, Union
 
 from turbopotato.config import config
+from turbopotato.lazy import lazy_import
+from turbopotato.library import library
 from turbopotato.media_defs import MediaNameParse
 from turbopotato.media_defs import QueryResult
 from turbopotato.media_defs import MediaType
+from turbopotato.planner import SEARCH_TERMS
+
+requests = lazy_import('requests')
+tmdb = lazy_import('tmdbsimple')
+tvdb = lazy_import('tvdbsimple')
 
 logger = logging.getLogger('query')
 MAX_THREADS = 30
 Q = '"'
 
 
+@lru_cache(maxsize=1)
+def stop_words() -> frozenset:
+    from nltk.corpus import stopwords
+    return frozenset(stopwords.words('english')) | frozenset(punctuation)
+
+
 def err_str(e: Exception = None):
     return f'{getattr(e.response, "status_code", e)} ({type(e).__name__})'
 
 
+def tag_search_term(results, search_term: str):
+    if not results:
+        return results
+    for result in (results if isinstance(results, list) else [results]):
+        result.setdefault('_search_term', search_term)
+    return results
+
+
 def add_unique_elements(l, new_elements):
     if not new_elements:
         return
@@ -59,10 +75,9 @@ class DBQuery:
             token_list = token_list.replace('.', ' ')
             # string = string.translate({ord(ch): None for ch in '0123456789'})
             token_list = token_list.strip()
+            from nltk.tokenize import word_tokenize
             tokens = word_tokenize(token_list)
-            stop_words = set(stopwords.words('english'))
-            stop_words.update(punctuation)
-            tokens = set(w for w in tokens if w not in stop_words)
+            tokens = set(w for w in tokens if w not in stop_words())
             return tokens
 
         def tokenize(input_list: Union[List[str], Tuple[str], str]) -> set:
@@ -128,14 +143,14 @@ class TVDBQuery(DBQuery):
         self.exact_episode_matches = list()
         self.fuzzy_episode_matches = list()
 
-    def query(self, parts: MediaNameParse = None):
+    def query(self, parts: MediaNameParse = None, search_terms: Sequence[str] = SEARCH_TERMS):
         tvdb.KEYS.API_KEY = TVDBQuery.TVDB_API_KEY or config.TVDB_API_KEY
         logger.info('>>> Starting TVDB query...')
         if not parts:
             logger.error('Query aborted. MediaNameParse is None.')
             return
 
-        self._get_series(parts=parts, parent_parts=parts.parent_parts)
+        self._get_series(parts=parts, parent_parts=parts.parent_parts, search_terms=search_terms)
 
         for series_list in (self.series_exact_match_list, self.series_list):
             if not series_list:
@@ -162,17 +177,20 @@ class TVDBQuery(DBQuery):
             return
         try:
             return tvdb.Search().series(name=title)
-        except HTTPError:
+        except requests.HTTPError:
             return {}
 
-    def _get_series(self, parts: MediaNameParse, parent_parts: MediaNameParse):
+    def _get_series(self, parts: MediaNameParse, parent_parts: MediaNameParse, search_terms: Sequence[str] = SEARCH_TERMS):
         ''' use defaulted series ID '''
-        if parts.series_id:
+        if parts.series_id and (series := library.series(parts.series_id)):
+            add_unique_elements(self.series_list, tag_search_term(series, 'id'))
+            logger.debug(f'Using library record "{series["seriesName"]}" for series ID "{parts.series_id}"')
+        elif parts.series_id:
             try:
                 results = tvdb.Series(id=parts.series_id).info()
-                add_unique_elements(self.series_list, results)
+                add_unique_elements(self.series_list, tag_search_term(results, 'id'))
                 logger.debug(f'Found "{results["seriesName"]}" for series ID "{parts.series_id}"')
-            except HTTPError as e:
+            except requests.HTTPError as e:
                 logger.error(f'TVDB did not find series using defaulted series ID "{parts.series_id}". Error: {err_str(e)}')
 
         if self.series_list:
@@ -181,27 +199,35 @@ class TVDBQuery(DBQuery):
         parent_title = parent_parts.title if parent_parts else ''
         parent_year = parent_parts.year if parent_parts else ''
         ''' search for series with title '''
-        for title, year in ((parts.title, parts.year), (parent_title, parent_year)):
+        titles = {'file': (parts.title, parts.year), 'parent': (parent_title, parent_year)}
+        for search_term in search_terms:
+            title, year = titles[search_term]
             results = None
             if title and year:
                 try:
                     results = tvdb.Search().series(name=f'{title} {year}')
-                    add_unique_elements(self.series_list, results)
+                    add_unique_elements(self.series_list, tag_search_term(results, search_term))
                     logger.debug(f'Found {len(results)} series using "{title} {year}": {[s["seriesName"] for s in results]}')
-                except HTTPError as e:
+                except requests.HTTPError as e:
                     logger.debug(f'TVDB returned zero series\' using "{title} {year}". Error: {err_str(e)}')
             if title and not results:
                 try:
                     results = tvdb.Search().series(name=title)
-                    add_unique_elements(self.series_list, results)
+                    add_unique_elements(self.series_list, tag_search_term(results, search_term))
                     logger.debug(f'Found {len(results)} series using "{title}": {[s["seriesName"] for s in results]}')
-                except HTTPError as e:
+                except requests.HTTPError as e:
                     logger.debug(f'TVDB returned zero series\' using "{title}". Error: {err_str(e)}')
+            if any(self._is_exact_series(series, parts, parent_title) for series in results or []):
+                break  # search terms are in the planner's order; later ones are only needed when this one misses
 
         for series in self.series_list:
-            if series.get('seriesName').lower() in (parts.title.lower(), parent_title.lower()):
+            if self._is_exact_series(series, parts, parent_title):
                 add_unique_elements(self.series_exact_match_list, series)
 
+    @staticmethod
+    def _is_exact_series(series: dict, parts: MediaNameParse, parent_title: str) -> bool:
+        return (series.get('seriesName') or '').lower() in (parts.title.lower(), parent_title.lower())
+
     def _get_episodes_from_season_and_episode_no(self, series: dict = None, parts: MediaNameParse = None):
         if not parts:
             return
@@ -216,7 +242,7 @@ class TVDBQuery(DBQuery):
             add_unique_elements(self.exact_episode_matches, results)
             logger.debug(f'Found {len(results)} episodes for "{series.get("seriesName")}" using season '
                          f'{season} and episode {episode}: {[e.get("episodeName") for e in results]}')
-        except HTTPError as e:
+        except requests.HTTPError as e:
             logger.debug(f'TVDB returned zero episodes for "{series.get("seriesName")}" using season '
                          f'{season} and episode {episode}. Error: {err_str(e)}')
 
@@ -238,7 +264,7 @@ class TVDBQuery(DBQuery):
                 logger.debug(f'Querying for all episodes for {series.get("seriesName")}...')
                 all_episode_list = tvdb.Series_Episodes(id=series.get('id')).all()
                 logger.debug(f'TVDB returned {len(all_episode_list)} episodes.')
-            except HTTPError as e:
+            except requests.HTTPError as e:
                 logger.debug(f'TVDB returned zero episodes: Error: {err_str(e)}')
 
             for episode in (e for e in all_episode_list if e.get('episodeName')):
@@ -273,52 +299,55 @@ class TMDBQuery(DBQuery):
         self.exact_movie_list = list()
         self.fuzzy_movie_list = list()
 
-    def query(self, parts: MediaNameParse = None):
+    def query(self, parts: MediaNameParse = None, search_terms: Sequence[str] = SEARCH_TERMS):
         tmdb.API_KEY = TMDBQuery.TMDB_API_KEY or config.TMDB_API_KEY
         logger.info('>>> Starting TMDB query...')
         if not parts:
             logger.error('Query aborted. MediaNameParse is None.')
             return
 
-        self._get_movies(parts=parts)
+        self._get_movies(parts=parts, search_terms=search_terms)
 
         self.print_query_summary()
         logger.info('<<< Finished TMDB query')
         return self
 
-    def _get_movies(self, parts: MediaNameParse):
+    def _get_movies(self, parts: MediaNameParse, search_terms: Sequence[str] = SEARCH_TERMS):
         def desc(r):
             return f'{[m.get("original_title") + " (" + m.get("release_date")[:4] + ")" for m in r]}'
 
         results = list()
         if parts.movie_id:
             try:
-                results = tmdb.Movies(parts.movie_id).info().get("results")
-            except HTTPError as e:
+                results = [tag_search_term(tmdb.Movies(parts.movie_id).info(), 'id')]
+            except requests.HTTPError as e:
                 logger.debug(f'Error: {err_str(e)}')
             logger.debug(f'TMDB returned {len(results)} movies for movie ID {parts.movie_id}: {desc(results)}')
 
         if results:
+            self.exact_matches = [QueryResult(data=movie, media_type=MediaType.MOVIE) for movie in results]
             return results
 
-        search_terms = [(parts.title, parts.year)]
+        titles = {'file': (parts.title, parts.year)}
         if parts.parent_parts and parts.parent_parts.title:
-            search_terms.append((parts.parent_parts.title, parts.parent_parts.year))
-        for title, year in search_terms:
+            titles['parent'] = (parts.parent_parts.title, parts.parent_parts.year)
+        for search_term in (t for t in search_terms if t in titles):
+            title, year = titles[search_term]
+            results = None
             if title and year:
                 try:
                     results = tmdb.Search().movie(query=title, year=year).get('results')
-                except HTTPError as e:
+                except requests.HTTPError as e:
                     logger.debug(f'Error: {err_str(e)}')
 
             if not results:
                 try:
                     results = tmdb.Search().movie(query=title).get('results')
-                except HTTPError as e:
+                except requests.HTTPError as e:
                     logger.debug(f'Error: {err_str(e)}')
 
             if results:
-                for movie in results:
+                for movie in tag_search_term(results, search_term):
                     is_title_match = title.lower() == movie.get('title').lower().translate(str.maketrans('', '', punctuation))
                     is_year_match = str(year) == (movie.get('release_date') or '1111')[:4]
                     if is_title_match and is_year_match:
@@ -332,6 +361,8 @@ class TMDBQuery(DBQuery):
                             add_unique_elements(self.fuzzy_movie_list, movie)
             else:
                 logger.debug(f'TMDB returned zero results for "{title}{f" ({year}){Q}" if year else f"{Q}"}.')
+            if self.exact_movie_list:
+                break  # search terms are in the planner's order; later ones are only needed when this one misses
 
         self.exact_matches = list({QueryResult(data=movie, media_type=MediaType.MOVIE) for movie in self.exact_movie_list})
         self.fuzzy_matches = list({QueryResult(data=movie, media_type=MediaType.MOVIE) for movie in self.fuzzy_movie_list})
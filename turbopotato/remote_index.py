@@ -0,0 +1,172 @@
+import logging
+from pathlib import PurePosixPath
+import shlex
+import subprocess
+import time
+from typing import Dict, List, Set, Union
+
+from turbopotato.cache import PersistentCache
+from turbopotato.fingerprint import SAMPLE_SIZE
+from turbopotato.transit import PARTIAL_DIR
+from turbopotato.transit import ssh_master
+from turbopotato.transit import SSHMaster
+
+logger = logging.getLogger('remote_index')
+
+REFRESH_INTERVAL = 5 * 60  # seconds an index is used without listing the NAS again
+FULL_REFRESH_INTERVAL = 24 * 60 * 60  # seconds; incremental listings can't see deletions
+CTIME_SLACK = 60  # seconds of overlap between incremental listings
+LIST_TIMEOUT = 10 * 60  # seconds
+DUPLICATE_CANDIDATES = 3  # same-size files fingerprinted per file when looking for a duplicate
+# fingerprint() of each argument that's a file, else "missing"
+REMOTE_FINGERPRINT = ('for f in "$@"; do if [ -f "$f" ]; then echo "$(wc -c < "$f" | tr -d " "):$({ head -c %(sample)d "$f"; '
+                      'tail -c %(sample)d "$f"; } | sha256sum | cut -d" " -f1)"; else echo missing; fi; done')
+
+
+class RemoteLibraryIndex:
+    """
+    Sizes of the files in the NAS library, kept in the cache directory.
+
+    The first refresh of a root lists it with one `find -printf` over SSH; later refreshes list only
+    files changed since (by ctime, since rsync preserves mtimes) until a full listing is due again.
+    Files this process sends are added as they land. Listing needs GNU find; if the NAS's find
+    lacks -newerct (e.g. BusyBox), every refresh lists in full.
+
+    :param cache_dir: where the index is stored; defaults to TP_CACHE_DIR
+    :param master: SSH connection to the NAS
+    """
+    def __init__(self, cache_dir=None, master: SSHMaster = None):
+        self.files = PersistentCache('remote_index', cache_dir=cache_dir)
+        self.state = PersistentCache('remote_index_state', cache_dir=cache_dir)
+        self.master = master or ssh_master
+        self._directories: Union[Set[str], None] = None
+        self._by_size: Union[Dict[int, List[str]], None] = None
+        self._incremental: Union[bool, None] = None  # whether the NAS's find supports -newerct
+
+    def _run(self, remote_cmd: str, timeout: float = LIST_TIMEOUT) -> Union[bytes, None]:
+        try:
+            result = subprocess.run(self.master.command(remote_cmd), capture_output=True, timeout=timeout)
+        except (OSError, subprocess.SubprocessError) as e:
+            logger.warning(f'Failed to run remote command: {e}')
+            return None
+        if result.returncode != 0:
+            logger.warning(f'Remote command failed ({result.returncode}): {result.stderr.decode(errors="replace").strip()}')
+            return None
+        return result.stdout
+
+    def refresh(self, root: PurePosixPath, full: bool = False, max_age: float = REFRESH_INTERVAL):
+        """
+        Bring the index of root up to date; keeps the cached index if the NAS can't be listed.
+
+        :param root: remote directory to index
+        :param full: list everything rather than just changes
+        :param max_age: seconds since the last listing within which it's still current
+        """
+        root = PurePosixPath(root)
+        state = self.state.get(str(root)) or dict()
+        if not full and state and time.time() - state.get('refreshed', 0) < max_age:
+            return
+        full = full or not state or time.time() - state.get('full_refresh', 0) >= FULL_REFRESH_INTERVAL
+        if not full and self._incremental is None:
+            self._incremental = self._run(f'find {shlex.quote(str(root))} -maxdepth 0 -newerct @0') is not None
+            if not self._incremental:
+                logger.warning('find on the NAS lacks -newerct; listing the library in full on every refresh')
+        full = full or not self._incremental
+        # interrupted transfers' partial files aren't library content
+        remote_cmd = f'find {shlex.quote(str(root))} -type f -not -path {shlex.quote(f"*/{PARTIAL_DIR}/*")}'
+        if not full:
+            remote_cmd += f' -newerct @{int(state["watermark"] - CTIME_SLACK)}'
+        started = time.time()
+        if (output := self._run(remote_cmd + r" -printf '%C@\t%s\t%p\0'")) is None:
+            return
+
+        listed: Dict[str, int] = dict()
+        watermark = state.get('watermark', 0)
+        for record in output.decode(errors='surrogateescape').split('\0'):
+            try:
+                ctime, size, path = record.split('\t', 2)
+                listed[path] = int(size)
+                watermark = max(watermark, float(ctime))
+            except ValueError:
+                continue
+        if full:
+            for path in [p for p in self.files.data if root in PurePosixPath(p).parents]:
+                if path not in listed:
+                    self.files.pop(path)
+        for path, size in listed.items():
+            if self.files.get(path) != size:
+                self.files.set(path, size)
+        self._directories = self._by_size = None
+        self.state.set(str(root), dict(watermark=watermark or started, refreshed=started,
+                                       full_refresh=started if full else state['full_refresh']))
+        logger.debug(f'{"Listed" if full else "Updated"} remote index of {root}: '
+                     f'{len(listed)} files in {time.time() - started:.1f}s')
+
+    def size(self, path: PurePosixPath) -> Union[int, None]:
+        return self.files.get(str(path))
+
+    def add(self, path: PurePosixPath, size: int):
+        self.files.set(str(path), size)
+        self._directories = self._by_size = None
+
+    def discard(self, path: PurePosixPath):
+        self.files.pop(str(path))
+        self._directories = self._by_size = None
+
+    def directories(self) -> Set[str]:
+        """Every directory holding an indexed file, directly or below."""
+        if self._directories is None:
+            self._directories = {str(parent) for path in self.files.data for parent in PurePosixPath(path).parents}
+        return self._directories
+
+    def remote_fingerprints(self, paths: List[PurePosixPath]) -> Dict[PurePosixPath, str]:
+        """fingerprint() of each of these remote files that exists, computed on the NAS."""
+        if not paths:
+            return dict()
+        script = REMOTE_FINGERPRINT % dict(sample=SAMPLE_SIZE)
+        output = self._run(' '.join(shlex.quote(arg) for arg in ['sh', '-c', script, 'sh', *map(str, paths)]))
+        results = output.decode().split() if output is not None else list()
+        return {path: result for path, result in zip(paths, results) if result != 'missing'}
+
+    def present(self, candidates: Dict[PurePosixPath, str]) -> Set[PurePosixPath]:
+        """
+        Destinations already holding the file to be sent there.
+
+        :param candidates: fingerprint of the file bound for each destination
+        :return: destinations whose indexed size and remote fingerprint match
+        """
+        same_size = [d for d, fp in candidates.items() if fp and self.size(d) == int(fp.split(':', 1)[0])]
+        remote = self.remote_fingerprints(same_size)
+        return {d for d in same_size if remote.get(d) == candidates[d]}
+
+    def duplicates(self, candidates: Dict[PurePosixPath, str]) -> Dict[PurePosixPath, PurePosixPath]:
+        """
+        Library files with the same content as the files bound for other destinations.
+
+        :param candidates: fingerprint of the file bound for each destination
+        :return: an existing remote file with the same fingerprint, per destination that has one
+        """
+        if self._by_size is None:
+            self._by_size = dict()
+            for path, size in self.files.data.items():
+                self._by_size.setdefault(size, list()).append(path)
+        same_size = dict()
+        for destination, fp in candidates.items():
+            if not fp:
+                continue
+            paths = [PurePosixPath(p) for p in self._by_size.get(int(fp.split(':', 1)[0]), list())]
+            if paths := [p for p in paths if p != destination][:DUPLICATE_CANDIDATES]:
+                same_size[destination] = paths
+        remote = self.remote_fingerprints(sorted({p for paths in same_size.values() for p in paths}))
+        duplicates = dict()
+        for destination, paths in same_size.items():
+            if match := next((p for p in paths if remote.get(p) == candidates[destination]), None):
+                duplicates[destination] = match
+        return duplicates
+
+    def save(self):
+        self.files.save()
+        self.state.save()
+
+
+remote_index = RemoteLibraryIndex()
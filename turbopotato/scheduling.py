@@ -0,0 +1,113 @@
+from collections import Counter
+import logging
+import os
+from typing import Any, Callable, Dict, Hashable, Iterable, List
+
+from turbopotato.batch import Entry
+from turbopotato.config import config
+from turbopotato.supervisor import Transfer
+
+logger = logging.getLogger('scheduling')
+
+FIFO = 'fifo'
+SMALLEST = 'smallest'
+TORRENT = 'torrent'
+PRIORITY = 'priority'
+POLICIES = (FIFO, SMALLEST, TORRENT, PRIORITY)
+DEFAULT_POLICY = SMALLEST
+UNLISTED_PRIORITY = 1000  # categories missing from TP_CATEGORY_PRIORITY go after listed ones
+
+
+def parse_priorities(spec: str = None) -> Dict[str, int]:
+    """Category priorities from `;`-separated `<category>=<priority>` entries; lower goes first."""
+    priorities = dict()
+    for entry in filter(None, (e.strip() for e in (config.CATEGORY_PRIORITY if spec is None else spec).split(';'))):
+        category, _, priority = entry.rpartition('=')
+        try:
+            priorities[category.strip()] = int(priority)
+        except ValueError:
+            raise ValueError(f'Invalid category priority "{entry}"; expected <category>=<number>') from None
+    return priorities
+
+
+def file_size(entry: Entry) -> int:
+    try:
+        return os.stat(entry[0]).st_size
+    except OSError:
+        return 0
+
+
+class TransferSchedule:
+    """
+    Order transfers by policy and report when each group of files has been delivered.
+
+    Policies:
+        fifo: the order files were given
+        smallest: smallest transfer first, to minimise mean completion time
+        torrent: whole groups (e.g. torrents) one after another, smallest group first, so each finishes sooner
+        priority: by the priority of each file's category (see parse_priorities), smallest first within one
+
+    :param policy: one of POLICIES
+    :param size: bytes to send for an entry; defaults to the source file's size
+    :param group: group an entry belongs to; defaults to its destination directory
+    :param category: category an entry belongs to, for the priority policy
+    :param priorities: priority per category; defaults to TP_CATEGORY_PRIORITY
+    :param on_group_complete: called with (group, contexts) once every file of a group has succeeded or failed
+    """
+    def __init__(self, policy: str = FIFO, size: Callable[[Entry], int] = None, group: Callable[[Entry], Hashable] = None,
+                 category: Callable[[Entry], str] = None, priorities: Dict[str, int] = None,
+                 on_group_complete: Callable[[Hashable, List[Any]], None] = None):
+        if policy not in POLICIES:
+            raise ValueError(f'Unknown transfer order "{policy}"; expected one of {", ".join(POLICIES)}')
+        self.policy = policy
+        self.size = size or file_size
+        self.group = group or (lambda entry: entry[1].parent)
+        self.category = category or (lambda entry: '')
+        self.priorities = parse_priorities() if priorities is None else priorities
+        self.on_group_complete = on_group_complete
+        self._sizes: Dict[int, int] = dict()
+        self._group_sizes: Counter = Counter()
+        self._members: Dict[Hashable, List[Any]] = dict()
+        self._remaining: Dict[Hashable, int] = Counter()
+        self._group_of: Dict[int, Hashable] = dict()
+
+    def add(self, entries: Iterable[Entry]):
+        """Register the files about to be delivered."""
+        for entry in entries:
+            group = self.group(entry)
+            self._sizes[id(entry[2])] = size = self.size(entry)
+            self._group_sizes[group] += size
+            self._group_of[id(entry[2])] = group
+            self._members.setdefault(group, list()).append(entry[2])
+            self._remaining[group] += 1
+
+    def priority(self, entry: Entry) -> int:
+        return self.priorities.get(self.category(entry) or '', UNLISTED_PRIORITY)
+
+    def key(self, entries: List[Entry]) -> tuple:
+        size = sum(self._sizes.get(id(entry[2]), 0) for entry in entries)
+        if self.policy == SMALLEST:
+            return size,
+        if self.policy == TORRENT:
+            group = min((self._group_sizes[self._group_of[id(e[2])]], str(self._group_of[id(e[2])])) for e in entries)
+            return (*group, size)
+        if self.policy == PRIORITY:
+            return min(self.priority(entry) for entry in entries), size
+        return ()
+
+    def order(self, transfers: List[Transfer], entries_of: Callable[[Transfer], List[Entry]]) -> List[Transfer]:
+        ordered = sorted(transfers, key=lambda transfer: self.key(entries_of(transfer)))
+        if self.policy != FIFO:
+            logger.debug(f'Transfer order ({self.policy}): {[t.name for t in ordered]}')
+        return ordered
+
+    def completed(self, context: Any):
+        """Note a file's final outcome; fires on_group_complete for the last of its group."""
+        if (group := self._group_of.pop(id(context), None)) is None:
+            return
+        self._remaining[group] -= 1
+        if not self._remaining[group] and self.on_group_complete:
+            try:
+                self.on_group_complete(group, self._members[group])
+            except Exception as e:
+                logger.error(f'Group completion callback failed for {group}: {e}', exc_info=True)
@@ -0,0 +1,141 @@
+import argparse
+import inspect
+import json
+import logging
+import os
+from pathlib import Path
+import socketserver
+
+from turbopotato.client import ServiceUnavailable
+from turbopotato.client import request
+from turbopotato.config import config
+from turbopotato.log import configure_console_logging
+from turbopotato.pipeline import Pipeline
+from turbopotato.transit import ssh_master
+
+logger = logging.getLogger('service')
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            message = json.loads(self.rfile.readline() or '{}')
+            response = self.server.service.handle(message)
+        except Exception as e:
+            logger.warning(f'Failed to handle request: {e}')
+            response = dict(ok=False, error=str(e))
+        self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+
+
+class Service:
+    """
+    Worker service accepting jobs over a Unix domain socket.
+
+    Requests are single JSON lines:
+        {"action": "submit", "job": {<run() keyword arguments>, "torrent_hashes": [...]}}
+        {"action": "status", "job_id": <id>}
+        {"action": "ping"}
+    Jobs are processed by a Pipeline so imports, caches, and the qBittorrent session stay warm.
+    """
+    def __init__(self, socket_path: Path = None, log_level: str = 'INFO'):
+        self.socket_path = Path(socket_path or config.SOCKET_PATH)
+        self.pipeline = Pipeline(log_level=log_level)
+        self.server = None
+
+        from turbopotato.main import run
+        self.job_options = set(inspect.signature(run).parameters) | {'torrent_hashes'}
+
+    def warm_up(self):
+        from turbopotato.query import stop_words
+        from turbopotato.torrents import torrents
+
+        try:
+            stop_words()
+        except LookupError as e:
+            logger.warning(f'Failed to load stopwords corpus: {e}')
+        try:
+            torrents.qbt_client.auth_log_in()
+        except Exception as e:
+            logger.warning(f'Failed to log in to qBittorrent: {e}')
+
+    def handle(self, message: dict) -> dict:
+        action = message.get('action')
+        if action == 'ping':
+            return dict(ok=True)
+        if action == 'status':
+            job_status = self.pipeline.status.get(message.get('job_id'))
+            if job_status is None:
+                return dict(ok=False, error=f'Unknown job ID: {message.get("job_id")}')
+            return dict(ok=True, status=job_status)
+        if action == 'submit':
+            return dict(ok=True, job_id=self.pipeline.submit(**self._job(message.get('job') or dict())))
+        return dict(ok=False, error=f'Unknown action: {action}')
+
+    def _job(self, job: dict) -> dict:
+        if unknown := set(job) - self.job_options:
+            raise ValueError(f'Unknown job options: {sorted(unknown)}')
+
+        if torrent_hashes := job.pop('torrent_hashes', None):
+            from turbopotato.torrents import torrents
+
+            paths = list(job.get('paths') or list())
+            for torrent_hash in torrent_hashes:
+                if not (content_path := torrents.get_content_path(torrent_hash)):
+                    raise ValueError(f'Torrent not found: {torrent_hash}')
+                paths.append(content_path)
+            job.update(paths=paths, torrents=True)
+
+        if not job.get('paths'):
+            raise ValueError('Job must specify paths or torrent_hashes')
+        job.setdefault('interactive', False)
+        return job
+
+    def _bind(self):
+        if self.socket_path.exists():
+            try:
+                request(dict(action='ping'), socket_path=self.socket_path, timeout=1)
+            except ServiceUnavailable:
+                os.remove(self.socket_path)
+            else:
+                raise RuntimeError(f'turbopotato service is already running at "{self.socket_path}"')
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+
+        old_umask = os.umask(0o077)
+        try:
+            self.server = socketserver.ThreadingUnixStreamServer(str(self.socket_path), RequestHandler)
+        finally:
+            os.umask(old_umask)
+        self.server.daemon_threads = True
+        self.server.service = self
+
+    def serve_forever(self):
+        self._bind()
+        self.warm_up()
+        self.pipeline.start()
+        logger.info(f'Listening on "{self.socket_path}"')
+        try:
+            # keep one SSH connection to the NAS open for all jobs
+            with ssh_master.session():
+                self.server.serve_forever()
+        finally:
+            self.server.server_close()
+            try:
+                os.remove(self.socket_path)
+            except OSError:
+                pass
+            self.pipeline.stop()
+
+
+def command(argv: list = None):
+    parser = argparse.ArgumentParser(prog='turbopotato serve', description='process jobs submitted over a Unix socket')
+    parser.add_argument('-s', '--socket', action='store', type=str, default=None,
+                        help=f'socket path (default: {config.SOCKET_PATH})')
+    parser.add_argument('-l', '--log_level', action='store', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                        default='INFO', type=str, help='log level to display on console')
+    parsed = parser.parse_args(args=argv)
+
+    configure_console_logging(level=parsed.log_level)
+    try:
+        Service(socket_path=parsed.socket, log_level=parsed.log_level).serve_forever()
+    except KeyboardInterrupt:
+        logger.info('KeyboardInterrupt. Finishing queued jobs and exiting.')
@@ -0,0 +1,255 @@
+from abc import ABC, abstractmethod
+import asyncio
+import codecs
+from collections import defaultdict
+from collections import deque
+import logging
+import os
+import re
+import signal
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple, Union
+
+from turbopotato.progress import parse_line
+from turbopotato.progress import ProgressEvent
+from turbopotato.transit import RemoteExecuteCancelled
+from turbopotato.transit import RemoteExecuteError
+from turbopotato.transit import RemoteExecuteSendCommandError
+from turbopotato.transit import RemoteExecuteSendCommandFailed
+from turbopotato.transit import RemoteExecuteStalled
+from turbopotato.transit import RemoteExecuteTimeout
+
+logger = logging.getLogger('supervisor')
+
+DEFAULT_CONCURRENCY = 3
+DEFAULT_TIMEOUT = 12 * 60 * 60  # seconds
+DEFAULT_STALL_TIMEOUT = 5 * 60  # seconds
+TERMINATE_GRACE = 5  # seconds
+READ_SIZE = 64 * 1024
+OUTPUT_HISTORY = 20
+
+LINE_SPLIT = re.compile(r'[\r\n]')
+
+
+class Transfer:
+    """
+    A single transfer, run as a subprocess or, for an InProcessTransfer, on a worker thread.
+
+    :param command: argument list to execute
+    :param host: destination host; transfers to the same host share the per-host limit
+    :param name: name used in log messages
+    :param context: caller data carried through to completion callbacks (e.g. the File being sent)
+    """
+    sends_data = True  # False for transfers that create the destination without sending the file
+
+    def __init__(self, command: Union[List[str], None], host: str = None, name: str = None, context=None):
+        self.command = command
+        self.host = host
+        self.name = name or command[-1]
+        self.context = context
+        self.returncode: Union[int, None] = None
+        self.error: Union[RemoteExecuteError, None] = None
+        self.output = deque(maxlen=OUTPUT_HISTORY)
+        self.progress_lines = 0
+        # called with (context, ProgressEvent) as progress is reported
+        self.on_progress: Union[Callable[[Any, ProgressEvent], None], None] = None
+
+    @property
+    def success(self) -> bool:
+        return self.error is None and self.returncode == 0
+
+    def outcomes(self) -> Iterator[Tuple[Any, bool]]:
+        """Yield (context, success) for each item this transfer carries."""
+        yield self.context, self.success
+
+    def on_line(self, line: str):
+        """Called for each line of output."""
+        if self.on_progress and (event := parse_line(line, name=self.name)) is not None:
+            self.on_progress(self.context, event)
+
+    def close(self):
+        """Called once the transfer has finished to release any resources it holds."""
+
+    def __repr__(self):
+        return f'Transfer({self.name!r}, host={self.host!r}, returncode={self.returncode})'
+
+
+class InProcessTransfer(Transfer, ABC):
+    """A transfer performed in-process by execute() rather than by a command."""
+    def __init__(self, host: str = None, name: str = None, context=None):
+        super().__init__(command=None, host=host, name=name, context=context)
+
+    @abstractmethod
+    def execute(self):
+        """Perform the transfer; runs on a worker thread and raises on failure."""
+
+
+class TransferSupervisor:
+    """
+    Run transfer subprocesses concurrently on an asyncio event loop.
+
+    At most `concurrency` transfers run at once and at most `per_host` to any one destination host.
+    Output is read incrementally and split on carriage returns as well as newlines so progress
+    updates are seen as they happen. A transfer fails if it runs longer than `timeout` seconds or
+    produces no output for `stall_timeout` seconds; its process is terminated (then killed).
+    run() blocks until all transfers finish; cancel() may be called from another thread to stop them.
+    """
+    def __init__(self, concurrency: int = DEFAULT_CONCURRENCY, per_host: int = None,
+                 timeout: float = DEFAULT_TIMEOUT, stall_timeout: float = DEFAULT_STALL_TIMEOUT):
+        self.concurrency = max(1, concurrency or 1)
+        self.per_host = max(1, per_host or self.concurrency)
+        self.timeout = timeout
+        self.stall_timeout = stall_timeout
+        self._loop: Union[asyncio.AbstractEventLoop, None] = None
+        self._tasks: List[asyncio.Task] = list()
+        self._lock = threading.Lock()
+
+    def run(self, transfers: Iterable[Transfer], on_start: Callable[[Transfer], None] = None,
+            on_complete: Callable[[Transfer], None] = None) -> List[Transfer]:
+        """
+        Run transfers and return them in the order given once all have finished.
+
+        :param transfers: transfers to run; they're started in order as slots become available
+        :param on_start: called on the event loop thread when a transfer's process is about to start
+        :param on_complete: called on the event loop thread as each transfer finishes
+        """
+        transfers = list(transfers)
+        if transfers:
+            asyncio.run(self._run_all(transfers, on_start=on_start, on_complete=on_complete))
+        return transfers
+
+    def cancel(self):
+        """Cancel all running and queued transfers."""
+        with self._lock:
+            if self._loop is not None:
+                for task in self._tasks:
+                    self._loop.call_soon_threadsafe(task.cancel)
+
+    async def _run_all(self, transfers: List[Transfer], on_start, on_complete):
+        slots = asyncio.Semaphore(self.concurrency)
+        host_slots: Dict[str, asyncio.Semaphore] = defaultdict(lambda: asyncio.Semaphore(self.per_host))
+
+        async def supervise(transfer: Transfer):
+            try:
+                # take the host slot first so a busy host doesn't hold global slots other hosts could use
+                async with host_slots[transfer.host], slots:
+                    if on_start:
+                        on_start(transfer)
+                    await self._run_transfer(transfer)
+            except asyncio.CancelledError:
+                transfer.error = RemoteExecuteCancelled('Transfer cancelled')
+            finally:
+                transfer.close()
+                if on_complete:
+                    on_complete(transfer)
+
+        with self._lock:
+            self._loop = asyncio.get_running_loop()
+            self._tasks = [asyncio.ensure_future(supervise(t)) for t in transfers]
+        try:
+            for transfer, result in zip(transfers, await asyncio.gather(*self._tasks, return_exceptions=True)):
+                if isinstance(result, Exception):
+                    logger.error(f'Transfer supervision failed for {transfer.name}: {result}', exc_info=result)
+        finally:
+            with self._lock:
+                self._loop = None
+                self._tasks = list()
+
+    async def _run_transfer(self, transfer: Transfer):
+        if isinstance(transfer, InProcessTransfer):
+            await self._run_in_process(transfer)
+            return
+
+        logger.debug(f'Command: {transfer.command}')
+        try:
+            process = await asyncio.create_subprocess_exec(*transfer.command,
+                                                           stdout=asyncio.subprocess.PIPE,
+                                                           stderr=asyncio.subprocess.STDOUT,
+                                                           # own process group so children (e.g. ssh) are stopped too
+                                                           start_new_session=True)
+        except OSError as e:
+            transfer.error = RemoteExecuteSendCommandFailed(f'Error executing remote command: {e}')
+            return
+
+        try:
+            await self._read_output(transfer, process)
+            transfer.returncode = await process.wait()
+        except RemoteExecuteError as e:
+            transfer.error = e
+            await self._terminate(process)
+            transfer.returncode = process.returncode
+            return
+        except asyncio.CancelledError:
+            await self._terminate(process)
+            transfer.returncode = process.returncode
+            raise
+
+        if transfer.returncode != 0:
+            transfer.error = RemoteExecuteSendCommandError(
+                f'Non-zero return value ({transfer.returncode}) for remote command: {transfer.command}')
+
+    async def _run_in_process(self, transfer: InProcessTransfer):
+        # a thread can't be interrupted, so a timed out transfer is abandoned rather than stopped
+        future = asyncio.get_running_loop().run_in_executor(None, transfer.execute)
+        try:
+            await asyncio.wait_for(future, timeout=self.timeout or None)
+        except asyncio.TimeoutError:
+            transfer.error = RemoteExecuteTimeout(f'Transfer exceeded {self.timeout}s: {transfer.name}')
+        except RemoteExecuteError as e:
+            transfer.error = e
+        except Exception as e:
+            transfer.error = RemoteExecuteSendCommandFailed(f'Error transferring {transfer.name}: {e}')
+        else:
+            transfer.returncode = 0
+
+    async def _read_output(self, transfer: Transfer, process: asyncio.subprocess.Process):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout if self.timeout else None
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        buffer = ''
+        while True:
+            wait = self.stall_timeout
+            if deadline is not None:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise RemoteExecuteTimeout(f'Transfer exceeded {self.timeout}s: {transfer.name}')
+                wait = min(wait, remaining) if wait else remaining
+            try:
+                chunk = await asyncio.wait_for(process.stdout.read(READ_SIZE), timeout=wait)
+            except asyncio.TimeoutError:
+                if deadline is not None and loop.time() >= deadline:
+                    raise RemoteExecuteTimeout(f'Transfer exceeded {self.timeout}s: {transfer.name}')
+                raise RemoteExecuteStalled(f'No output for {self.stall_timeout}s: {transfer.name}')
+            if not chunk:
+                break
+            *lines, buffer = LINE_SPLIT.split(buffer + decoder.decode(chunk))
+            for line in lines:
+                self._handle_line(transfer, line)
+        if buffer := buffer + decoder.decode(b'', final=True):
+            self._handle_line(transfer, buffer)
+
+    @staticmethod
+    def _handle_line(transfer: Transfer, line: str):
+        line = line.strip()
+        if not line:
+            return
+        transfer.output.append(line)
+        transfer.on_line(line)
+        # progress is reported through on_progress rather than logged
+        if '%' in line:
+            transfer.progress_lines += 1
+        else:
+            logger.debug(f'Output ({transfer.name}): {line}')
+
+    @staticmethod
+    async def _terminate(process: asyncio.subprocess.Process):
+        if process.returncode is not None:
+            return
+        try:
+            os.killpg(process.pid, signal.SIGTERM)
+            await asyncio.wait_for(process.wait(), timeout=TERMINATE_GRACE)
+        except ProcessLookupError:
+            pass
+        except asyncio.TimeoutError:
+            os.killpg(process.pid, signal.SIGKILL)
+            await process.wait()
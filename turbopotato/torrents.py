@@ -1,33 +1,40 @@
 import logging
+from pathlib import Path
 import time
 from typing import List, Union
 
-import qbittorrentapi as qbt_api
-from qbittorrentapi import APIError as qBittorrentError
-
 from turbopotato.config import config
+from turbopotato.lazy import lazy_import
+
+qbt_api = lazy_import('qbittorrentapi')
 
 logger = logging.getLogger('torrents')
 
 
 class Torrents:
     def __init__(self):
-        self.qbt_client = qbt_api.Client(host=config.qbittorrent_host,
-                                         port=config.qbittorrent_port,
-                                         username=config.qbittorrent_username,
-                                         password=config.qbittorrent_password,
-                                         VERIFY_WEBUI_CERTIFICATE=False,
-                                         DISABLE_LOGGING_DEBUG_OUTPUT=True)
+        self._qbt_client = None
         self._torrent_cache = None
         self._torrent_cache_time = time.time()
         self._torrent_cache_max_age = 3
 
+    @property
+    def qbt_client(self):  # -> qbt_api.Client
+        if self._qbt_client is None:
+            self._qbt_client = qbt_api.Client(host=config.qbittorrent_host,
+                                              port=config.qbittorrent_port,
+                                              username=config.qbittorrent_username,
+                                              password=config.qbittorrent_password,
+                                              VERIFY_WEBUI_CERTIFICATE=False,
+                                              DISABLE_LOGGING_DEBUG_OUTPUT=True)
+        return self._qbt_client
+
     @property
     def _torrents(self):  # -> Union[List[qbt_api.TorrentDictionary], None]:
         if (time.time() - self._torrent_cache_time) > self._torrent_cache_max_age or (self._torrent_cache is None):
             try:
                 self._torrent_cache = self.qbt_client.torrents.info.all()
-            except qBittorrentError as e:
+            except qbt_api.APIError as e:
                 logger.error(f'Failed to retrieve torrent list: {e}', exc_info=True)
                 return None
         return self._torrent_cache
@@ -46,7 +53,7 @@ class Torrents:
         if torrent_hash:
             try:
                 return self.qbt_client.torrents.info(hashes=torrent_hash)[0]
-            except (qBittorrentError, IndexError) as e:
+            except (qbt_api.APIError, IndexError) as e:
                 logger.warning(f'Torrent not found for "{torrent_hash}": {e}')
                 return None
         if torrent_name:
@@ -62,6 +69,18 @@ class Torrents:
                     return torrent
         return None
 
+    def get_content_path(self, torrent_hash: str) -> Union[str, None]:
+        torrent = self.get_torrent(torrent_hash=torrent_hash)
+        if torrent is None:
+            return None
+        if content_path := torrent.get('content_path'):
+            return content_path
+        # older qBittorrent versions don't report content_path
+        files = torrent.files
+        if not files:
+            return None
+        return str(Path(torrent.save_path, files[0].name.split('/')[0]))
+
     def is_transiting(self, torrent=None, torrent_hash: str = None) -> bool:
         if torrent_hash:
             torrent = self.get_torrent(torrent_hash=torrent_hash)
@@ -71,3 +90,10 @@ class Torrents:
 
 
 torrents = Torrents()
+
+
+def __getattr__(name):
+    # qBittorrentError is resolved on demand so importing this module doesn't import qbittorrentapi
+    if name == 'qBittorrentError':
+        return qbt_api.APIError
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
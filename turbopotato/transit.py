@@ -1,9 +1,24 @@
+import atexit
+from contextlib import contextmanager
 import logging
+from pathlib import Path
 import shlex
+import shutil
 import subprocess
+import tempfile
+import threading
+from typing import List, Union
+
+from turbopotato.config import config
 
 logger = logging.getLogger('transit')
 
+REMOTE_HOST = 'nas'
+SSH_OPTIONS = ['-o', 'compression=no']
+PARTIAL_DIR = '.rsync-partial'  # relative to each destination directory
+CONTROL_PERSIST = 600  # seconds an idle master outlives its last client, e.g. if turbopotato is killed
+MASTER_TIMEOUT = 30  # seconds
+
 
 class RemoteExecuteError(Exception):
     pass
@@ -17,43 +32,189 @@ class RemoteExecuteSendCommandError(RemoteExecuteError):
     pass
 
 
-def send_file(local_filepath=None, remote_filepath=None):
+class RemoteExecuteCancelled(RemoteExecuteSendCommandFailed):
+    pass
+
+
+class RemoteExecuteTimeout(RemoteExecuteError):
+    pass
+
+
+class RemoteExecuteStalled(RemoteExecuteError):
+    pass
+
+
+class RemoteExecuteRescheduled(RemoteExecuteError):
+    """Transfer stopped to restart (resuming) under a new bandwidth limit."""
+
+
+class SSHMaster:
+    """
+    Shared SSH connection (OpenSSH ControlMaster) to a remote host.
+
+    While a master is up, rsync and remote commands connect through its control socket instead
+    of negotiating a new SSH session each time. Sessions are reference counted so a daemon can
+    hold the master open across runs; the master is health-checked whenever a session starts and
+    is restarted if it has gone away. If the master can't be started, commands connect directly.
+
+    :param host: remote host
+    :param ssh: ssh command; defaults to TP_SSH_COMMAND or ssh
+    """
+    def __init__(self, host: str = REMOTE_HOST, ssh: Union[str, List[str]] = None):
+        self.host = host
+        self._ssh = ssh
+        self.control_path: Union[Path, None] = None
+        self._control_dir: Union[Path, None] = None
+        self._sessions = 0
+        self._lock = threading.RLock()
+
+    @property
+    def ssh(self) -> List[str]:
+        ssh = self._ssh or config.SSH_COMMAND
+        return shlex.split(ssh) if isinstance(ssh, str) else list(ssh)
+
+    def _control(self, operation: str) -> subprocess.CompletedProcess:
+        return subprocess.run([*self.ssh, '-o', f'ControlPath={self.control_path}', '-O', operation, self.host],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, encoding='utf-8',
+                              timeout=MASTER_TIMEOUT)
+
+    def is_alive(self) -> bool:
+        if self.control_path is None:
+            return False
+        try:
+            return self._control('check').returncode == 0
+        except (OSError, subprocess.SubprocessError):
+            return False
+
+    def start(self) -> bool:
+        """Start the master if it isn't running; returns whether it's available."""
+        with self._lock:
+            if self.is_alive():
+                return True
+            self.stop()
+            self._control_dir = Path(tempfile.mkdtemp(prefix='turbopotato-ssh-'))
+            self.control_path = self._control_dir / 'master.sock'
+            command = [*self.ssh, *SSH_OPTIONS,
+                       '-o', 'ControlMaster=yes',
+                       '-o', f'ControlPath={self.control_path}',
+                       '-o', f'ControlPersist={CONTROL_PERSIST}',
+                       '-o', 'BatchMode=yes',
+                       '-N', '-f', self.host]
+            logger.debug(f'Starting SSH master: {command}')
+            try:
+                result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                        encoding='utf-8', timeout=MASTER_TIMEOUT)
+                error = result.stderr.strip() if result.returncode != 0 else None
+            except (OSError, subprocess.SubprocessError) as e:
+                error = str(e)
+            if error is not None or not self.is_alive():
+                logger.warning(f'Failed to start SSH master for "{self.host}"; connecting directly. Error: {error}')
+                self.stop()
+                return False
+            logger.debug(f'SSH master for "{self.host}" listening on "{self.control_path}"')
+            return True
+
+    def stop(self):
+        with self._lock:
+            if self.control_path is not None and self.control_path.exists():
+                try:
+                    self._control('exit')
+                except (OSError, subprocess.SubprocessError) as e:
+                    logger.warning(f'Failed to stop SSH master for "{self.host}": {e}')
+            if self._control_dir is not None:
+                shutil.rmtree(self._control_dir, ignore_errors=True)
+            self.control_path = None
+            self._control_dir = None
+
+    @contextmanager
+    def session(self):
+        """Hold the master open for the duration of the block; the last session out stops it."""
+        with self._lock:
+            self._sessions += 1
+            self.start()
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._sessions -= 1
+                if self._sessions == 0:
+                    self.stop()
+
+    def options(self) -> List[str]:
+        """ssh options that route a connection through the master when it's up."""
+        if self.control_path is None:
+            return list(SSH_OPTIONS)
+        return [*SSH_OPTIONS, '-o', 'ControlMaster=no', '-o', f'ControlPath={self.control_path}']
+
+    def rsync_shell(self) -> str:
+        """Remote shell for rsync's -e option."""
+        return ' '.join(shlex.quote(arg) for arg in [*self.ssh, *self.options()])
+
+    def command(self, remote_cmd: str) -> List[str]:
+        """Argument list that runs a shell command on the remote host."""
+        return [*self.ssh, *self.options(), self.host, remote_cmd]
+
+
+ssh_master = SSHMaster()
+atexit.register(ssh_master.stop)
+
+
+def remote_shell(host: str = REMOTE_HOST) -> str:
+    if host == ssh_master.host:
+        return ssh_master.rsync_shell()
+    return ' '.join(shlex.quote(arg) for arg in [*shlex.split(config.SSH_COMMAND), *SSH_OPTIONS])
+
+
+def partial_options() -> List[str]:
+    # an interrupted file is kept in PARTIAL_DIR next to its destination, never at the destination itself,
+    # and the next send uses it as the basis so only what's missing or differs is sent. --append(-verify)
+    # can't be combined with --partial-dir (it writes in place), and isn't needed for the resume.
+    return [f'--partial-dir={PARTIAL_DIR}']
+
+
+def with_bwlimit(command: List[str], limit: Union[int, None]) -> List[str]:
+    """rsync command with its --bwlimit replaced by limit bytes/s (None for unlimited)."""
+    command = [arg for arg in command if not arg.startswith('--bwlimit=')]
+    if limit is not None:
+        # without a suffix, rsync's --bwlimit is in units of 1024 bytes/s
+        command.insert(1, f'--bwlimit={max(1, limit // 1024)}')
+    return command
+
+
+def send_file_command(local_filepath=None, remote_filepath=None, host: str = REMOTE_HOST) -> list:
     escaped_dirpath = shlex.quote(str(remote_filepath.parent))
     escaped_target_filepath = shlex.quote(str(remote_filepath))
 
-    send_file_command = ['rsync',
-                         # '-e "ssh -x -T -c chacha20-poly1305@openssh.com"',
-                         '-e ssh -o compression=no',
-                         '--human-readable', '--no-relative',
-                         f'--rsync-path=mkdir -p {escaped_dirpath} && rsync',
-                         '--stats', '--progress',
-                         '--perms', '--chmod=Du=rwx,Dgo=rwx,Fu=rw,Fog=rw',
-                         f'{local_filepath}',
-                         f'nas:{escaped_target_filepath}']
-    ''' send file to remote machine; skip to next file if failure '''
-    send_command(remote_cmd=send_file_command)
-
-
-def send_command(remote_cmd=None):
-    try:
-        logger.debug("Command: %s" % remote_cmd)
-        p = subprocess.Popen(remote_cmd,
-                             stdout=subprocess.PIPE,
-                             stderr=subprocess.STDOUT,
-                             encoding='utf-8',
-                             bufsize=1)
-        count = 0
-        for line in p.stdout:
-            # only print every 10th output for rsync upload status
-            if 'rsync' in remote_cmd and "%" in line:
-                if count % 10 == 0:  # about every 10 seconds
-                    logger.debug("Output: %s" % str(line).rstrip())
-                count += 1
-            else:
-                logger.debug("Output: %s" % str(line).rstrip())
-        p.wait()
-    except Exception as e:
-        raise RemoteExecuteSendCommandFailed(f'Error executing remote command: {e}') from e
-
-    if p.returncode != 0:
-        raise RemoteExecuteSendCommandError(f'Non-zero return value for remote command: {remote_cmd}')
+    command = ['rsync',
+               # '-e "ssh -x -T -c chacha20-poly1305@openssh.com"',
+               f'-e {remote_shell(host)}',
+               '--human-readable', '--no-relative',
+               *partial_options(),
+               f'--rsync-path=mkdir -p {escaped_dirpath} && rsync',
+               '--stats', '--progress',
+               '--perms', '--chmod=Du=rwx,Dgo=rwx,Fu=rw,Fog=rw',
+               f'{local_filepath}',
+               f'{host}:{escaped_target_filepath}']
+    return command
+
+
+def send_files_command(source_directory=None, files_from=None, remote_directory=None, host: str = REMOTE_HOST) -> list:
+    """
+    rsync command to send the files listed in files_from (relative to source_directory) in one session.
+
+    Symlinks are followed so a directory of links named for their destinations can rename files in flight.
+    Each file's name is printed before its progress so callers can attribute progress to files.
+    """
+    escaped_dirpath = shlex.quote(str(remote_directory))
+
+    command = ['rsync',
+               f'-e {remote_shell(host)}',
+               '--human-readable', '--copy-links',
+               f'--files-from={files_from}', '--out-format=%n',
+               *partial_options(),
+               f'--rsync-path=mkdir -p {escaped_dirpath} && rsync',
+               '--stats', '--progress',
+               '--perms', '--chmod=Du=rwx,Dgo=rwx,Fu=rw,Fog=rw',
+               f'{source_directory}/',
+               f'{host}:{escaped_dirpath}/']
+    return command
@@ -0,0 +1,534 @@
+from abc import ABC, abstractmethod
+import argparse
+from contextlib import nullcontext
+from functools import partial
+import errno
+import fcntl
+import logging
+import os
+from pathlib import Path, PurePosixPath
+import shlex
+import shutil
+import time
+from typing import Any, Callable, Dict, Iterable, List, Tuple, Union
+
+from turbopotato.bandwidth import BandwidthScheduler
+from turbopotato.bandwidth import describe
+from turbopotato.bandwidth import limit_changed
+from turbopotato.bandwidth import MAX_RESCHEDULES
+from turbopotato.bandwidth import RESCHEDULE_INTERVAL
+from turbopotato.batch import Entry
+from turbopotato.batch import plan_transfers
+from turbopotato.config import config
+from turbopotato.fingerprint import fingerprint
+from turbopotato.journal import journal
+from turbopotato.progress import monitor
+from turbopotato.progress import ProgressEvent
+from turbopotato.remote_index import remote_index
+from turbopotato.remote_index import RemoteLibraryIndex
+from turbopotato.scheduling import TransferSchedule
+from turbopotato.supervisor import DEFAULT_CONCURRENCY
+from turbopotato.supervisor import InProcessTransfer
+from turbopotato.supervisor import Transfer
+from turbopotato.supervisor import TransferSupervisor
+from turbopotato.transit import RemoteExecuteCancelled
+from turbopotato.transit import RemoteExecuteRescheduled
+from turbopotato.transit import REMOTE_HOST
+from turbopotato.transit import ssh_master
+from turbopotato.transit import with_bwlimit
+
+logger = logging.getLogger('transport')
+
+LOCAL_HOST = 'local'
+FICLONE = 0x40049409  # _IOW(0x94, 9, int) from linux/fs.h
+COPY_CHUNK = 64 * 1024 * 1024
+FILE_MODE = 0o666  # matches rsync's --chmod=Fu=rw,Fog=rw
+DIRECTORY_MODE = 0o777  # matches rsync's --chmod=Du=rwx,Dgo=rwx
+RETRIES = 3
+RETRY_BACKOFF = 10  # seconds
+
+# copy_file_range/sendfile errors meaning "not supported here"; fall back to the next method
+UNSUPPORTED = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EBADF}
+
+
+def _copy_data(fsrc: int, fdst: int, size: int) -> str:
+    """Copy size bytes between file descriptors in the kernel if possible; returns the method used."""
+    offset = 0
+    if hasattr(os, 'copy_file_range'):
+        try:
+            while offset < size:
+                copied = os.copy_file_range(fsrc, fdst, min(COPY_CHUNK, size - offset))
+                if copied == 0:
+                    break
+                offset += copied
+            return 'copy_file_range'
+        except OSError as e:
+            if e.errno not in UNSUPPORTED or offset:
+                raise
+    try:
+        while offset < size:
+            copied = os.sendfile(fdst, fsrc, offset, min(COPY_CHUNK, size - offset))
+            if copied == 0:
+                break
+            offset += copied
+        return 'sendfile'
+    except OSError as e:
+        if e.errno not in UNSUPPORTED or offset:
+            raise
+    with open(fsrc, 'rb', closefd=False) as src, open(fdst, 'wb', closefd=False) as dst:
+        shutil.copyfileobj(src, dst, COPY_CHUNK)
+    return 'userspace'
+
+
+def _install(source: Path, destination: Path, write: Callable[[Path, Path], None], chmod: bool = True):
+    """Create destination via a temporary sibling so a failed transfer never leaves a partial file in place."""
+    old_umask = os.umask(0)
+    try:
+        destination.parent.mkdir(mode=DIRECTORY_MODE, parents=True, exist_ok=True)
+    finally:
+        os.umask(old_umask)
+    temporary = destination.with_name(f'.{destination.name}.tp-partial')
+    try:
+        write(source, temporary)
+        if chmod:
+            os.chmod(temporary, FILE_MODE)
+        os.replace(temporary, destination)
+    finally:
+        if temporary.exists():
+            temporary.unlink()
+
+
+def copy_file(source: Path, destination: Path):
+    def write(src: Path, dst: Path):
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            method = _copy_data(fsrc.fileno(), fdst.fileno(), os.fstat(fsrc.fileno()).st_size)
+        logger.debug(f'Copied "{src}" with {method}')
+    _install(source, destination, write)
+
+
+def reflink_file(source: Path, destination: Path):
+    def write(src: Path, dst: Path):
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            try:
+                fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+                return
+            except OSError as e:
+                if e.errno not in UNSUPPORTED:
+                    raise
+                logger.debug(f'Reflink unsupported for "{src}" ({e}); copying instead')
+            _copy_data(fsrc.fileno(), fdst.fileno(), os.fstat(fsrc.fileno()).st_size)
+    _install(source, destination, write)
+
+
+def hardlink_file(source: Path, destination: Path):
+    try:
+        # the link shares the source's inode, so leave its permissions alone
+        _install(source, destination, os.link, chmod=False)
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+            raise
+        logger.debug(f'Hardlink not possible for "{source}" ({e}); copying instead')
+        copy_file(source, destination)
+
+
+def move_file(source: Path, destination: Path):
+    try:
+        _install(source, destination, os.rename, chmod=False)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        copy_file(source, destination)
+        os.unlink(source)
+
+
+def _fingerprint(entry: Entry) -> Union[str, None]:
+    """fingerprint() of an entry's source, reusing its context's (e.g. a media File's) where it has one."""
+    source, _, context = entry
+    return context.fingerprint if hasattr(context, 'fingerprint') else fingerprint(source)
+
+
+class LocalTransfer(InProcessTransfer):
+    """Transfer a file to a locally mounted destination in-process."""
+    def __init__(self, operation: Callable[[Path, Path], None], source: Path, destination: Path, context=None):
+        super().__init__(host=LOCAL_HOST, name=Path(source).name, context=context)
+        self.operation = operation
+        self.source = Path(source)
+        self.destination = Path(destination)
+
+    def execute(self):
+        logger.debug(f'{self.operation.__name__}: "{self.source}" -> "{self.destination}"')
+        self.operation(self.source, self.destination)
+
+
+class RemoteLinkTransfer(Transfer):
+    """
+    Create a destination on the NAS from a library file with identical content, without sending it.
+
+    The destination is hardlinked to the existing file, or copied server-side (as a reflink where the
+    filesystem supports it) if it can't be linked, then renamed into place.
+    """
+    sends_data = False
+
+    def __init__(self, source: Path, existing: PurePosixPath, destination: PurePosixPath,
+                 index: RemoteLibraryIndex, context=None):
+        self.source = Path(source)
+        self.existing = PurePosixPath(existing)
+        self.index = index
+        temporary = destination.with_name(f'.{destination.name}.turbopotato')
+        q = shlex.quote
+        # the temporary file is removed if linking or copying fails or the command is interrupted
+        remote_cmd = (f'trap {q(f"rm -f {q(str(temporary))}; exit 1")} HUP INT TERM PIPE; '
+                      f'mkdir -p {q(str(destination.parent))} && '
+                      f'{{ ln -f {q(str(existing))} {q(str(temporary))} || '
+                      f'cp -f --reflink=auto {q(str(existing))} {q(str(temporary))}; }} && '
+                      f'mv -f {q(str(temporary))} {q(str(destination))} || '
+                      f'{{ rm -f {q(str(temporary))}; exit 1; }}')
+        super().__init__(command=index.master.command(remote_cmd), host=index.master.host,
+                         name=f'{destination.name} (linking {existing})', context=context)
+
+    def close(self):
+        if not self.success:
+            # don't offer the same file again if it's gone or can't be read
+            self.index.discard(self.existing)
+
+
+class Transport(ABC):
+    """How files reach a destination root."""
+    name = None
+    consumes_source = False  # the source is gone once sent
+
+    @abstractmethod
+    def plan(self, entries: List[Entry], resume: Callable[[Entry], bool] = None) -> List[Transfer]:
+        """
+        :param entries: (local filepath, remote filepath, context) for each file to send
+        :param resume: whether an entry should continue an interrupted transfer, if the transport can
+        """
+
+
+class RsyncTransport(Transport):
+    """
+    rsync over SSH to the NAS; files for the same directory share a session.
+
+    A file whose content is already in the library (per the remote index and a fingerprint computed
+    on the NAS) is linked from the existing copy instead of being sent.
+    """
+    name = 'rsync'
+
+    def __init__(self, host: str = REMOTE_HOST, index: RemoteLibraryIndex = None):
+        self.host = host
+        self.index = index or remote_index
+
+    def plan(self, entries: List[Entry], resume: Callable[[Entry], bool] = None) -> List[Transfer]:
+        duplicates = dict()
+        if self.host == self.index.master.host:
+            fresh = [entry for entry in entries if not (resume and resume(entry))]
+            duplicates = self.index.duplicates({entry[1]: _fingerprint(entry) for entry in fresh})
+        transfers = list()
+        for source, destination, context in entries:
+            if destination in duplicates:
+                logger.info(f'Content of {source.name} is already in the library at {duplicates[destination]}')
+                transfers.append(RemoteLinkTransfer(source, duplicates[destination], destination,
+                                                    index=self.index, context=context))
+        remaining = [entry for entry in entries if entry[1] not in duplicates]
+        return transfers + plan_transfers(remaining, host=self.host, resume=resume)
+
+
+class LocalTransport(Transport):
+    """
+    Transfer to a destination root mounted (or stored) on this machine.
+
+    :param root: destination root as configured (e.g. MEDIA_ROOT)
+    :param local_root: where that root is mounted locally; defaults to the root itself
+    """
+    operation: Callable[[Path, Path], None] = None
+
+    def __init__(self, root: PurePosixPath, local_root: Union[Path, None] = None):
+        self.root = PurePosixPath(root)
+        self.local_root = Path(local_root or root)
+
+    def local_path(self, remote_filepath: PurePosixPath) -> Path:
+        return self.local_root / PurePosixPath(remote_filepath).relative_to(self.root)
+
+    def plan(self, entries: List[Entry], resume: Callable[[Entry], bool] = None) -> List[Transfer]:
+        # local copies are fast to redo, so interrupted ones start over
+        return [LocalTransfer(type(self).operation, source, self.local_path(destination), context=context)
+                for source, destination, context in entries]
+
+
+class CopyTransport(LocalTransport):
+    name = 'copy'
+    operation = staticmethod(copy_file)
+
+
+class ReflinkTransport(LocalTransport):
+    name = 'reflink'
+    operation = staticmethod(reflink_file)
+
+
+class HardlinkTransport(LocalTransport):
+    name = 'hardlink'
+    operation = staticmethod(hardlink_file)
+
+
+class MoveTransport(LocalTransport):
+    """
+    Move files into the destination root.
+
+    The source is gone afterwards, so this is only for files that aren't seeding; a Router that
+    keeps sources (as in --torrents runs) hardlinks instead.
+    """
+    name = 'move'
+    operation = staticmethod(move_file)
+    consumes_source = True
+
+
+TRANSPORTS: Dict[str, type] = {t.name: t for t in (RsyncTransport, CopyTransport, ReflinkTransport,
+                                                    HardlinkTransport, MoveTransport)}
+
+
+class Router:
+    """
+    Choose a transport for each destination by its longest matching root.
+
+    Routes come from TP_TRANSPORTS as `;`-separated `<root>=<transport>[:<local root>]` entries, e.g.
+        /volume1/Media/Movies=copy:/mnt/nas/Movies;/volume1/Media/TV Shows=hardlink:/srv/media/TV Shows
+    Destinations outside every route use rsync over SSH.
+
+    :param keep_sources: hardlink instead of move, for sources that must stay in place (e.g. seeding torrents)
+    """
+    def __init__(self, spec: str = None, default: Transport = None, keep_sources: bool = False):
+        self.default = default or RsyncTransport()
+        self.keep_sources = keep_sources
+        self.routes: List[Tuple[PurePosixPath, Transport]] = list()
+        for entry in filter(None, (e.strip() for e in (config.TRANSPORTS if spec is None else spec).split(';'))):
+            self.add_route(entry)
+
+    def add_route(self, entry: str):
+        root, _, target = entry.partition('=')
+        name, _, local_root = target.partition(':')
+        name = name.strip().lower()
+        if not root or name not in TRANSPORTS:
+            raise ValueError(f'Invalid transport route "{entry}"; expected <root>=<{"|".join(TRANSPORTS)}>[:<local root>]')
+        root = PurePosixPath(root.strip())
+        if name == MoveTransport.name and self.keep_sources:
+            logger.debug(f'Sources must stay in place; hardlinking instead of moving to "{root}"')
+            name = HardlinkTransport.name
+        if name == RsyncTransport.name:
+            transport = RsyncTransport(host=local_root.strip() or REMOTE_HOST)
+        else:
+            transport = TRANSPORTS[name](root=root, local_root=local_root.strip() or None)
+        self.routes.append((root, transport))
+        self.routes.sort(key=lambda route: len(route[0].parts), reverse=True)
+
+    def transport(self, destination: PurePosixPath) -> Transport:
+        for root, transport in self.routes:
+            if root == destination or root in PurePosixPath(destination).parents:
+                return transport
+        return self.default
+
+    def plan(self, entries: Iterable[Entry], resume: Callable[[Entry], bool] = None) -> List[Transfer]:
+        by_transport: Dict[int, Tuple[Transport, List[Entry]]] = dict()
+        for entry in entries:
+            transport = self.transport(entry[1])
+            by_transport.setdefault(id(transport), (transport, list()))[1].append(entry)
+        transfers = list()
+        for transport, transport_entries in by_transport.values():
+            logger.debug(f'Sending {len(transport_entries)} files with {transport.name}')
+            transfers.extend(transport.plan(transport_entries, resume=resume))
+        return transfers
+
+
+def parse_per_host(spec: str = None) -> Union[int, None]:
+    """Maximum concurrent transfers to one destination host from TP_TRANSFERS_PER_HOST; None if unset."""
+    spec = (config.TRANSFERS_PER_HOST if spec is None else spec).strip()
+    if not spec:
+        return None
+    try:
+        per_host = int(spec)
+    except ValueError:
+        per_host = 0
+    if per_host < 1:
+        raise ValueError(f'Invalid transfers per host "{spec}"; expected a positive number')
+    return per_host
+
+
+def deliver(entries: List[Entry], concurrency: int = DEFAULT_CONCURRENCY, per_host: int = None,
+            on_start: Callable[[Transfer], None] = None,
+            on_complete: Callable[[Any, bool, Union[Exception, None]], None] = None,
+            retries: int = RETRIES, backoff: float = RETRY_BACKOFF, router: Router = None,
+            scheduler: BandwidthScheduler = None, schedule: TransferSchedule = None):
+    """
+    Send files with their routed transports, journaling progress and retrying failures.
+
+    Failed transfers are retried with exponential backoff. An rsync transfer whose journal shows it was
+    interrupted part way (in this run or a previous one) resumes from its partial file.
+    Progress is published to progress.monitor; its summary for an entry is available from
+    monitor.get(context) until on_complete returns.
+
+    rsync transfers are started with an equal share of the scheduler's current bandwidth limit, split
+    between as many as can run at once so together they never exceed it. A long transfer whose share
+    has since changed markedly is stopped and resumed under the new one, at most MAX_RESCHEDULES times
+    per file; this doesn't count as a retry.
+
+    :param entries: (local filepath, remote filepath, context) for each file to send
+    :param concurrency: maximum concurrent transfers
+    :param per_host: maximum concurrent transfers to one destination host; defaults to TP_TRANSFERS_PER_HOST, else concurrency
+    :param on_start: called as each transfer starts
+    :param on_complete: called once per entry with (context, success, error) when it has succeeded or run out of retries
+    :param retries: attempts after the first
+    :param backoff: seconds before the first retry; doubles each time
+    :param router: transport routing; defaults to TP_TRANSPORTS
+    :param scheduler: bandwidth limits; defaults to TP_BANDWIDTH_SCHEDULE and TP_UPLOAD_CAPACITY
+    :param schedule: transfer order and group completion callbacks; defaults to the order given
+    """
+    per_host = per_host or parse_per_host()
+    router = router or Router()
+    scheduler = scheduler or BandwidthScheduler()
+    if scheduler.capacity is not None:
+        scheduler.refresh_seeding_rate()  # so the first transfers start adapted; later limits read it from a cache
+    schedule = schedule or TransferSchedule()
+    schedule.add(entries)
+    journal.reload()
+    for source, destination, _ in entries:
+        journal.planned(source, destination)
+
+    def resume(entry: Entry) -> bool:
+        return journal.resume_offset(entry[0], entry[1]) > 0
+
+    def throttled(transfer: Transfer) -> bool:
+        return scheduler.enabled and transfer.command is not None and os.path.basename(transfer.command[0]) == 'rsync'
+
+    pending = list(entries)
+    attempt = 0
+    retrying = False
+    reschedules: Dict[int, int] = dict()  # context -> restarts under a new limit
+    while pending:
+        if retrying:
+            delay = backoff * 2 ** (attempt - 1)
+            logger.warning(f'Retrying {len(pending)} failed transfers in {delay:g}s (attempt {attempt + 1} of {retries + 1})')
+            time.sleep(delay)
+
+        by_context = {id(entry[2]): entry for entry in pending}
+        failed = list()
+        rescheduled = list()
+        running: Dict[int, Tuple[Union[int, None], float]] = dict()  # throttled transfer -> (limit, when set)
+
+        def started(transfer: Transfer):
+            for context, _ in transfer.outcomes():
+                source, destination, _ = by_context[id(context)]
+                if offset := journal.resume_offset(source, destination):
+                    logger.info(f'Resuming {source.name} from {offset / 10**9:.2f} GB')
+                journal.started(source, destination, offset=offset)
+                monitor.start(context, name=source.name, offset=offset)
+            if throttled(transfer):
+                limit = scheduler.share(slots)
+                running[id(transfer)] = (limit, time.monotonic())
+                transfer.command = with_bwlimit(transfer.command, limit)
+                logger.debug(f'Bandwidth limit for {transfer.name}: {describe(limit)}')
+            transfer.on_progress = partial(progress, transfer)
+            if on_start:
+                on_start(transfer)
+
+        def progress(transfer: Transfer, context, event: ProgressEvent):
+            journal.progress(*by_context[id(context)][:2], offset=event.bytes)
+            monitor.update(context, event)
+            if id(transfer) in running:
+                limit, since = running[id(transfer)]
+                if time.monotonic() - since >= RESCHEDULE_INTERVAL and reschedules.get(id(context), 0) < MAX_RESCHEDULES:
+                    running[id(transfer)] = (limit, time.monotonic())
+                    if limit_changed(limit, current := scheduler.share(slots)):
+                        raise RemoteExecuteRescheduled(f'Bandwidth limit changed from {describe(limit)} to {describe(current)}')
+
+        def completed(transfer: Transfer):
+            running.pop(id(transfer), None)
+            for context, success in transfer.outcomes():
+                entry = by_context[id(context)]
+                if success:
+                    journal.completed(entry[0], entry[1])
+                    record = journal.records.get((str(entry[0]), str(entry[1]))) or dict()
+                    monitor.finish(context, success=True, size=record.get('size'), sent=transfer.sends_data)
+                else:
+                    journal.failed(entry[0], entry[1])
+                    monitor.finish(context, success=False)
+                    if isinstance(transfer.error, RemoteExecuteRescheduled):
+                        monitor.pop(context)
+                        reschedules[id(context)] = reschedules.get(id(context), 0) + 1
+                        rescheduled.append(entry)
+                        continue
+                    if attempt < retries and not isinstance(transfer.error, RemoteExecuteCancelled):
+                        monitor.pop(context)
+                        failed.append(entry)
+                        continue
+                if on_complete:
+                    on_complete(context, success, None if success else transfer.error)
+                monitor.pop(context)
+                schedule.completed(context)
+
+        transfers = schedule.order(router.plan(pending, resume=resume),
+                                   entries_of=lambda t: [by_context[id(context)] for context, _ in t.outcomes()])
+        # throttled transfers that can run at once; each gets this fraction of the limit however many are running
+        slots = max(1, min(concurrency, sum(1 for transfer in transfers if throttled(transfer))))
+        # only hold an SSH connection open if something is going over it
+        with ssh_master.session() if any(t.host == ssh_master.host for t in transfers) else nullcontext():
+            TransferSupervisor(concurrency=concurrency, per_host=per_host).run(transfers, on_start=started, on_complete=completed)
+
+        if rescheduled:
+            logger.info(f'Restarting {len(rescheduled)} transfers under a new bandwidth limit')
+        if retrying := bool(failed):
+            attempt += 1
+        pending = failed + rescheduled
+    journal.compact()
+
+
+def benchmark(source: Path, directory: Path, transports: Iterable[str] = None) -> Dict[str, float]:
+    """
+    Time each local transport sending a copy of source into directory.
+
+    :return: seconds taken per transport
+    """
+    source, directory = Path(source), Path(directory)
+    results = dict()
+    for name in transports or [n for n in TRANSPORTS if n != RsyncTransport.name]:
+        # move consumes its source, so every transport starts from a fresh copy
+        original = directory / f'{name}.source{source.suffix}'
+        copy_file(source, original)
+        destination = directory / name / source.name
+        start = time.perf_counter()
+        TRANSPORTS[name].operation(original, destination)
+        results[name] = time.perf_counter() - start
+        for path in (original, destination):
+            if path.exists():
+                path.unlink()
+        destination.parent.rmdir()
+    return results
+
+
+def command(argv: list = None):
+    parser = argparse.ArgumentParser(prog='turbopotato transports', description='inspect transfer transports')
+    subparsers = parser.add_subparsers(dest='action', required=True)
+    bench = subparsers.add_parser('benchmark', help='time local transports copying a file into a directory')
+    bench.add_argument('source', type=str, help='file to send')
+    bench.add_argument('directory', type=str, help='destination directory (e.g. on the library volume)')
+    subparsers.add_parser('routes', help='show configured transport routes')
+    subparsers.add_parser('bandwidth', help='show the bandwidth schedule and current upload limit')
+    parsed = parser.parse_args(args=argv)
+
+    if parsed.action == 'benchmark':
+        size = os.stat(parsed.source).st_size
+        for name, seconds in sorted(benchmark(parsed.source, parsed.directory).items(), key=lambda r: r[1]):
+            print(f'{name:>10}: {seconds:8.3f}s  {size / max(seconds, 1e-9) / 2**20:10.1f} MiB/s')
+    elif parsed.action == 'routes':
+        router = Router()
+        for root, transport in router.routes:
+            print(f'{root} -> {transport.name} {getattr(transport, "local_root", "")}')
+        print(f'* -> {router.default.name}')
+    elif parsed.action == 'bandwidth':
+        scheduler = BandwidthScheduler()
+        for window in scheduler.windows:
+            print(f'{window.start // 60:02d}:{window.start % 60:02d}-{window.end // 60:02d}:{window.end % 60:02d} '
+                  f'-> {describe(window.rate)}')
+        if scheduler.capacity is not None:
+            seeding = scheduler.refresh_seeding_rate()
+            print(f'upload capacity: {describe(scheduler.capacity)}; '
+                  f'seeding: {"unknown" if seeding is None else describe(seeding)}')
+        print(f'current limit: {describe(scheduler.limit())}')
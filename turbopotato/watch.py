@@ -0,0 +1,178 @@
+import argparse
+import logging
+import os
+import select
+import time
+from typing import Any, Dict, List
+
+from turbopotato.arguments import has_media_extension
+from turbopotato.follow import torrent_file_ready
+from turbopotato.inotify import IN_CLOSE_WRITE
+from turbopotato.inotify import IN_CREATE
+from turbopotato.inotify import IN_DELETE
+from turbopotato.inotify import IN_ISDIR
+from turbopotato.inotify import IN_IGNORED
+from turbopotato.inotify import IN_MOVED_FROM
+from turbopotato.inotify import IN_MOVED_TO
+from turbopotato.inotify import IN_Q_OVERFLOW
+from turbopotato.inotify import Inotify
+from turbopotato.log import configure_console_logging
+from turbopotato.pipeline import Pipeline
+from turbopotato.transit import ssh_master
+
+logger = logging.getLogger('watch')
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_CREATE | IN_DELETE
+DEFAULT_SETTLE = 30  # seconds
+
+
+class PendingFile:
+    def __init__(self):
+        self.last_event = time.monotonic()
+        self.closed = False
+        self.state = None
+
+
+class Watcher:
+    """
+    Watch directories with inotify and submit media files to a pipeline once they're complete.
+
+    A file is ready when it has been closed for writing (or moved into a watched directory) and
+    its size and mtime haven't changed for the settle period. With torrents in the job options, a
+    file of a torrent must also be complete and hash-checked in qBittorrent, since a paused or
+    stalled download also leaves a file unchanged. Ready files found in the same pass are submitted
+    together as a single job.
+
+    :param client: qBittorrent client; defaults to torrents' client
+    """
+    def __init__(self, directories: List[str], pipeline: Pipeline, job_options: dict = None,
+                 settle: float = DEFAULT_SETTLE, client: Any = None):
+        self.directories = [os.path.abspath(os.path.expanduser(d)) for d in directories]
+        self.pipeline = pipeline
+        self.job_options = job_options or dict()
+        self.settle = settle
+        self.client = client
+        self.inotify = Inotify()
+        self.watches: Dict[int, str] = dict()
+        self.pending: Dict[str, PendingFile] = dict()
+
+    def add_directory(self, directory: str, scan: bool = False):
+        """Watch a directory tree; with scan, existing media files are treated as new."""
+        for dirpath, _, filenames in os.walk(directory):
+            try:
+                self.watches[self.inotify.add_watch(dirpath, WATCH_MASK)] = dirpath
+            except OSError as e:
+                logger.warning(f'Failed to watch "{dirpath}": {e}')
+                continue
+            if scan:
+                for filename in filter(has_media_extension, filenames):
+                    pending = self.pending.setdefault(os.path.join(dirpath, filename), PendingFile())
+                    pending.closed = True
+
+    def handle_event(self, event):
+        if event.mask & IN_Q_OVERFLOW:
+            logger.warning('inotify event queue overflowed; rescanning watched directories')
+            for directory in self.directories:
+                self.add_directory(directory, scan=True)
+            return
+        if event.mask & IN_IGNORED:
+            self.watches.pop(event.wd, None)
+            return
+
+        directory = self.watches.get(event.wd)
+        if directory is None or not event.name:
+            return
+        path = os.path.join(directory, event.name)
+
+        if event.mask & IN_ISDIR:
+            if event.mask & (IN_CREATE | IN_MOVED_TO):
+                self.add_directory(path, scan=True)
+            return
+        if not has_media_extension(event.name):
+            return
+
+        if event.mask & (IN_DELETE | IN_MOVED_FROM):
+            self.pending.pop(path, None)
+            return
+
+        pending = self.pending.setdefault(path, PendingFile())
+        pending.last_event = time.monotonic()
+        pending.closed = bool(event.mask & (IN_CLOSE_WRITE | IN_MOVED_TO))
+
+    def ready_files(self) -> List[str]:
+        now = time.monotonic()
+        ready = list()
+        for path, pending in list(self.pending.items()):
+            if not pending.closed or now - pending.last_event < self.settle:
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                del self.pending[path]
+                continue
+            state = (stat.st_size, stat.st_mtime_ns)
+            if state != pending.state:
+                pending.state = state
+                pending.last_event = now
+            elif self.job_options.get('torrents') and torrent_file_ready(path, client=self.client) is False:
+                logger.debug(f'Waiting on qBittorrent to finish "{path}"')
+                pending.last_event = now
+            else:
+                ready.append(path)
+                del self.pending[path]
+        return ready
+
+    def run(self):
+        for directory in self.directories:
+            self.add_directory(directory)
+        logger.info(f'Watching {len(self.watches)} directories under {self.directories}')
+
+        while True:
+            select.select([self.inotify], [], [], 1)
+            for event in self.inotify.read_events():
+                self.handle_event(event)
+            if ready := self.ready_files():
+                self.pipeline.submit(paths=sorted(ready), **self.job_options)
+
+    def close(self):
+        self.inotify.close()
+
+
+def command(argv: list = None):
+    parser = argparse.ArgumentParser(prog='turbopotato watch',
+                                     description='watch download directories and transit media files as they complete')
+    parser.add_argument('-t', '--torrents', action='store_true',
+                        help='specify if media files are part of a torrent in qBittorrent')
+    parser.add_argument('-f', '--force-torrent-deletion', action='store_true',
+                        help='automatically delete torrent data')
+    parser.add_argument('-u', '--skip-torrent-updates', action='store_true',
+                        help='don\'t update torrents (move/delete/update)')
+    parser.add_argument('-n', '--no-notification-on-failure', action='store_true',
+                        help='don\'t send notifications if processing is unsuccessful')
+    parser.add_argument('-s', '--settle', action='store', type=float, default=DEFAULT_SETTLE,
+                        help='seconds a closed file must remain unchanged before processing')
+    parser.add_argument('-l', '--log_level', action='store', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                        default='INFO', type=str, help='log level to display on console')
+    parser.add_argument('directories', nargs='+', type=str, help='directories to watch')
+    parsed = parser.parse_args(args=argv)
+
+    configure_console_logging(level=parsed.log_level)
+    pipeline = Pipeline(log_level=parsed.log_level)
+    pipeline.start()
+    watcher = Watcher(directories=parsed.directories,
+                      pipeline=pipeline,
+                      job_options=dict(interactive=False,
+                                       torrents=parsed.torrents,
+                                       force_torrent_deletion=parsed.force_torrent_deletion,
+                                       skip_torrent_updates=parsed.skip_torrent_updates,
+                                       no_notification_on_failure=parsed.no_notification_on_failure,
+                                       log_level=parsed.log_level),
+                      settle=parsed.settle)
+    try:
+        with ssh_master.session():
+            watcher.run()
+    except KeyboardInterrupt:
+        logger.info('KeyboardInterrupt. Finishing queued jobs and exiting.')
+    finally:
+        watcher.close()
+        pipeline.stop()